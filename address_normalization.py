@@ -0,0 +1,177 @@
+"""
+Normalisation des adresses postales françaises pour la comparaison.
+
+Les adresses des factures et de la base sont saisies librement ("12 bd de
+l'hopital 75013", "12 boulevard de l'Hôpital, 75013 PARIS") : elles sont
+ramenées à une forme commune (minuscules sans accents ni ponctuation,
+abréviations des types de voie développées, mentions CEDEX/BP/CS retirées)
+puis découpées en numéro, voie, code postal et ville. Les abréviations et les
+mots de liaison viennent du vocabulaire commun (voir vocabulary).
+"""
+
+import re
+
+from key_sets import KeySets
+from vocabulary import ADDRESS_ABBREVIATIONS, STOP_WORDS, words as split_words
+
+# Suffixes de numéro de voie ("12 bis", "12b")
+NUMBER_SUFFIXES = {'b': 'bis', 'bis': 'bis', 't': 'ter', 'ter': 'ter', 'q': 'quater', 'quater': 'quater'}
+
+# Poids des composantes dans address_similarity
+WEIGHT_POSTAL_CODE = 0.4
+WEIGHT_STREET_NUMBER = 0.2
+WEIGHT_STREET = 0.4
+
+_POSTAL_CODE = re.compile(r'^\d{5}$')
+_STREET_NUMBER = re.compile(r'^(\d{1,4})([a-z]*)$')
+# Mentions postales sans rapport avec le lieu: "cedex 13", "bp 123", "cs 10001"
+_POSTAL_MENTIONS = re.compile(r'\b(?:cedex(?: \d{1,3})?|bp \d+|cs \d+|tsa \d+)\b')
+
+
+def _empty(text=""):
+    return {'text': text, 'street_number': "", 'street': "", 'postal_code': "", 'city': ""}
+
+
+def parse_address(address, abbreviations=None):
+    """Normalise et découpe une adresse
+
+    Args:
+        address (str): Adresse saisie librement
+        abbreviations (dict): Abréviation -> forme développée (ADDRESS_ABBREVIATIONS si absent,
+            voir Vocabulary.addresses)
+
+    Returns:
+        dict: text (adresse normalisée complète), street_number, street,
+        postal_code et city (chaînes vides si absents)
+    """
+    if abbreviations is None:
+        abbreviations = ADDRESS_ABBREVIATIONS
+    text = ' '.join(split_words(address))
+    if not text:
+        return _empty()
+    text = _POSTAL_MENTIONS.sub(' ', text)
+    words = [abbreviations.get(word, word) for word in text.split()]
+    parsed = _empty(' '.join(words))
+
+    # Code postal: le dernier nombre à 5 chiffres; la ville suit
+    for position in range(len(words) - 1, -1, -1):
+        if _POSTAL_CODE.match(words[position]):
+            parsed['postal_code'] = words[position]
+            parsed['city'] = ' '.join(words[position + 1:])
+            words = words[:position]
+            break
+
+    # Numéro de voie: premier nombre court, suivi éventuellement de bis/ter
+    for position, word in enumerate(words):
+        match = _STREET_NUMBER.match(word)
+        if not match or (match.group(2) and match.group(2) not in NUMBER_SUFFIXES):
+            continue
+        number, suffix = match.group(1), NUMBER_SUFFIXES.get(match.group(2), "")
+        rest = words[position + 1:]
+        if not suffix and rest and rest[0] in NUMBER_SUFFIXES.values():
+            suffix, rest = rest[0], rest[1:]
+        parsed['street_number'] = f"{number} {suffix}".strip()
+        words = words[:position] + rest
+        break
+
+    parsed['street'] = ' '.join(words)
+    return parsed
+
+
+def street_tokens(parsed):
+    """Mots significatifs de la voie"""
+    return {word for word in parsed['street'].split() if word not in STOP_WORDS}
+
+
+def address_similarity(a, b):
+    """Similarité (0 à 1) de deux adresses découpées par parse_address
+
+    Seules les composantes présentes des deux côtés comptent: code postal
+    identique, numéro identique, mots de voie communs (indice de Jaccard).
+    Deux codes postaux différents désignent deux lieux différents.
+    """
+    if not a['text'] or not b['text']:
+        return 0.0
+    if a['text'] == b['text']:
+        return 1.0
+    if a['postal_code'] and b['postal_code'] and a['postal_code'] != b['postal_code']:
+        return 0.0
+
+    score = weight = 0.0
+    if a['postal_code'] and b['postal_code']:
+        score += WEIGHT_POSTAL_CODE
+        weight += WEIGHT_POSTAL_CODE
+    if a['street_number'] and b['street_number']:
+        weight += WEIGHT_STREET_NUMBER
+        if a['street_number'] == b['street_number']:
+            score += WEIGHT_STREET_NUMBER
+    tokens_a, tokens_b = street_tokens(a), street_tokens(b)
+    if tokens_a and tokens_b:
+        weight += WEIGHT_STREET
+        score += WEIGHT_STREET * len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+    return score / weight if weight else 0.0
+
+
+class AddressIndex:
+    """Adresses normalisées des entrées de la base, indexées par code postal
+
+    Args:
+        abbreviations (dict): Abréviations des adresses (ADDRESS_ABBREVIATIONS si absent)
+    """
+
+    def __init__(self, abbreviations=None):
+        self.abbreviations = abbreviations
+        self._parsed = {}
+        self._by_postal_code = KeySets()
+
+    def __len__(self):
+        return len(self._parsed)
+
+    def parse(self, address):
+        """Découpe une adresse avec les abréviations de l'index (voir parse_address)"""
+        return parse_address(address, self.abbreviations)
+
+    def add(self, key, address):
+        """Normalise et indexe l'adresse d'une entrée (remplace l'éventuelle précédente)"""
+        self.remove(key)
+        parsed = self.parse(address)
+        if not parsed['text']:
+            return
+        self._parsed[key] = parsed
+        if parsed['postal_code']:
+            self._by_postal_code.add(parsed['postal_code'], key)
+
+    def remove(self, key):
+        """Retire l'adresse d'une entrée (sans effet si elle est absente)"""
+        parsed = self._parsed.pop(key, None)
+        if parsed and parsed['postal_code']:
+            self._by_postal_code.discard(parsed['postal_code'], key)
+
+    def clear(self):
+        """Vide l'index"""
+        self._parsed = {}
+        self._by_postal_code.clear()
+
+    def frozen(self):
+        """Copie en lecture seule, à interroger depuis un autre thread pendant que l'index est modifié"""
+        frozen = AddressIndex(self.abbreviations)
+        frozen._parsed = dict(self._parsed)
+        frozen._by_postal_code = self._by_postal_code.frozen()
+        return frozen
+
+    def parsed(self, key):
+        """Adresse découpée d'une entrée (voir parse_address), None si l'entrée n'a pas d'adresse"""
+        return self._parsed.get(key)
+
+    def by_postal_code(self, postal_code):
+        """Clés des entrées situées dans un code postal"""
+        return self._by_postal_code.get(postal_code)
+
+    @classmethod
+    def from_data(cls, data, abbreviations=None):
+        """Index construit à partir des entrées de la base (clé -> entrée)"""
+        index = cls(abbreviations)
+        for key, entry in data.items():
+            if isinstance(entry, dict) and entry.get('address'):
+                index.add(key, entry['address'])
+        return index
@@ -0,0 +1,126 @@
+"""
+Alias appris des validations manuelles ("Ligne BDD" saisie puis "Valider").
+
+Quand l'opérateur associe une facture à une ligne de la base, le nom normalisé
+de la facture (et, s'il est renseigné, le couple nom + adresse) devient un
+alias de l'entrée choisie. Les alias sont consultés avant toute recherche
+approximative : une facture déjà validée est retrouvée par simple lecture
+d'un dictionnaire.
+
+La table est le dictionnaire MainWindow.manual_matches, enregistré dans
+app_state.json :
+    clé d'alias -> {'key', 'nom', 'adresse', 'validations', 'date'}
+"""
+
+from datetime import datetime
+
+from match_cache import cache_key
+from matching_engine import STATUS_PARFAITE, SCORE_NOM_EXACT
+
+
+def alias_key(nom_facture, adresse_facture=""):
+    """Clé d'alias: nom (et adresse) normalisés, comme les clés du cache des concordances"""
+    return cache_key(nom_facture, adresse_facture)
+
+
+class AliasTable:
+    """Accès aux alias d'un dictionnaire manual_matches (modifié sur place)
+
+    Args:
+        aliases (dict): Dictionnaire des alias (clé d'alias -> enregistrement)
+    """
+
+    def __init__(self, aliases):
+        self.aliases = aliases
+
+    def __len__(self):
+        return len(self.aliases)
+
+    def _alias_keys(self, nom_facture, adresse_facture):
+        """Clés d'alias d'une facture, de la plus précise (nom + adresse) à la plus générale (nom seul)"""
+        if adresse_facture and adresse_facture.strip():
+            return [alias_key(nom_facture, adresse_facture), alias_key(nom_facture)]
+        return [alias_key(nom_facture)]
+
+    def record(self, nom_facture, adresse_facture, key):
+        """Enregistre la validation manuelle d'une facture vers l'entrée `key`
+
+        Un alias existant vers une autre entrée est remplacé: la dernière
+        décision de l'opérateur fait foi.
+        """
+        if not nom_facture or not nom_facture.strip():
+            return
+        date = datetime.now().isoformat(timespec='seconds')
+        alias_keys = self._alias_keys(nom_facture, adresse_facture)
+        for index, alias in enumerate(alias_keys):
+            record = self.aliases.get(alias)
+            if record and record.get('key') == key:
+                record['validations'] = record.get('validations', 1) + 1
+                record['date'] = date
+                continue
+            self.aliases[alias] = {
+                'key': key,
+                'nom': nom_facture.strip(),
+                # L'alias nom seul (le dernier) ne retient pas l'adresse
+                'adresse': adresse_facture.strip() if index < len(alias_keys) - 1 else "",
+                'validations': 1,
+                'date': date,
+            }
+
+    def lookup(self, nom_facture, adresse_facture, data, positions):
+        """Entrée associée à une facture par un alias
+
+        Args:
+            data (dict): Entrées de la base (clé -> entrée)
+            positions (dict): Clé -> position dans la base
+
+        Returns:
+            dict: Résultat au format de matching_engine.match_batch (statut "Parfaite"),
+            ou None si aucun alias ne s'applique
+        """
+        for alias in self._alias_keys(nom_facture, adresse_facture):
+            record = self.aliases.get(alias)
+            if not record:
+                continue
+            key = record.get('key')
+            # Alias vers une entrée supprimée depuis: ignoré (voir stale_aliases)
+            if key in positions and key in data:
+                return {
+                    'position': positions[key],
+                    'key': key,
+                    'entry': data[key],
+                    'score': SCORE_NOM_EXACT,
+                    'exact': True,
+                    'status': STATUS_PARFAITE,
+                    'alias': True,
+                }
+        return None
+
+    def remove(self, alias_keys):
+        """Supprime des alias
+
+        Returns:
+            int: Nombre d'alias supprimés
+        """
+        removed = 0
+        for alias in alias_keys:
+            if self.aliases.pop(alias, None) is not None:
+                removed += 1
+        return removed
+
+    def rename_key(self, old_key, new_key):
+        """Reporte les alias d'une entrée renommée sur sa nouvelle clé
+
+        Returns:
+            int: Nombre d'alias modifiés
+        """
+        renamed = 0
+        for record in self.aliases.values():
+            if record.get('key') == old_key:
+                record['key'] = new_key
+                renamed += 1
+        return renamed
+
+    def stale_aliases(self, data):
+        """Clés des alias dont l'entrée n'existe plus dans la base"""
+        return [alias for alias, record in self.aliases.items() if record.get('key') not in data]
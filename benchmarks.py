@@ -0,0 +1,1315 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Micro-benchmarks des traitements critiques, exécutables sans interface graphique.
+
+Usage:
+    python benchmarks.py            # tous les benchmarks
+    python benchmarks.py normalize  # un benchmark précis
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import threading
+import zipfile
+import re
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from unidecode import unidecode
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.cell_range import CellRange
+
+from text_normalization import normalize_text, normalize_many
+from french_phonetic import phonetic_key
+import matching_engine
+from matching_engine import DUPLICATE_KEY_SUFFIX, match_batch
+from tfidf_index import TfidfIndex, clean_text
+from string_similarity import jaro_winkler, levenshtein_similarity, best_candidate, score_candidates
+import parallel_matching
+from match_cache import MatchCache, matching_fingerprint, referential_fingerprint
+from address_normalization import AddressIndex, parse_address, address_similarity
+from vocabulary import NAME_ABBREVIATIONS
+from minhash_lsh import MinHashLSH, SharedMinHashLSH
+import invoice_parser
+from parse_cache import ParseCache
+from invoice_totals import InvoiceTotals
+import optimized_search
+from xlsx_reader import SheetCells
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATABASE_FILE = os.path.join(BASE_DIR, 'database.json')
+
+
+def load_database():
+    """Charge database.json tel quel (clé -> entrée)"""
+    with open(DATABASE_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def best_time(func, repeat=5):
+    """Meilleur temps d'exécution de func() sur `repeat` essais, en secondes"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_normalize():
+    """normalize_text (table de translittération) contre unidecode appelé à chaque fois"""
+    data = load_database()
+    texts = []
+    for key, entry in data.items():
+        texts.append(key)
+        if isinstance(entry, dict):
+            texts.extend(entry.values())
+
+    def legacy(text):
+        if text is None:
+            return ""
+        return unidecode(str(text).lower().strip())
+
+    # Équivalence stricte sur toutes les valeurs de la base, y compris en lot
+    # (valeurs égales de types différents: 1, True, 1.0)
+    mixed = texts + [1, True, 1.0, 0, False, 0.0]
+    mismatches = [text for text in texts if legacy(text) != normalize_text(text)]
+    mismatches += [
+        text for text, normalized in zip(mixed, normalize_many(mixed))
+        if normalized != legacy(text)
+    ]
+    print(f"normalize: {len(texts)} textes, {len(mismatches)} différence(s)")
+    for text in mismatches[:10]:
+        print(f"  {text!r}: {legacy(text)!r} != {normalize_text(text)!r}")
+
+    legacy_time = best_time(lambda: [legacy(text) for text in texts])
+    fast_time = best_time(lambda: [normalize_text(text) for text in texts])
+    batch_time = best_time(lambda: normalize_many(texts))
+    print(f"  unidecode par appel : {legacy_time * 1000:8.2f} ms")
+    print(f"  normalize_text      : {fast_time * 1000:8.2f} ms (x{legacy_time / fast_time:.1f})")
+    print(f"  normalize_many      : {batch_time * 1000:8.2f} ms (x{legacy_time / batch_time:.1f})")
+
+    # Sous-ensemble des textes accentués, le seul où la table intervient
+    accented = [text for text in texts if isinstance(text, str) and not text.isascii()]
+    if accented:
+        legacy_time = best_time(lambda: [legacy(text) for text in accented])
+        fast_time = best_time(lambda: [normalize_text(text) for text in accented])
+        print(f"  textes accentués ({len(accented)}): unidecode {legacy_time * 1000:.2f} ms, "
+              f"table {fast_time * 1000:.2f} ms (x{legacy_time / fast_time:.1f})")
+    return not mismatches
+
+
+def synthetic_invoices(data, count, seed=0, with_source=False):
+    """Factures de test (nom, adresse) dérivées des noms de la base
+
+    Mélange de noms exacts, de noms tronqués ou complétés, de fautes de frappe,
+    d'adresses reprises de la base et de noms absents de la base.
+    Avec `with_source`, chaque facture est suivie de la clé dont elle dérive
+    (None pour les noms absents de la base).
+    """
+    rng = random.Random(seed)
+    entries = list(data.items())
+    invoices = []
+    for _ in range(count):
+        key, entry = rng.choice(entries)
+        name = entry.get('name') or key if isinstance(entry, dict) else key
+        address = entry.get('address', '') if isinstance(entry, dict) else ''
+        source = key
+        kind = rng.randrange(6)
+        if kind == 1:
+            name = name[:max(3, len(name) * 2 // 3)]
+        elif kind == 2:
+            name = f"{name} {rng.choice(['service facturation', 'pharmacie', 'laboratoire'])}"
+        elif kind == 3 and len(name) > 4:
+            position = rng.randrange(1, len(name) - 1)
+            name = name[:position] + name[position + 1:]
+        elif kind == 4:
+            name = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz ') for _ in range(rng.randrange(8, 30)))
+            source = None
+        if rng.random() < 0.5:
+            address = ''
+        invoice = (name.upper() if rng.random() < 0.3 else name, address)
+        invoices.append(invoice + (source,) if with_source else invoice)
+    return invoices
+
+
+def raw_address_score(adresse, address):
+    """Score d'adresse de "Traitement": comparaison brute des textes en minuscules (égalité, inclusion)"""
+    if adresse and address:
+        if adresse == address:
+            return 50
+        if adresse in address or address in adresse:
+            return 25
+    return 0
+
+
+def exhaustive_match(data, nom_facture, adresse_facture):
+    """Référence: parcours de toute la base comme le faisait "Traitement" avant l'index"""
+    db_items = list(data.items())
+    meilleure_correspondance = None
+    meilleur_score = 0
+    correspondance_exacte = False
+    for idx, (name, entry) in enumerate(db_items):
+        score = 0
+        if nom_facture.lower() == name.lower():
+            score += 100
+            correspondance_exacte = True
+        elif nom_facture.lower() in name.lower() or name.lower() in nom_facture.lower():
+            score += 50
+        if adresse_facture and 'address' in entry and entry['address']:
+            if adresse_facture.lower() == entry['address'].lower():
+                score += 50
+            elif adresse_facture.lower() in entry['address'].lower() or entry['address'].lower() in adresse_facture.lower():
+                score += 25
+        if score > meilleur_score:
+            meilleur_score = score
+            meilleure_correspondance = idx
+    if meilleur_score < 50:
+        code = phonetic_key(nom_facture)
+        for idx, (name, entry) in enumerate(db_items):
+            if code and matching_engine.entry_phonetic_key(name) == code:
+                score = 50 + raw_address_score(adresse_facture.lower(), str(entry.get('address') or '').lower())
+                if score > meilleur_score:
+                    meilleur_score = score
+                    meilleure_correspondance = idx
+    if meilleure_correspondance is None:
+        return None
+    if correspondance_exacte and meilleur_score >= 100:
+        status = matching_engine.STATUS_PARFAITE
+    elif meilleur_score >= 50:
+        status = matching_engine.STATUS_PARTIELLE
+    else:
+        status = matching_engine.STATUS_AUCUNE
+    return meilleure_correspondance, meilleur_score, status
+
+
+def bench_tfidf(invoice_count=2000, sample_count=200):
+    """Lot TF-IDF contre le parcours de sous-chaînes de "Traitement": temps et taux de bonne entrée retrouvée"""
+    data = load_database()
+    invoices = synthetic_invoices(data, invoice_count, with_source=True)
+    base_name = lambda key: DUPLICATE_KEY_SUFFIX.sub('', str(key))
+
+    start = time.perf_counter()
+    index = TfidfIndex()
+    for key in data:
+        index.add(key, base_name(key))
+    index.compile()
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_results = match_batch(index, data, [(name, address) for name, address, _ in invoices])
+    batch_time = time.perf_counter() - start
+
+    # Parcours exhaustif (lent): sur un échantillon seulement
+    keys = list(data)
+    sample = invoices[:sample_count]
+    start = time.perf_counter()
+    substring_results = [exhaustive_match(data, name, address) for name, address, _ in sample]
+    substring_results = [result and {'key': keys[result[0]]} for result in substring_results]
+    substring_time = time.perf_counter() - start
+
+    def found(results):
+        # Entrée retrouvée: même nom que l'entrée d'origine (les doublons sont équivalents)
+        return sum(
+            1 for result, (_, _, source) in zip(results, invoices)
+            if source is not None and result and base_name(result['key']) == base_name(source)
+        )
+    known = sum(1 for *_, source in invoices if source is not None)
+
+    # Mise à jour incrémentale: une entrée modifiée, puis une nouvelle requête
+    key = next(iter(data))
+    start = time.perf_counter()
+    index.remove(key)
+    index.add(key, base_name(key) + " modifie")
+    index.compile()
+    update_time = time.perf_counter() - start
+
+    print(f"tfidf: {len(invoices)} factures x {len(data)} entrées ({known} issues de la base)")
+    print(f"  entrée retrouvée    : tfidf {found(batch_results)}")
+    print(f"  sur {len(sample)} factures  : tfidf {found(batch_results[:len(sample)])}, sous-chaînes {found(substring_results)}")
+    print(f"  construction index  : {build_time * 1000:8.1f} ms")
+    print(f"  lot tfidf           : {batch_time * 1000:8.1f} ms")
+    print(f"  sous-chaînes        : {substring_time * 1000:8.1f} ms ({len(sample)} factures)")
+    print(f"  modification + requête : {update_time * 1000:8.1f} ms")
+
+
+def bench_statuses(invoice_count=500):
+    """Statuts du lot TF-IDF contre ceux de l'ancien "Traitement" (parcours exhaustif de sous-chaînes)
+
+    Le lot TF-IDF remplace la recherche de sous-chaînes: les statuts vert/orange
+    changent. Affiche le passage d'un statut à l'autre et le nombre de factures
+    rattachées à leur entrée d'origine par chaque méthode.
+    """
+    data = load_database()
+    invoices = synthetic_invoices(data, invoice_count, with_source=True)
+    base_name = lambda key: DUPLICATE_KEY_SUFFIX.sub('', str(key))
+    keys = list(data)
+
+    index = TfidfIndex()
+    for key in data:
+        index.add(key, base_name(key))
+    batch_results = match_batch(index, data, [(name, address) for name, address, _ in invoices])
+    reference = [exhaustive_match(data, name, address) for name, address, _ in invoices]
+
+    transitions = {}
+    found = {'sous-chaînes': 0, 'tfidf': 0}
+    for (_, _, source), old, new in zip(invoices, reference, batch_results):
+        old_status = old[2] if old else matching_engine.STATUS_AUCUNE
+        new_status = new['status'] if new else matching_engine.STATUS_AUCUNE
+        transitions[(old_status, new_status)] = transitions.get((old_status, new_status), 0) + 1
+        if source is None:
+            continue
+        if old and old_status != matching_engine.STATUS_AUCUNE and base_name(keys[old[0]]) == base_name(source):
+            found['sous-chaînes'] += 1
+        if new and new_status != matching_engine.STATUS_AUCUNE and base_name(new['key']) == base_name(source):
+            found['tfidf'] += 1
+    known = sum(1 for *_, source in invoices if source is not None)
+    unchanged = sum(count for (old, new), count in transitions.items() if old == new)
+
+    print(f"statuts: {len(invoices)} factures x {len(data)} entrées ({known} issues de la base)")
+    print(f"  statut inchangé     : {unchanged}/{len(invoices)}")
+    for (old, new), count in sorted(transitions.items()):
+        if old != new:
+            print(f"  {old:>9} -> {new:<9}: {count}")
+    print(f"  entrée d'origine (verte ou orange): sous-chaînes {found['sous-chaînes']}, tfidf {found['tfidf']}")
+
+
+def bench_parallel(invoice_count=20000, uh_count=40, worker_counts=(1, 2, 4, 8)):
+    """Passage à l'échelle de la recherche par UH selon le nombre de processus"""
+    data = load_database()
+    index = TfidfIndex()
+    for key in data:
+        index.add(key, DUPLICATE_KEY_SUFFIX.sub('', str(key)))
+    index.compile()
+    snapshot = (
+        index, data, {key: position for position, key in enumerate(data)},
+        AddressIndex.from_data(data), matching_engine.canonical_index(data), None, matching_engine.phonetic_index(data),
+    )
+
+    # Classeur synthétique: factures réparties en `uh_count` feuilles UH
+    rows = [
+        (row, f"UH{row % uh_count:03d}", name, address)
+        for row, (name, address) in enumerate(synthetic_invoices(data, invoice_count))
+    ]
+
+    print(f"parallel: {len(rows)} factures, {uh_count} UH, {os.cpu_count()} cœur(s)")
+    reference = None
+    ok = True
+    baseline = None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        results = {}
+        for _, chunk in parallel_matching.match_by_uh(snapshot, rows, workers=workers):
+            results.update(chunk)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        if reference is None:
+            reference = results
+        same = results == reference
+        ok = ok and same
+        print(f"  {workers} processus : {elapsed * 1000:8.1f} ms (x{baseline / elapsed:.2f})"
+              f"{'' if same else ' RÉSULTATS DIFFÉRENTS'}")
+    return ok
+
+
+def bench_snapshot(invoice_count=2000, edit_count=2000):
+    """Copies figées des index: recherche dans un thread pendant que le référentiel est modifié"""
+    data = load_database()
+    index = TfidfIndex()
+    canonical = matching_engine.canonical_index(data)
+    phonetic = matching_engine.phonetic_index(data)
+    for key in data:
+        index.add(key, DUPLICATE_KEY_SUFFIX.sub('', str(key)))
+    addresses = AddressIndex.from_data(data)
+    positions = {key: position for position, key in enumerate(data)}
+    invoices = synthetic_invoices(data, invoice_count)
+
+    start = time.perf_counter()
+    frozen = (index.frozen(), dict(data), positions, addresses.frozen(), canonical.frozen(), None, phonetic.frozen())
+    freeze_time = time.perf_counter() - start
+    reference = match_batch(frozen[0], frozen[1], invoices, *frozen[2:])
+
+    # Entrées supprimées puis réindexées (renommées, adresses changées) pendant la recherche
+    results = {}
+    worker = threading.Thread(target=lambda: results.update(
+        found=match_batch(frozen[0], frozen[1], invoices, *frozen[2:])
+    ))
+    worker.start()
+    start = time.perf_counter()
+    edited = random.Random(0).sample(list(data), min(edit_count, len(data)))
+    for key in edited:
+        entry = data.pop(key)
+        index.remove(key)
+        addresses.remove(key)
+        canonical.remove(key)
+        phonetic.remove(key)
+        renamed = f"{key} bis"
+        data[renamed] = dict(entry, address=f"1 rue Neuve {entry.get('address', '')}")
+        index.add(renamed, renamed)
+        addresses.add(renamed, data[renamed]['address'])
+        canonical.add(renamed, renamed)
+        phonetic.add(renamed, renamed)
+    edit_time = time.perf_counter() - start
+    worker.join()
+
+    same = results.get('found') == reference
+    print(f"snapshot: {len(invoices)} factures, {len(edited)} entrées modifiées pendant la recherche")
+    print(f"  résultats de la copie figée inchangés: {'oui' if same else 'NON'}")
+    print(f"  copie figée des index : {freeze_time * 1000:8.1f} ms")
+    print(f"  modifications         : {edit_time * 1000:8.1f} ms")
+    return same
+
+
+def bench_cache(invoice_count=2000):
+    """Second traitement du même fichier: cache persistant contre nouvelle recherche"""
+    data = load_database()
+    index = TfidfIndex()
+    for key in data:
+        index.add(key, DUPLICATE_KEY_SUFFIX.sub('', str(key)))
+    positions = {key: position for position, key in enumerate(data)}
+    invoices = synthetic_invoices(data, invoice_count)
+
+    start = time.perf_counter()
+    results = match_batch(index, data, invoices, positions)
+    match_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache_file = os.path.join(directory, 'match_cache.json')
+        cache = MatchCache(cache_file)
+        cache.bind(matching_fingerprint(), referential_fingerprint(data))
+        for (name, address), result in zip(invoices, results):
+            cache.store(name, address, result)
+        cache.save()
+
+        # Mois suivant: nouveau chargement du cache depuis le disque
+        start = time.perf_counter()
+        cache = MatchCache(cache_file)
+        cache.load()
+        cache.bind(matching_fingerprint(), referential_fingerprint(data))
+        cached = [cache.lookup(name, address, data, positions)[1] for name, address in invoices]
+        cache_time = time.perf_counter() - start
+        hits = cache.hits
+
+        # Référentiel modifié (une entrée ajoutée): seules les concordances non parfaites sont recalculées
+        changed = dict(data)
+        changed['entree ajoutee'] = {'address': ''}
+        changed_positions = {key: position for position, key in enumerate(changed)}
+        cache.reset_stats()
+        cache.bind(matching_fingerprint(), referential_fingerprint(changed))
+        reused = [cache.lookup(name, address, changed, changed_positions) for name, address in invoices]
+        stale = sum(
+            1 for (found, _), result in zip(reused, results)
+            if found != bool(result and result['status'] == matching_engine.STATUS_PARFAITE)
+        )
+
+    # Champs conservés par le cache (sans les indicateurs d'origine comme 'canonical')
+    fields = ('position', 'key', 'score', 'exact', 'status')
+    stored = lambda result: result and tuple(result[field] for field in fields)
+    differences = sum(1 for a, b in zip(results, cached) if stored(a) != stored(b))
+    print(f"cache: {len(invoices)} factures, {hits} reprises, {len(invoices) - hits} recherchées, "
+          f"{differences} différence(s)")
+    print(f"  après ajout d'une entrée: {cache.hits} reprises (parfaites), {cache.misses} recherchées, "
+          f"{stale} erreur(s) de validation")
+    print(f"  recherche tfidf     : {match_time * 1000:8.1f} ms")
+    print(f"  cache (chargement, empreinte, lectures) : {cache_time * 1000:8.1f} ms")
+    return not differences and not stale
+
+
+def bench_similarity(invoice_count=2000, top_k=10):
+    """Jaro-Winkler et Levenshtein sur les candidats TF-IDF de chaque facture, avec et sans arrêt anticipé"""
+    data = load_database()
+    index = TfidfIndex()
+    for key in data:
+        index.add(key, DUPLICATE_KEY_SUFFIX.sub('', str(key)))
+    invoices = synthetic_invoices(data, invoice_count)
+    queries = [clean_text(name) for name, _ in invoices]
+    # Textes distincts des candidats (les doublons de la base partagent le même texte)
+    candidate_texts = [
+        list(dict.fromkeys(index.text(key) for key, _ in candidates))
+        for candidates in index.search_batch([name for name, _ in invoices], top_k)
+    ]
+    pairs = sum(len(texts) for texts in candidate_texts)
+
+    print(f"similarity: {len(invoices)} factures, {pairs} paires facture/candidat")
+    ok = True
+    for label, scorer in (('jaro-winkler', jaro_winkler), ('levenshtein', levenshtein_similarity)):
+        start = time.perf_counter()
+        full = [score_candidates(query, texts, scorer) for query, texts in zip(queries, candidate_texts)]
+        full_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        best = [best_candidate(query, texts, scorer) for query, texts in zip(queries, candidate_texts)]
+        best_time = time.perf_counter() - start
+
+        # Le meilleur candidat trouvé avec arrêt anticipé doit être celui du calcul complet
+        expected = [
+            (scores.index(max(scores)), max(scores)) if scores and max(scores) > 0 else (None, 0.0)
+            for scores in full
+        ]
+        differences = sum(1 for a, b in zip(best, expected) if a != b)
+        ok = ok and not differences
+        print(f"  {label:13s}: calcul complet {full_time * 1000:7.1f} ms, "
+              f"meilleur candidat avec arrêt anticipé {best_time * 1000:7.1f} ms, {differences} différence(s)")
+    return ok
+
+
+def synthetic_addresses(data, seed=0):
+    """Adresses de test pour les entrées de la base (database.json n'en contient pas)
+
+    Returns:
+        dict: Clé -> (numéro, type de voie, nom de voie, code postal, ville)
+    """
+    rng = random.Random(seed)
+    street_types = ['rue', 'avenue', 'boulevard', 'place', 'chemin', 'route']
+    street_names = ['de la Republique', 'Victor Hugo', 'du General de Gaulle', "de l'Hôpital",
+                    'Jean Jaures', 'Pasteur', 'des Écoles', 'Saint-Martin', 'de la Gare', 'du Moulin']
+    # Quelques centaines de communes, comme sur un référentiel national
+    cities = [(f"{rng.randrange(1, 96):02d}{rng.randrange(0, 1000):03d}", f"Ville {n}") for n in range(400)]
+    return {
+        key: (str(rng.randrange(1, 200)), rng.choice(street_types), rng.choice(street_names)) + rng.choice(cities)
+        for key in data
+    }
+
+
+def bench_address(invoice_count=2000):
+    """Adresses normalisées et regroupées par code postal contre la comparaison brute des adresses"""
+    data = load_database()
+    components = synthetic_addresses(data)
+    for key, (number, street_type, street, postal_code, city) in components.items():
+        if isinstance(data[key], dict):
+            data[key]['address'] = f"{number} {street_type} {street}, {postal_code} {city.upper()}"
+    index = TfidfIndex()
+    for key in data:
+        index.add(key, DUPLICATE_KEY_SUFFIX.sub('', str(key)))
+    positions = {key: position for position, key in enumerate(data)}
+
+    # Factures: homonymes de la base, adresse saisie autrement (abréviations, CEDEX, casse)
+    abbreviations = {'avenue': 'av', 'boulevard': 'bd', 'place': 'pl', 'chemin': 'chem', 'route': 'rte', 'rue': 'rue'}
+    groups = {}
+    for key in data:
+        groups.setdefault(DUPLICATE_KEY_SUFFIX.sub('', str(key)), []).append(key)
+    homonyms = [key for keys in groups.values() if len(keys) > 1 for key in keys if isinstance(data[key], dict)]
+    rng = random.Random(1)
+    sources = [rng.choice(homonyms) for _ in range(invoice_count)]
+    invoices = []
+    for key in sources:
+        number, street_type, street, postal_code, city = components[key]
+        address = f"{number} {abbreviations[street_type]}. {street} {postal_code} {city}"
+        if rng.random() < 0.3:
+            address += " CEDEX"
+        invoices.append((data[key].get('name') or key, address))
+
+    start = time.perf_counter()
+    addresses = AddressIndex.from_data(data)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = match_batch(index, data, invoices, positions, addresses)
+    match_time = time.perf_counter() - start
+    without_address = match_batch(index, data, [(name, '') for name, _ in invoices], positions, addresses)
+
+    # Reconnaissance de l'adresse de l'entrée d'origine: comparaison brute (égalité, inclusion)
+    raw = sum(
+        1 for (_, address), key in zip(invoices, sources)
+        if raw_address_score(address.lower(), data[key]['address'].lower())
+    )
+    parsed = sum(
+        1 for (_, address), key in zip(invoices, sources)
+        if address_similarity(parse_address(address), addresses.parsed(key)) == 1.0
+    )
+    found = lambda results: sum(1 for result, key in zip(results, sources) if result and result['key'] == key)
+    block_sizes = [len(addresses.by_postal_code(parse_address(address)['postal_code'])) for _, address in invoices]
+
+    print(f"address: {len(invoices)} factures d'homonymes, {len(data)} entrées avec adresse")
+    print(f"  adresse reconnue    : brute {raw}, normalisée {parsed}")
+    print(f"  bonne entrée        : sans adresse {found(without_address)}, avec adresse {found(results)}")
+    print(f"  entrées par code postal: {sum(block_sizes) / len(block_sizes):.1f} en moyenne, {max(block_sizes)} au plus")
+    print(f"  index des adresses  : {build_time * 1000:8.1f} ms")
+    print(f"  lot tfidf + adresses: {match_time * 1000:8.1f} ms")
+
+
+def bench_canonical(invoice_count=2000):
+    """Résolution exacte par forme canonique (abréviations développées) avant la recherche TF-IDF"""
+    data = load_database()
+    base_name = lambda key: DUPLICATE_KEY_SUFFIX.sub('', str(key))
+    index = TfidfIndex()
+    for key in data:
+        index.add(key, base_name(key))
+    index.compile()
+    positions = {key: position for position, key in enumerate(data)}
+    addresses = AddressIndex.from_data(data)
+
+    start = time.perf_counter()
+    canonical = matching_engine.canonical_index(data)
+    build_time = time.perf_counter() - start
+
+    # Factures: noms de la base avec les abréviations développées ("ch" -> "Centre Hospitalier")
+    rng = random.Random(2)
+    keys = list(data)
+    invoices, sources = [], []
+    for _ in range(invoice_count):
+        key = rng.choice(keys)
+        words = [
+            NAME_ABBREVIATIONS.get(word, word) if rng.random() < 0.8 else word
+            for word in base_name(key).split()
+        ]
+        invoices.append((' '.join(words).title(), ''))
+        sources.append(key)
+
+    start = time.perf_counter()
+    results = match_batch(index, data, invoices, positions, addresses, canonical)
+    canonical_time = time.perf_counter() - start
+
+    # Même lot sans forme canonique (index vide): tout passe par la recherche approximative
+    empty = matching_engine.CanonicalIndex()
+    start = time.perf_counter()
+    fuzzy = match_batch(index, data, invoices, positions, addresses, empty)
+    fuzzy_time = time.perf_counter() - start
+
+    def summary(results):
+        perfect = sum(1 for result in results if result and result['status'] == matching_engine.STATUS_PARFAITE)
+        found = sum(1 for result, key in zip(results, sources) if result and base_name(result['key']) == base_name(key))
+        return perfect, found
+    resolved = sum(1 for result in results if result and result.get('canonical'))
+
+    print(f"canonical: {len(invoices)} factures aux abréviations développées, {len(canonical)} entrées indexées")
+    print(f"  résolues par forme canonique : {resolved}")
+    print(f"  parfaites / bonne entrée  : avec forme canonique {summary(results)}, sans {summary(fuzzy)}")
+    print(f"  index des formes canoniques : {build_time * 1000:8.1f} ms")
+    print(f"  lot avec forme canonique    : {canonical_time * 1000:8.1f} ms")
+    print(f"  lot sans forme canonique    : {fuzzy_time * 1000:8.1f} ms")
+
+
+def bench_lsh(entry_count=200000, query_count=500):
+    """Candidats MinHash-LSH contre le score TF-IDF exact sur tout un grand référentiel synthétique"""
+    data = load_database()
+    base_names = sorted({clean_text(DUPLICATE_KEY_SUFFIX.sub('', str(key))) for key in data})
+    # Référentiel fusionné synthétique: noms de la base suivis d'un site ou d'un service
+    rng = random.Random(3)
+    sites = ['site', 'pole', 'service', 'antenne', 'unite', 'batiment', 'secteur']
+    names = list(dict.fromkeys(
+        f"{rng.choice(base_names)} {rng.choice(sites)} {rng.randrange(1, 100)} {rng.choice(base_names).split()[-1]}"
+        for _ in range(entry_count)
+    ))
+    queries, sources = [], []
+    for _ in range(query_count):
+        name = rng.choice(names)
+        kind = rng.randrange(3)
+        if kind == 1 and len(name) > 4:
+            position = rng.randrange(1, len(name) - 1)
+            name_query = name[:position] + name[position + 1:]
+        elif kind == 2:
+            name_query = ' '.join(word for word in name.split() if rng.random() < 0.85) or name
+        else:
+            name_query = name
+        queries.append(name_query.upper())
+        sources.append(name)
+
+    start = time.perf_counter()
+    index = TfidfIndex()
+    for name in names:
+        index.add(name, name)
+    index.compile()
+    tfidf_build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lsh = MinHashLSH()
+    lsh.add_many((name, name) for name in names)
+    lsh_build = time.perf_counter() - start
+
+    # Score exact: produit TF-IDF avec tout le référentiel (petits lots pour borner la mémoire)
+    start = time.perf_counter()
+    exact = []
+    for batch in range(0, len(queries), 16):
+        exact.extend(index.search_batch(queries[batch:batch + 16], 1))
+    exact_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    approximate = matching_engine._search_candidates(index, lsh, queries, 1, [()] * len(queries), min_entries=0)
+    lsh_time = time.perf_counter() - start
+
+    best_exact = [candidates[0][0] if candidates else None for candidates in exact]
+    recall = sum(
+        1 for best, candidates in zip(best_exact, approximate)
+        if best is not None and best in {key for key, _ in candidates}
+    )
+    same_best = sum(
+        1 for best, candidates in zip(best_exact, approximate)
+        if best is not None and candidates and candidates[0][0] == best
+    )
+    found = sum(1 for source, candidates in zip(sources, approximate) if candidates and candidates[0][0] == source)
+    sizes = [len(candidates) for candidates in approximate]
+
+    print(f"lsh: {len(names)} entrées, {len(queries)} requêtes")
+    print(f"  meilleur candidat exact retrouvé : {recall}/{len(queries)}, classé premier {same_best}")
+    print(f"  entrée d'origine classée première: {found}/{len(queries)}")
+    print(f"  candidats par requête : {sum(sizes) / len(sizes):.1f} en moyenne, {max(sizes)} au plus")
+    print(f"  construction tfidf    : {tfidf_build:8.1f} s")
+    print(f"  construction lsh      : {lsh_build:8.1f} s")
+    print(f"  score exact           : {exact_time / len(queries) * 1000:8.2f} ms par requête")
+    print(f"  candidats lsh + cosinus: {lsh_time / len(queries) * 1000:8.2f} ms par requête")
+
+
+def bench_shared_lsh(entry_count=50000, edit_count=500, query_count=200):
+    """Index MinHash-LSH partagé: construction dans le thread de recherche, puis relecture et mise à jour par différence"""
+    data = load_database()
+    base_names = sorted({clean_text(DUPLICATE_KEY_SUFFIX.sub('', str(key))) for key in data})
+    rng = random.Random(5)
+    names = list(dict.fromkeys(
+        f"{rng.choice(base_names)} site {rng.randrange(1, 100)} {rng.choice(base_names).split()[-1]}"
+        for _ in range(entry_count)
+    ))
+    queries = [rng.choice(names).upper() for _ in range(query_count)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'lsh', 'minhash_lsh.npz')
+        start = time.perf_counter()
+        shared = SharedMinHashLSH(path)
+        worker = threading.Thread(target=shared.sync, args=(names, str))
+        worker.start()
+        worker.join()
+        build_time = time.perf_counter() - start
+        saved = os.path.exists(path)
+
+        # Session suivante: index relu, entrées renommées depuis l'enregistrement
+        edited = names[:edit_count]
+        current = [f"{name} bis" for name in edited] + names[edit_count:]
+        start = time.perf_counter()
+        shared = SharedMinHashLSH(path)
+        shared.sync(current, str)
+        sync_time = time.perf_counter() - start
+        start = time.perf_counter()
+        shared.save_if_dirty()
+        save_time = time.perf_counter() - start
+
+        # Mêmes estimations qu'un index construit à neuf (l'ordre des ex aequo suit l'ordre d'insertion)
+        def profile(results):
+            return [(found[:1], sorted(estimate for _, estimate in found)) for found in results]
+
+        reference = MinHashLSH()
+        reference.add_many((name, name) for name in current)
+        expected = profile(reference.query_batch(queries))
+        reloaded = SharedMinHashLSH(path)
+        reloaded.sync(current, str)
+        same = (
+            profile(shared.query_batch(queries)) == expected == profile(reloaded.query_batch(queries))
+            and not reloaded._dirty
+        )
+
+        # Processus de recherche: copie de l'index, y compris pendant une requête d'un autre thread
+        busy = threading.Thread(target=shared.query_batch, args=(queries * 10,))
+        busy.start()
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            copied = executor.submit(_query_shared_lsh, shared, queries).result(timeout=300)
+        busy.join()
+        same = same and profile(copied) == expected
+
+    print(f"shared_lsh: {len(names)} entrées, {edit_count} renommées entre deux sessions")
+    print(f"  enregistré après construction: {'oui' if saved else 'NON'}, "
+          f"mêmes estimations (mémoire, relu, processus): {'oui' if same else 'NON'}")
+    print(f"  construction (thread) : {build_time:8.1f} s")
+    print(f"  relecture + différence: {sync_time:8.1f} s")
+    print(f"  enregistrement        : {save_time:8.1f} s")
+    return saved and same
+
+
+def _query_shared_lsh(shared, queries):
+    """Requêtes depuis un processus du pool (voir bench_shared_lsh)"""
+    return shared.query_batch(queries)
+
+
+def make_billing_workbook(path, sheet_count=100, blocks_per_sheet=40, seed=0, deviating_sheets=()):
+    """Fichier de facturation synthétique: une feuille par UH, deux colonnes de blocs facture
+
+    Chaque bloc suit le modèle attendu par invoice_parser : "Intitulé", nom
+    fusionné sur 6 cellules, numéro 7 colonnes à droite, codes chorus et client
+    sous le nom, adresse fusionnée 2 lignes plus bas, lignes de prestations et
+    total. Un bloc sur cinq a déjà un code client.
+
+    Args:
+        deviating_sheets (iterable): Indices des feuilles qui ont une troisième colonne de blocs
+            (colonne Q), sauf sur la première ligne de blocs
+
+    Returns:
+        int: Nombre de factures sans code client
+    """
+    rng = random.Random(seed)
+    names = sorted({DUPLICATE_KEY_SUFFIX.sub('', key) for key in load_database()})
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    expected = 0
+    number = 1000
+    deviating_sheets = set(deviating_sheets)
+
+    def write_block(sheet, row, col):
+        nonlocal expected, number
+        number += 1
+        sheet.cell(row, col, "Intitulé")
+        sheet.cell(row, col + 1, rng.choice(names))
+        sheet.merge_cells(start_row=row, start_column=col + 1, end_row=row, end_column=col + 6)
+        sheet.cell(row, col + 7, f"Facture N° {number}")
+        sheet.cell(row + 1, col, "Code chorus")
+        sheet.cell(row + 1, col + 6, "Date")
+        sheet.cell(row + 1, col + 7, f"{rng.randrange(1, 29):02d}/02/2025")
+        sheet.cell(row + 2, col, "Code client")
+        if rng.random() < 0.2:
+            sheet.cell(row + 2, col + 1, str(rng.randrange(100000, 200000)))
+        else:
+            expected += 1
+        sheet.cell(row + 2, col + 4, "Adresse")
+        sheet.cell(row + 2, col + 5, f"{rng.randrange(1, 200)} rue de la Paix {rng.randrange(10, 96)}000")
+        sheet.merge_cells(start_row=row + 2, start_column=col + 5, end_row=row + 2, end_column=col + 7)
+        for label_col, label in enumerate(["Désignation", "Qté", "PU", "Montant"]):
+            sheet.cell(row + 3, col + 4 + label_col, label)
+        total = 0.0
+        for line in range(5):
+            quantity, price = rng.randrange(1, 10), round(rng.uniform(5, 300), 2)
+            total += quantity * price
+            sheet.cell(row + 4 + line, col + 4, f"Analyse {rng.randrange(1, 500)}")
+            sheet.cell(row + 4 + line, col + 5, quantity)
+            sheet.cell(row + 4 + line, col + 6, price)
+            sheet.cell(row + 4 + line, col + 7, quantity * price)
+        sheet.cell(row + 9, col + 6, "Total")
+        sheet.cell(row + 9, col + 7, round(total, 2))
+
+    for sheet_index in range(sheet_count):
+        sheet = workbook.create_sheet(f"UH{sheet_index + 1:03d}")
+        for block in range(blocks_per_sheet):
+            row = 1 + (block // 2) * 11
+            write_block(sheet, row, 1 if block % 2 == 0 else 9)
+            if sheet_index in deviating_sheets and block % 2 == 1 and row > 1:
+                write_block(sheet, row, 17)
+    # Feuilles sans facture, comme dans les fichiers mensuels
+    for title in ("Récapitulatif", "Tarifs"):
+        sheet = workbook.create_sheet(title)
+        for row in range(1, 201):
+            sheet.cell(row, 1, f"Prestation {row}")
+            sheet.cell(row, 2, round(rng.uniform(5, 300), 2))
+    workbook.save(path)
+    share_strings(path)
+    return expected
+
+
+def share_strings(path):
+    """Remplace les chaînes en ligne écrites par openpyxl par une table de chaînes partagées, comme Excel"""
+    inline = re.compile(r'<c r="([A-Z]+[0-9]+)"((?: s="[0-9]+")?) t="inlineStr"><is><t>([^<]*)</t></is></c>')
+    strings = {}
+
+    def shared(match):
+        index = strings.setdefault(match.group(3), len(strings))
+        return f'<c r="{match.group(1)}"{match.group(2)} t="s"><v>{index}</v></c>'
+
+    with zipfile.ZipFile(path) as source:
+        parts = {name: source.read(name) for name in source.namelist()}
+    for name in parts:
+        if name.startswith('xl/worksheets/'):
+            parts[name] = inline.sub(shared, parts[name].decode('utf-8')).encode('utf-8')
+    parts['xl/sharedStrings.xml'] = (
+        '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        f'count="{len(strings)}" uniqueCount="{len(strings)}">'
+        + ''.join(f'<si><t>{text}</t></si>' for text in strings)
+        + '</sst>'
+    ).encode('utf-8')
+    parts['[Content_Types].xml'] = parts['[Content_Types].xml'].replace(
+        b'</Types>',
+        b'<Override PartName="/xl/sharedStrings.xml" '
+        b'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>',
+    )
+    parts['xl/_rels/workbook.xml.rels'] = parts['xl/_rels/workbook.xml.rels'].replace(
+        b'</Relationships>',
+        b'<Relationship Id="rIdShared" Target="sharedStrings.xml" '
+        b'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings"/></Relationships>',
+    )
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as target:
+        for name, content in parts.items():
+            target.writestr(name, content)
+
+
+def legacy_parse_invoice_file(file_path):
+    """Référence: lecture complète du classeur et parcours de toutes les cellules, comme avant invoice_parser"""
+    workbook = load_workbook(file_path, data_only=True)
+    invoices = []
+    ignored = 0
+    for sheet_name in workbook.sheetnames:
+        sheet = workbook[sheet_name]
+        for row_idx in range(1, sheet.max_row + 1):
+            for col_idx in range(1, sheet.max_column + 1):
+                cell = sheet.cell(row=row_idx, column=col_idx)
+                if not (cell.value and "Intitulé" in str(cell.value)):
+                    continue
+                invoice_name_cell = sheet.cell(row=row_idx, column=col_idx + 1)
+                invoice_name = invoice_name_cell.value if invoice_name_cell.value else ""
+                invoice_number_cell = sheet.cell(row=row_idx, column=col_idx + 7)
+                invoice_number = invoice_number_cell.value if invoice_number_cell.value else ""
+                address_cell = sheet.cell(row=row_idx + 2, column=col_idx + 5)
+                address = address_cell.value if address_cell.value else ""
+                for merged_cell in sheet.merged_cells.ranges:
+                    if invoice_name_cell.coordinate in merged_cell:
+                        for row in range(merged_cell.min_row, merged_cell.max_row + 1):
+                            for col in range(merged_cell.min_col, merged_cell.max_col + 1):
+                                cell_value = sheet.cell(row=row, column=col).value
+                                if cell_value and not invoice_name:
+                                    invoice_name = cell_value
+                for merged_cell in sheet.merged_cells.ranges:
+                    if address_cell.coordinate in merged_cell:
+                        for row in range(merged_cell.min_row, merged_cell.max_row + 1):
+                            for col in range(merged_cell.min_col, merged_cell.max_col + 1):
+                                cell_value = sheet.cell(row=row, column=col).value
+                                if cell_value and not address:
+                                    address = cell_value
+                code_client_cell = sheet.cell(row=row_idx + 2, column=col_idx + 1)
+                if code_client_cell.value is not None and str(code_client_cell.value).strip() != "":
+                    ignored += 1
+                    continue
+                invoices.append((sheet_name, invoice_number, invoice_name, address))
+    return invoices, ignored
+
+
+def invoice_tuples(invoices):
+    """Champs lus d'une liste de factures importées, comparables à legacy_parse_invoice_file"""
+    return [(invoice['uh'], invoice['numero'], invoice['client'], invoice['adresse']) for invoice in invoices]
+
+
+def bench_invoice_parser(sheet_count=100, blocks_per_sheet=40):
+    """Lecture en flux (invoice_parser) contre la lecture complète cellule par cellule"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        expected = make_billing_workbook(path, sheet_count, blocks_per_sheet)
+        size = os.path.getsize(path)
+
+        start = time.perf_counter()
+        legacy, legacy_ignored = legacy_parse_invoice_file(path)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        invoices, ignored, _ = invoice_parser.parse_invoice_workbook(path, workers=1)
+        stream_time = time.perf_counter() - start
+
+        # Mémoire maximale allouée pendant chaque lecture (mesure séparée, tracemalloc ralentit)
+        peaks = []
+        for parse in (legacy_parse_invoice_file, invoice_parser.parse_invoice_workbook):
+            tracemalloc.start()
+            parse(path)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+    same = invoice_tuples(invoices) == legacy and ignored == legacy_ignored
+    print(f"invoice_parser: {sheet_count} feuilles, {len(invoices)} factures ({expected} attendues), "
+          f"{ignored} ignorées, fichier de {size / 1e6:.1f} Mo")
+    print(f"  résultats identiques à la lecture complète: {'oui' if same else 'NON'}")
+    print(f"  lecture complète : {legacy_time * 1000:8.0f} ms")
+    print(f"  lecture en flux  : {stream_time * 1000:8.0f} ms (x{legacy_time / stream_time:.1f})")
+    print(f"  mémoire maximale : {peaks[0] / 1e6:.1f} Mo en lecture complète, {peaks[1] / 1e6:.1f} Mo en flux")
+    return same and len(invoices) == expected
+
+
+def bench_merged_cells(block_count=1000, lookup_count=200):
+    """Index des cellules fusionnées contre le parcours de toutes les plages à chaque champ"""
+    # Plages du modèle de facture: nom fusionné sur 6 colonnes, adresse sur 3
+    rng = random.Random(5)
+    ranges = []
+    for block in range(block_count):
+        row, col = 1 + (block // 2) * 11, 1 if block % 2 == 0 else 9
+        ranges.append((col + 1, row, col + 6, row))
+        ranges.append((col + 5, row + 2, col + 7, row + 2))
+    cell_ranges = [CellRange(min_col=c1, min_row=r1, max_col=c2, max_row=r2) for c1, r1, c2, r2 in ranges]
+    lookups = [(rng.randrange(1, block_count * 6), rng.randrange(1, 17)) for _ in range(lookup_count)]
+
+    def linear():
+        found = []
+        for row, column in lookups:
+            coordinate = f"{get_column_letter(column)}{row}"
+            top_left = None
+            for merged in cell_ranges:
+                if coordinate in merged:
+                    top_left = (merged.min_row, merged.min_col)
+                    break
+            found.append(top_left)
+        return found
+
+    def indexed():
+        index = invoice_parser.merged_cell_index(ranges)
+        return [index.get(lookup) for lookup in lookups]
+
+    start = time.perf_counter()
+    expected = linear()
+    linear_time = time.perf_counter() - start
+    same = expected == indexed()
+    indexed_time = best_time(indexed)
+    print(f"merged_cells: {len(ranges)} plages fusionnées, {lookup_count} champs recherchés")
+    print(f"  résultats identiques: {'oui' if same else 'NON'}")
+    print(f"  parcours des plages : {linear_time * 1000:8.1f} ms")
+    print(f"  index (construction comprise): {indexed_time * 1000:8.1f} ms (x{linear_time / indexed_time:.0f})")
+    return same
+
+
+def bench_parallel_parsing(sheet_count=100, blocks_per_sheet=40, worker_counts=(1, 2, 4, 8)):
+    """Passage à l'échelle de la lecture des fichiers de facturation selon le nombre de processus"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        make_billing_workbook(path, sheet_count, blocks_per_sheet)
+        print(f"parallel_parsing: {sheet_count} feuilles, {os.cpu_count()} cœur(s)")
+        reference = None
+        baseline = None
+        ok = True
+        for workers in worker_counts:
+            start = time.perf_counter()
+            invoices, ignored, _ = invoice_parser.parse_invoice_workbook(path, workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            result = (invoice_tuples(invoices), ignored)
+            if reference is None:
+                reference = result
+            same = result == reference
+            ok = ok and same
+            print(f"  {workers} processus : {elapsed * 1000:8.1f} ms (x{baseline / elapsed:.2f})"
+                  f"{'' if same else ' RÉSULTATS DIFFÉRENTS'}")
+    return ok
+
+
+def bench_xlsx_reader(sheet_count=100, blocks_per_sheet=40):
+    """Lecture directe du XML (xlsx_reader) contre la lecture en flux d'openpyxl"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        expected = make_billing_workbook(path, sheet_count, blocks_per_sheet)
+        legacy, legacy_ignored = legacy_parse_invoice_file(path)
+        timings = {}
+        results = {}
+        for engine in (invoice_parser.ENGINE_OPENPYXL, invoice_parser.ENGINE_XML):
+            timings[engine] = best_time(
+                lambda: invoice_parser.parse_invoice_workbook(path, workers=1, engine=engine), repeat=3
+            )
+            invoices, ignored, _ = invoice_parser.parse_invoice_workbook(path, workers=1, engine=engine)
+            results[engine] = (invoice_tuples(invoices), ignored)
+
+    same = all(result == (legacy, legacy_ignored) for result in results.values())
+    openpyxl_time, xml_time = timings[invoice_parser.ENGINE_OPENPYXL], timings[invoice_parser.ENGINE_XML]
+    print(f"xlsx_reader: {sheet_count} feuilles, {len(legacy)} factures ({expected} attendues)")
+    print(f"  résultats identiques à la lecture complète: {'oui' if same else 'NON'}")
+    print(f"  openpyxl (flux)  : {openpyxl_time * 1000:8.0f} ms")
+    print(f"  XML direct       : {xml_time * 1000:8.0f} ms (x{openpyxl_time / xml_time:.1f})")
+    return same and len(legacy) == expected
+
+
+def rename_first_invoice(path, sheet_part, new_name):
+    """Change le nom de la première facture d'une feuille, comme Excel: nouvelle chaîne partagée en fin de table"""
+    with zipfile.ZipFile(path) as source:
+        parts = {name: source.read(name) for name in source.namelist()}
+    strings = parts['xl/sharedStrings.xml']
+    count = strings.count(b'<si>')
+    parts['xl/sharedStrings.xml'] = re.sub(
+        rb'count="[0-9]+" uniqueCount="[0-9]+"', f'count="{count + 1}" uniqueCount="{count + 1}"'.encode('ascii'),
+        strings.replace(b'</sst>', f'<si><t>{new_name}</t></si></sst>'.encode('utf-8')),
+    )
+    parts[sheet_part] = re.sub(
+        rb'(<c r="B1" t="s"><v>)[0-9]+(</v>)', rb'\g<1>' + str(count).encode('ascii') + rb'\g<2>',
+        parts[sheet_part], count=1,
+    )
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as target:
+        for name, content in parts.items():
+            target.writestr(name, content)
+
+
+def bench_parse_cache(sheet_count=100, blocks_per_sheet=40):
+    """Réouverture d'un fichier de facturation avec le cache des fichiers lus (parse_cache)"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        cache_file = os.path.join(directory, 'parse_cache.json')
+        make_billing_workbook(path, sheet_count, blocks_per_sheet)
+
+        def parse_with_cache():
+            # Cache relu depuis le disque, comme au démarrage de l'application
+            cache = ParseCache(cache_file)
+            cache.load()
+            return invoice_parser.parse_invoice_workbook(path, workers=1, cache=cache)
+
+        start = time.perf_counter()
+        first = parse_with_cache()
+        cold_time = time.perf_counter() - start
+        start = time.perf_counter()
+        reopened = parse_with_cache()
+        warm_time = time.perf_counter() - start
+
+        # Une feuille modifiée: seule cette feuille est relue
+        rename_first_invoice(path, 'xl/worksheets/sheet5.xml', "Clinique modifiée")
+        calls = []
+        parse_by_sheet = invoice_parser.parse_by_sheet
+
+        def counting_parse_by_sheet(file_path, sheet_names, *args):
+            calls.append(list(sheet_names))
+            return parse_by_sheet(file_path, sheet_names, *args)
+
+        invoice_parser.parse_by_sheet = counting_parse_by_sheet
+        try:
+            start = time.perf_counter()
+            changed = parse_with_cache()
+            changed_time = time.perf_counter() - start
+        finally:
+            invoice_parser.parse_by_sheet = parse_by_sheet
+        fresh = invoice_parser.parse_invoice_workbook(path, workers=1)
+        cache_size = os.path.getsize(cache_file)
+
+    same = invoice_tuples(reopened[0]) == invoice_tuples(first[0]) and reopened[1] == first[1]
+    same_changed = invoice_tuples(changed[0]) == invoice_tuples(fresh[0]) and changed[1] == fresh[1]
+    reparsed = sum(len(names) for names in calls)
+    print(f"parse_cache: {sheet_count} feuilles, {len(first[0])} factures, cache de {cache_size / 1e3:.0f} Ko")
+    print(f"  première lecture        : {cold_time * 1000:8.1f} ms")
+    print(f"  fichier inchangé        : {warm_time * 1000:8.1f} ms (x{cold_time / warm_time:.0f}), "
+          f"résultats identiques: {'oui' if same else 'NON'}")
+    print(f"  une feuille modifiée    : {changed_time * 1000:8.1f} ms, {reparsed} feuille(s) relue(s), "
+          f"résultats identiques à une lecture complète: {'oui' if same_changed else 'NON'}")
+    return same and same_changed and reparsed == 1
+
+
+def bench_layout_probe(sheet_count=100, blocks_per_sheet=40):
+    """Recherche des ancres dans les seules colonnes de la disposition détectée, contre tout le XML des feuilles"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        # Deux feuilles s'écartent du modèle: troisième colonne de blocs, relue entièrement
+        deviating = (3, 50)
+        expected = make_billing_workbook(path, sheet_count, blocks_per_sheet, deviating_sheets=deviating)
+        legacy, legacy_ignored = legacy_parse_invoice_file(path)
+        source = invoice_parser._XmlSource(path)
+        try:
+            sheets = []
+            for sheet_name in source.reader.sheetnames:
+                content = source.reader.sheet_xml(sheet_name)
+                sheets.append((sheet_name, content, SheetCells(content)))
+
+            def full_scan():
+                return [cells.find(source.anchor_pattern, source.is_anchor) for _, _, cells in sheets]
+
+            def probed():
+                return [source.find_anchors(name, cells, content)[0] for name, content, cells in sheets]
+
+            full_time = best_time(full_scan)
+            probe_time = best_time(probed)
+            same_anchors = full_scan() == probed()
+            layouts = [source.find_anchors(name, cells, content)[1].name for name, content, cells in sheets]
+        finally:
+            source.close()
+        invoices, ignored, _ = invoice_parser.parse_invoice_workbook(path, workers=1)
+
+    same = invoice_tuples(invoices) == legacy and ignored == legacy_ignored
+    print(f"layout_probe: {sheet_count} feuilles dont {len(deviating)} hors modèle, {len(invoices)} factures "
+          f"({expected} attendues)")
+    print(f"  dispositions: {', '.join(f'{name} x{layouts.count(name)}' for name in sorted(set(layouts)))}")
+    print(f"  mêmes ancres que l'examen complet: {'oui' if same_anchors else 'NON'}, "
+          f"factures identiques à la lecture complète: {'oui' if same else 'NON'}")
+    print(f"  examen de tout le XML   : {full_time * 1000:8.1f} ms")
+    print(f"  colonnes des ancres     : {probe_time * 1000:8.1f} ms (x{full_time / probe_time:.1f})")
+    return same and same_anchors and len(invoices) == expected
+
+
+def bench_progressive_loading(sheet_count=100, blocks_per_sheet=40):
+    """Délai avant les premières factures transmises feuille par feuille (on_sheet), contre la lecture entière"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        make_billing_workbook(path, sheet_count, blocks_per_sheet)
+        received = []
+        first = []
+        start = time.perf_counter()
+
+        def on_sheet(sheet_name, invoices, ignored):
+            if invoices and not first:
+                first.append(time.perf_counter() - start)
+            received.append(sheet_name)
+
+        invoices, _, _ = invoice_parser.parse_invoice_workbook(path, workers=1, on_sheet=on_sheet)
+        total_time = time.perf_counter() - start
+
+        # Interruption après 10 feuilles: les feuilles lues sont gardées, dans l'ordre du classeur
+        kept = []
+        partial, _, interrupted = invoice_parser.parse_invoice_workbook(
+            path, workers=1, should_stop=lambda: len(kept) >= 10,
+            on_sheet=lambda sheet_name, sheet_invoices, ignored: kept.append(sheet_name),
+        )
+        sheet_names = invoice_parser.workbook_sheet_names(path)
+
+    ordered = received == sheet_names and kept == sheet_names[:len(kept)]
+    print(f"progressive_loading: {sheet_count} feuilles, {len(invoices)} factures")
+    print(f"  premières factures      : {first[0] * 1000:8.1f} ms")
+    print(f"  lecture entière         : {total_time * 1000:8.1f} ms")
+    print(f"  feuilles transmises dans l'ordre du classeur: {'oui' if ordered else 'NON'}")
+    print(f"  interruption après {len(kept)} feuilles: {len(partial)} factures gardées, "
+          f"interrompue: {'oui' if interrupted else 'NON'}")
+    return ordered and interrupted and len(kept) == 10
+
+
+def python_totals(invoices):
+    """Totaux par UH et par client en boucle Python, référence de bench_invoice_totals"""
+    by_uh, by_client = {}, {}
+    for invoice in invoices:
+        count, amount, first, last = by_uh.get(invoice['uh'], (0, 0.0, "", ""))
+        day = invoice['date']
+        if day:
+            first = min(first, day) if first else day
+            last = max(last, day)
+        by_uh[invoice['uh']] = (count + 1, amount + invoice['montant'], first, last)
+        client = str(invoice['client'] or "").strip()
+        count, amount = by_client.get(client, (0, 0.0))
+        by_client[client] = (count + 1, amount + invoice['montant'])
+    return (
+        sorted((uh, *values) for uh, values in by_uh.items()),
+        sorted(((client, *values) for client, values in by_client.items()), key=lambda item: (-item[2], item[0])),
+    )
+
+
+def bench_invoice_totals(sheet_count=50, blocks_per_sheet=40, copies=50):
+    """Montants et dates lus avec les factures, totaux par UH et par client vectorisés"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        make_billing_workbook(path, sheet_count, blocks_per_sheet)
+        invoices, _, _ = invoice_parser.parse_invoice_workbook(path, workers=1)
+
+        # Référence: somme des lignes de prestations de chaque bloc, relue cellule par cellule
+        workbook = load_workbook(path)
+        read_ok = True
+        for invoice in invoices:
+            sheet_name, row, col = invoice['cellule']
+            sheet = workbook[sheet_name]
+            lines = sum(sheet.cell(row + 4 + line, col).value for line in range(5))
+            read_ok = read_ok and abs(invoice['montant'] - round(lines, 2)) < 0.005
+            read_ok = read_ok and invoice['date'].startswith("2025-02-")
+        workbook.close()
+
+    # Date lue seulement à droite du libellé "Date", même déplacé d'une ligne
+    block = {(1, 1): "Intitulé", (1, 2): "Clinique", (1, 8): "Facture N° 1", (2, 7): "Date", (2, 8): "05/02/2025"}
+    moved = {(row + (row == 2) * 2, column): value for (row, column), value in block.items()}
+    unlabelled = {cell: value for cell, value in block.items() if value != "Date"}
+    dates = [
+        invoice_parser.read_invoice("UH", 1, 1, lambda row, column: cells.get((row, column)))['date']
+        for cells in (block, moved, unlabelled)
+    ]
+    read_ok = read_ok and dates == ["2025-02-05", "2025-02-05", ""]
+
+    # Fichier de plusieurs mois: mêmes factures, répétées
+    records = invoices * copies
+    reference = python_totals(records)
+    loop_time = best_time(lambda: python_totals(records))
+
+    def extend():
+        # Ajout feuille par feuille, comme pendant l'importation
+        totals = InvoiceTotals()
+        for index in range(0, len(records), blocks_per_sheet):
+            totals.extend(records[index:index + blocks_per_sheet])
+        return totals
+
+    def aggregate(totals):
+        totals._arrays = None
+        return totals.by_uh(), totals.by_client()
+
+    totals = extend()
+    result = aggregate(totals)
+    extend_time = best_time(extend)
+    vector_time = best_time(lambda: aggregate(totals))
+    total_time = extend_time + vector_time
+
+    def close(left, right):
+        return len(left) == len(right) and all(
+            a[0] == b[0] and a[1] == b[1] and abs(a[2] - b[2]) < 0.01 and a[3:] == b[3:]
+            for a, b in zip(left, right)
+        )
+
+    same = close(result[0], reference[0]) and close(result[1], reference[1])
+    print(f"invoice_totals: {len(invoices)} factures lues, {len(records)} agrégées, "
+          f"{len(result[0])} UH, {len(result[1])} clients")
+    print(f"  montants et dates conformes aux blocs: {'oui' if read_ok else 'NON'}")
+    print(f"  totaux identiques à la boucle Python : {'oui' if same else 'NON'}")
+    print(f"  boucle Python          : {loop_time * 1000:8.1f} ms")
+    print(f"  ajout des feuilles     : {extend_time * 1000:8.1f} ms (pendant l'importation)")
+    print(f"  agrégation vectorisée  : {vector_time * 1000:8.1f} ms (conversion NumPy comprise)")
+    print(f"  ajout + agrégation     : {total_time * 1000:8.1f} ms (x{loop_time / total_time:.1f})")
+    return read_ok and same
+
+
+def bench_write_back(sheet_count=30, blocks_per_sheet=40, validated_count=300):
+    """Saisie des codes à la position relevée à l'importation contre la recherche du numéro dans la feuille"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        make_billing_workbook(path, sheet_count, blocks_per_sheet)
+        invoices, _, _ = invoice_parser.parse_invoice_workbook(path, workers=1)
+        rng = random.Random(0)
+        rows = [
+            {
+                'uh': invoice['uh'], 'facture_num': str(invoice['numero']),
+                'code_client': str(rng.randrange(100000, 200000)), 'code_chorus': str(rng.randrange(1, 1000)),
+                'cellule': list(invoice['cellule']),
+            }
+            for invoice in rng.sample(invoices, min(validated_count, len(invoices)))
+        ]
+        searched_rows = [dict(row, cellule=None) for row in rows]
+
+        def written(workbook):
+            return [
+                tuple(workbook[row['cellule'][0]].cell(row=r, column=c).value
+                      for r, c in optimized_search.positions_codes(*row['cellule'][1:]))
+                for row in rows
+            ]
+
+        workbook = load_workbook(path)
+        start = time.perf_counter()
+        searched = optimized_search.optimized_openpyxl_search(None, workbook, searched_rows)
+        search_time = time.perf_counter() - start
+        search_cells = written(workbook)
+
+        workbook = load_workbook(path)
+        start = time.perf_counter()
+        direct = optimized_search.optimized_openpyxl_search(None, workbook, rows)
+        direct_time = time.perf_counter() - start
+        direct_cells = written(workbook)
+
+    expected = [(row['code_client'], row['code_chorus']) for row in rows]
+    same = searched == direct == len(rows) and search_cells == direct_cells == expected
+    print(f"write_back: {len(rows)} factures validées sur {len(invoices)}, {sheet_count} feuilles")
+    print(f"  mêmes cellules écrites que la recherche: {'oui' if same else 'NON'}")
+    print(f"  recherche du numéro      : {search_time * 1000:8.1f} ms")
+    print(f"  position de l'importation: {direct_time * 1000:8.1f} ms (x{search_time / direct_time:.0f})")
+    return same
+
+
+BENCHMARKS = {
+    'normalize': bench_normalize,
+    'tfidf': bench_tfidf,
+    'statuses': bench_statuses,
+    'parallel': bench_parallel,
+    'snapshot': bench_snapshot,
+    'cache': bench_cache,
+    'similarity': bench_similarity,
+    'address': bench_address,
+    'canonical': bench_canonical,
+    'lsh': bench_lsh,
+    'shared_lsh': bench_shared_lsh,
+    'invoice_parser': bench_invoice_parser,
+    'merged_cells': bench_merged_cells,
+    'parallel_parsing': bench_parallel_parsing,
+    'xlsx_reader': bench_xlsx_reader,
+    'parse_cache': bench_parse_cache,
+    'layout_probe': bench_layout_probe,
+    'progressive_loading': bench_progressive_loading,
+    'invoice_totals': bench_invoice_totals,
+    'write_back': bench_write_back,
+}
+
+
+def main(argv):
+    names = argv[1:] or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        print(f"Benchmark(s) inconnu(s): {', '.join(unknown)}. Disponibles: {', '.join(BENCHMARKS)}")
+        return 2
+    ok = True
+    for name in names:
+        ok = BENCHMARKS[name]() is not False and ok
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
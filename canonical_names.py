@@ -0,0 +1,124 @@
+"""
+Forme canonique des noms d'établissements pour la recherche exacte.
+
+Les noms de la base et des factures diffèrent souvent par des abréviations
+("ch de troyes" / "Centre Hospitalier de Troyes", "st malo" / "Saint-Malo").
+canonical_name ramène un nom à une forme commune : texte normalisé sans
+ponctuation, abréviations développées, petits mots de liaison retirés. Deux
+noms de même forme canonique désignent le même établissement : CanonicalIndex
+les retrouve par simple lecture d'un dictionnaire, avant toute recherche
+approximative.
+
+Les abréviations et les mots de liaison viennent du vocabulaire commun
+(voir vocabulary), y compris le fichier abbreviations.json.
+"""
+
+import re
+
+from text_normalization import normalize_text
+from key_sets import KeySets
+from vocabulary import NAME_ABBREVIATIONS, NON_ALNUM, STOP_WORDS
+
+# Points des sigles supprimés ("c.h.u." -> "chu"), autres signes remplacés par une espace
+_DOTS = re.compile(r'\.')
+
+
+class Canonicalizer:
+    """Calcul des formes canoniques avec un dictionnaire d'abréviations
+
+    Args:
+        abbreviations (dict): Abréviation -> forme développée (NAME_ABBREVIATIONS si absent,
+            voir Vocabulary.names)
+    """
+
+    def __init__(self, abbreviations=None):
+        if abbreviations is None:
+            abbreviations = NAME_ABBREVIATIONS
+        # Abréviations découpées en mots ("ap hp" -> ('ap', 'hp')), formes développées sans mots de liaison
+        self._expansions = {
+            tuple(abbreviation.split()): [
+                word for word in NON_ALNUM.sub(' ', expansion).split() if word not in STOP_WORDS
+            ]
+            for abbreviation, expansion in abbreviations.items()
+        }
+        self._max_words = max((len(words) for words in self._expansions), default=1)
+
+    def __call__(self, text):
+        """Forme canonique d'un nom ("" pour un nom vide)"""
+        words = NON_ALNUM.sub(' ', _DOTS.sub('', normalize_text(text))).split()
+        canonical = []
+        position = 0
+        while position < len(words):
+            # Abréviation la plus longue commençant à cette position
+            for size in range(min(self._max_words, len(words) - position), 0, -1):
+                expansion = self._expansions.get(tuple(words[position:position + size]))
+                if expansion is not None:
+                    canonical.extend(expansion)
+                    position += size
+                    break
+            else:
+                if words[position] not in STOP_WORDS:
+                    canonical.append(words[position])
+                position += 1
+        return ' '.join(canonical)
+
+
+def canonical_name(text, abbreviations=None):
+    """Forme canonique d'un nom (voir Canonicalizer)"""
+    return Canonicalizer(abbreviations)(text)
+
+
+class CanonicalIndex:
+    """Entrées de la base par forme canonique de leur nom
+
+    Args:
+        canonicalizer (Canonicalizer): Calcul des formes canoniques (abréviations par défaut si absent)
+    """
+
+    def __init__(self, canonicalizer=None):
+        self.canonicalizer = canonicalizer or Canonicalizer()
+        self._keys_by_form = KeySets()
+        self._form_by_key = {}
+
+    def __len__(self):
+        return len(self._form_by_key)
+
+    def add(self, key, name):
+        """Indexe une entrée par la forme canonique de son nom (remplace l'éventuelle précédente)"""
+        self.remove(key)
+        form = self.canonicalizer(name)
+        if not form:
+            return
+        self._form_by_key[key] = form
+        self._keys_by_form.add(form, key)
+
+    def remove(self, key):
+        """Retire une entrée (sans effet si elle est absente)"""
+        form = self._form_by_key.pop(key, None)
+        if form is not None:
+            self._keys_by_form.discard(form, key)
+
+    def clear(self):
+        """Vide l'index"""
+        self._keys_by_form.clear()
+        self._form_by_key = {}
+
+    def frozen(self):
+        """Copie en lecture seule, à interroger depuis un autre thread pendant que l'index est modifié"""
+        frozen = CanonicalIndex(self.canonicalizer)
+        frozen._keys_by_form = self._keys_by_form.frozen()
+        frozen._form_by_key = dict(self._form_by_key)
+        return frozen
+
+    def lookup(self, name):
+        """Clés des entrées dont le nom a la même forme canonique que `name`"""
+        form = self.canonicalizer(name)
+        return self._keys_by_form.get(form) if form else set()
+
+    @classmethod
+    def from_names(cls, names, canonicalizer=None):
+        """Index construit à partir de couples (clé, nom)"""
+        index = cls(canonicalizer)
+        for key, name in names:
+            index.add(key, name)
+        return index
@@ -0,0 +1,158 @@
+"""
+Encodage phonétique des noms d'établissements, adapté au français.
+
+Le principe est proche de Soundex/Metaphone : les graphies qui se prononcent
+de la même façon ("ph"/"f", "c"/"k"/"qu", "ain"/"in"/"ein", lettres muettes
+finales...) produisent la même clé, ce qui permet de retrouver un
+établissement malgré les fautes d'orthographe, les accents ou les
+abréviations ("st" / "saint", "ch" / "centre hospitalier"). Les abréviations
+d'un mot et les mots vides viennent du vocabulaire commun (voir vocabulary).
+PhoneticIndex retrouve les entrées de la base de même clé phonétique qu'un nom.
+"""
+
+import re
+
+from key_sets import KeySets
+from vocabulary import NAME_ABBREVIATIONS, STOP_WORDS, words as split_words
+
+# Règles de réécriture appliquées dans l'ordre sur chaque mot (minuscules, sans accents)
+_RULES = [
+    (re.compile(r'([b-df-hj-np-tv-z])\1'), r'\1'),
+    (re.compile(r'ph'), 'f'),
+    (re.compile(r'qu?'), 'k'),
+    (re.compile(r'gu(?=[eiy])'), 'g'),
+    (re.compile(r'ge(?=[aou])'), 'j'),
+    (re.compile(r'g(?=[eiy])'), 'j'),
+    (re.compile(r'sc(?=[eiy])'), 's'),
+    (re.compile(r'[cs]h'), 's'),
+    (re.compile(r'c(?=[eiy])'), 's'),
+    (re.compile(r'ck?'), 'k'),
+    (re.compile(r'w'), 'v'),
+    (re.compile(r'x$'), ''),
+    (re.compile(r'x'), 'ks'),
+    (re.compile(r'z'), 's'),
+    (re.compile(r'h'), ''),
+    (re.compile(r'y'), 'i'),
+    (re.compile(r'e?au'), 'o'),
+    (re.compile(r'ou'), 'u'),
+    # Sons nasaux, codés par des chiffres pour ne pas être confondus avec les voyelles
+    (re.compile(r'(?:ain|ein|in|im|un|um)(?![aeiou])'), '3'),
+    (re.compile(r'(?:an|am|en|em)(?![aeiou])'), '1'),
+    (re.compile(r'(?:on|om)(?![aeiou])'), '2'),
+    (re.compile(r'[ae]i'), 'e'),
+    # Lettres muettes finales
+    (re.compile(r'(?:e?[stdx])?e?$'), ''),
+]
+
+# Voyelle la plus souvent muette ou altérée ("e", "é", "è" après suppression des accents)
+_WEAK_VOWEL = 'e'
+
+
+def _encode_word(word):
+    """Encode un mot déjà en minuscules et sans accents"""
+    if word.isdigit():
+        return word
+
+    code = word
+    for pattern, replacement in _RULES:
+        code = pattern.sub(replacement, code)
+    if not code:
+        return word[0]
+
+    # "e" supprimé sauf en tête, lettres doublées fusionnées
+    result = [code[0]]
+    for char in code[1:]:
+        if char == _WEAK_VOWEL:
+            continue
+        if char != result[-1]:
+            result.append(char)
+    return ''.join(result)
+
+
+def tokenize(text, abbreviations=None):
+    """Découpe un nom en mots normalisés, abréviations d'un mot développées
+
+    Args:
+        abbreviations (dict): Abréviation -> forme développée (NAME_ABBREVIATIONS si absent)
+    """
+    if abbreviations is None:
+        abbreviations = NAME_ABBREVIATIONS
+    tokens = []
+    for word in split_words(text):
+        expansion = abbreviations.get(word)
+        tokens.extend(expansion.split() if expansion else (word,))
+    return tokens
+
+
+def phonetic_key(text, abbreviations=None):
+    """Calcule la clé phonétique d'un nom d'établissement
+
+    Args:
+        text (str): Nom à encoder
+        abbreviations (dict): Abréviation -> forme développée (NAME_ABBREVIATIONS si absent)
+
+    Returns:
+        str: Clé phonétique (mots encodés séparés par des espaces), vide si le nom est vide
+    """
+    words = tokenize(text, abbreviations)
+    significant = [word for word in words if word not in STOP_WORDS]
+    # Un nom composé uniquement de mots vides est encodé tel quel
+    if not significant:
+        significant = words
+    return ' '.join(_encode_word(word) for word in significant)
+
+
+class PhoneticIndex:
+    """Entrées de la base par clé phonétique de leur nom
+
+    Args:
+        abbreviations (dict): Abréviation -> forme développée (NAME_ABBREVIATIONS si absent)
+    """
+
+    def __init__(self, abbreviations=None):
+        self.abbreviations = abbreviations
+        self._keys_by_code = KeySets()
+        self._code_by_key = {}
+
+    def __len__(self):
+        return len(self._code_by_key)
+
+    def add(self, key, name):
+        """Indexe une entrée par la clé phonétique de son nom (remplace l'éventuelle précédente)"""
+        self.remove(key)
+        code = phonetic_key(name, self.abbreviations)
+        if not code:
+            return
+        self._code_by_key[key] = code
+        self._keys_by_code.add(code, key)
+
+    def remove(self, key):
+        """Retire une entrée (sans effet si elle est absente)"""
+        code = self._code_by_key.pop(key, None)
+        if code is not None:
+            self._keys_by_code.discard(code, key)
+
+    def clear(self):
+        """Vide l'index"""
+        self._keys_by_code.clear()
+        self._code_by_key = {}
+
+    def frozen(self):
+        """Copie en lecture seule, à interroger depuis un autre thread pendant que l'index est modifié"""
+        frozen = PhoneticIndex(self.abbreviations)
+        frozen._keys_by_code = self._keys_by_code.frozen()
+        frozen._code_by_key = dict(self._code_by_key)
+        return frozen
+
+    def lookup(self, name):
+        """Clés des entrées dont le nom se prononce comme `name`"""
+        code = phonetic_key(name, self.abbreviations)
+        return self._keys_by_code.get(code) if code else set()
+
+    @classmethod
+    def from_names(cls, names, abbreviations=None):
+        """Index construit à partir de couples (clé, nom)"""
+        index = cls(abbreviations)
+        for key, name in names:
+            index.add(key, name)
+        return index
@@ -0,0 +1,120 @@
+"""
+Traitement des factures indépendant de l'interface.
+
+run_matching reçoit des enregistrements de factures (ligne, UH, nom, adresse)
+et un instantané du référentiel (Database.matching_snapshot), et renvoie pour
+chaque facture un résultat structuré : entrée retenue, position, score, statut
+et codes. Les alias appris sont consultés d'abord, puis le cache des
+concordances, puis la recherche UH par UH (voir parallel_matching).
+
+Ce module n'importe pas PyQt : il s'exécute dans un thread de travail et le
+tableau des factures est mis à jour en une fois avec les résultats.
+"""
+
+from matching_engine import STATUS_AUCUNE
+from parallel_matching import match_by_uh
+
+# Origine d'un résultat
+SOURCE_ALIAS = "alias"
+SOURCE_CACHE = "cache"
+SOURCE_RECHERCHE = "recherche"
+
+
+def invoice_record(row, uh, nom_facture, adresse_facture=""):
+    """Enregistrement de facture attendu par run_matching"""
+    return {'row': row, 'uh': uh, 'nom': nom_facture, 'adresse': adresse_facture or ""}
+
+
+def match_result(record, resultat, source):
+    """Résultat structuré d'une facture à partir d'un résultat de matching_engine.match_batch
+
+    Returns:
+        dict: row, uh, key (None sans concordance), name, position, score, status,
+        client_code, chorus_code, source
+    """
+    if not resultat:
+        return {
+            'row': record['row'], 'uh': record['uh'], 'key': None, 'name': "", 'position': None,
+            'score': 0, 'status': STATUS_AUCUNE, 'client_code': "", 'chorus_code': "", 'source': source,
+        }
+    entry = resultat['entry'] if isinstance(resultat['entry'], dict) else {}
+    return {
+        'row': record['row'],
+        'uh': record['uh'],
+        'key': resultat['key'],
+        'name': resultat['key'],
+        'position': resultat['position'],
+        'score': resultat['score'],
+        'status': resultat['status'],
+        'client_code': str(entry.get('client_code') or ""),
+        'chorus_code': str(entry.get('chorus_code') or ""),
+        'source': source,
+    }
+
+
+def run_matching(snapshot, records, aliases=None, cache=None, progress=None, should_stop=None, workers=None):
+    """Concordances d'un lot de factures
+
+    Args:
+        snapshot (tuple): Référentiel compilé, voir Database.matching_snapshot
+        records (list): Enregistrements de factures (voir invoice_record)
+        aliases (AliasTable): Alias appris, consultés en premier (facultatif)
+        cache (MatchCache): Cache des concordances déjà lié au référentiel (facultatif)
+        progress (callable): Appelée avec (factures traitées, UH) après chaque étape
+        should_stop (callable): Renvoie True pour interrompre la recherche
+        workers (int): Nombre de processus de la recherche (voir parallel_matching.match_by_uh)
+
+    Returns:
+        tuple: (résultats structurés dans l'ordre d'obtention, statistiques
+        {'alias', 'cache_hits', 'cache_misses', 'interrompu'})
+    """
+    data, positions = snapshot[1], snapshot[2]
+    results = []
+    stats = {'alias': 0, 'cache_hits': 0, 'cache_misses': 0, 'interrompu': False}
+    if cache is not None:
+        cache.reset_stats()
+
+    # Factures déjà validées manuellement, puis déjà rencontrées lors d'un traitement précédent
+    pending = []
+    for record in records:
+        if aliases is not None:
+            resultat = aliases.lookup(record['nom'], record['adresse'], data, positions)
+            if resultat:
+                stats['alias'] += 1
+                results.append(match_result(record, resultat, SOURCE_ALIAS))
+                continue
+        if cache is not None:
+            found, resultat = cache.lookup(record['nom'], record['adresse'], data, positions)
+            if found:
+                results.append(match_result(record, resultat, SOURCE_CACHE))
+                continue
+        pending.append(record)
+    if progress:
+        progress(len(results), None)
+
+    # Recherche des autres factures UH par UH
+    by_row = {record['row']: record for record in pending}
+    search = match_by_uh(
+        snapshot,
+        [(record['row'], record['uh'], record['nom'], record['adresse']) for record in pending],
+        workers,
+    )
+    try:
+        for uh, chunk in search:
+            if should_stop and should_stop():
+                stats['interrompu'] = True
+                break
+            for row, resultat in chunk:
+                record = by_row[row]
+                if cache is not None:
+                    cache.store(record['nom'], record['adresse'], resultat)
+                results.append(match_result(record, resultat, SOURCE_RECHERCHE))
+            if progress:
+                progress(len(results), uh)
+    finally:
+        # Libérer le pool de processus (les UH restantes sont annulées)
+        search.close()
+        if cache is not None:
+            stats['cache_hits'], stats['cache_misses'] = cache.hits, cache.misses
+            cache.save()
+    return results, stats
@@ -0,0 +1,709 @@
+"""
+Lecture des fichiers de facturation (une feuille par UH).
+
+Chaque facture commence par une cellule "Intitulé" ; ses champs sont à une
+position fixe par rapport à cette ancre :
+    nom de la facture   : même ligne, 1 colonne à droite
+    numéro de facture   : même ligne, 7 colonnes à droite
+    date                : 1 ligne plus bas, 7 colonnes à droite, à droite du libellé "Date"
+    adresse             : 2 lignes plus bas, 5 colonnes à droite
+    code client         : 2 lignes plus bas, 1 colonne à droite
+    montant total       : à droite du libellé "Total" (9 lignes plus bas, 7 colonnes à droite)
+Une facture qui a déjà un code client est ignorée. Ces positions et les
+colonnes des ancres (A et I) forment une disposition (LayoutProfile) ; la
+disposition d'une feuille est détectée sur ses premières ancres, puis (en
+lecture directe) seules les colonnes des ancres sont examinées. Si le nombre
+d'ancres trouvées ne correspond pas à celui de la feuille, toute la feuille
+est examinée.
+
+Chaque feuille est lue une seule fois, en flux : seules les dernières lignes
+lues sont gardées en mémoire, autant que la disposition en demande pour lire
+les champs sous l'ancre (LayoutProfile.window_rows : 10 lignes pour le modèle,
+la ligne de l'ancre et les 9 suivantes, jusqu'au total).
+Un champ vide situé dans une plage fusionnée prend la valeur du coin supérieur
+gauche de la plage, retrouvée par un index (cellule -> coin) construit une
+fois par feuille.
+
+Les fichiers xlsx/xlsm sont lus directement (voir xlsx_reader) : les ancres
+sont repérées dans le XML brut de la feuille, puis seules les cellules de leurs
+champs sont lues et converties en valeurs ; une feuille qui ne contient pas le
+texte de l'ancre n'est pas analysée. openpyxl (lecture seule) reste
+utilisé pour les fichiers que la lecture directe ne comprend pas.
+
+Les feuilles sont indépendantes : elles sont lues en parallèle par un pool de
+processus (voir parse_by_sheet), puis remises dans l'ordre du classeur.
+
+Les factures lues peuvent être conservées sur disque (voir parse_cache) : un
+fichier rouvert sans modification n'est pas relu.
+
+Ce module n'importe pas PyQt : la progression et l'annulation passent par des
+fonctions de rappel, et il peut être chargé tel quel par les processus du pool.
+"""
+
+import copy
+import logging
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+
+from openpyxl import load_workbook
+from openpyxl.utils.datetime import from_excel
+
+from parallel_matching import default_workers
+from parse_cache import file_digest, sheet_digests
+from xlsx_reader import SheetCells, XlsxReader, merged_ranges, merged_ranges_from_xml, sheet_parts
+
+logger = logging.getLogger('FacturesManager')
+
+# Texte de la cellule qui marque le début d'une facture
+ANCHOR_TEXT = "Intitulé"
+
+# Attribut de type d'une cellule de chaîne partagée, dans sa balise XML
+_SHARED_STRING_KIND = re.compile(rb'\st="s"')
+
+
+
+class LayoutProfile:
+    """Disposition des factures dans une feuille: colonnes des ancres et position des champs
+
+    Args:
+        name (str): Nom de la disposition (journal)
+        anchor_columns (tuple): Colonnes des ancres "Intitulé" (1 pour A)
+        name_offset (tuple): Position (lignes, colonnes) du nom de la facture par rapport à l'ancre
+        number_offset (tuple): Position du numéro de facture
+        address_offset (tuple): Position de l'adresse
+        client_code_offset (tuple): Position du code client
+        date_offset (tuple): Position de la date de la facture, à droite du libellé `date_label`
+        date_label (str): Libellé de la date; s'il n'est pas à sa place, il est cherché dans
+            les lignes du bloc, et la facture n'a pas de date s'il est absent
+        amount_offset (tuple): Position du montant total, à droite du libellé `amount_label`
+        amount_label (str): Libellé du montant total; s'il n'est pas à sa place (nombre de
+            lignes de prestations différent), il est cherché dans les lignes du bloc
+    """
+
+    def __init__(self, name, anchor_columns, name_offset=(0, 1), number_offset=(0, 7),
+                 address_offset=(2, 5), client_code_offset=(2, 1), date_offset=(1, 7),
+                 amount_offset=(9, 7), amount_label="Total", date_label="Date"):
+        self.name = name
+        self.anchor_columns = tuple(anchor_columns)
+        self.name_offset = name_offset
+        self.number_offset = number_offset
+        self.address_offset = address_offset
+        self.client_code_offset = client_code_offset
+        self.date_offset = date_offset
+        self.amount_offset = amount_offset
+        self.amount_label = amount_label
+        self.date_label = date_label
+
+    def __repr__(self):
+        return f"LayoutProfile({self.name!r}, {self.anchor_columns})"
+
+    @property
+    def offsets(self):
+        return (
+            self.name_offset, self.number_offset, self.address_offset, self.client_code_offset,
+            self.date_offset, self.amount_offset,
+        )
+
+    @property
+    def window_rows(self):
+        """Lignes à garder en mémoire pendant une lecture en flux: la ligne de l'ancre et les suivantes"""
+        return max(row for row, _ in self.offsets) + 1
+
+    def with_anchor_columns(self, anchor_columns):
+        """Même disposition des champs, ancres dans d'autres colonnes"""
+        profile = copy.copy(self)
+        profile.name = f"{self.name} (colonnes détectées)"
+        profile.anchor_columns = tuple(sorted(anchor_columns))
+        return profile
+
+
+# Modèle de facturation: deux factures par bloc de lignes, ancres en A et I (numéros en H et P)
+BILLING_LAYOUT = LayoutProfile("Modèle de facturation", anchor_columns=(1, 9))
+
+# Dispositions connues, essayées dans l'ordre par detect_layout
+LAYOUT_PROFILES = (BILLING_LAYOUT,)
+
+# Version des règles de lecture: à incrémenter quand les factures lues changent (voir parse_cache)
+PARSER_VERSION = 4
+
+# Dates: format des factures importées, formats lus dans les cellules texte
+_DATE_FORMAT = "%Y-%m-%d"
+_TEXT_DATE_FORMATS = ("%d/%m/%Y", "%d/%m/%y", "%Y-%m-%d", "%d.%m.%Y", "%d-%m-%Y")
+
+# Numéros de série Excel acceptés comme dates (1954 à 2118)
+_EXCEL_SERIAL_RANGE = (20000, 80000)
+
+# Moteurs de lecture: lecture directe du XML, ou openpyxl en lecture seule
+ENGINE_XML = "xml"
+ENGINE_OPENPYXL = "openpyxl"
+
+# En dessous de ce nombre de feuilles, le démarrage du pool coûte plus qu'il ne rapporte
+PARALLEL_MIN_SHEETS = 8
+
+# Nombre de groupes de feuilles confiés à chaque processus
+GROUPS_PER_WORKER = 4
+
+# Fichier ouvert par le processus courant, installé par _init_worker
+_source = None
+
+
+def new_invoice(uh, numero, client, adresse, cellule=None, date_facture="", montant=0.0):
+    """Facture importée, avec les colonnes du tableau des factures encore vides
+
+    Args:
+        cellule (tuple): (feuille, ligne, colonne) du numéro de facture dans le fichier
+        date_facture (str): Date de la facture (AAAA-MM-JJ), vide si elle n'a pas été lue
+        montant (float): Montant total de la facture
+    """
+    return {
+        "uh": uh,
+        "numero": numero,        # Numéro de facture
+        "client": client,        # Nom de la facture
+        "adresse": adresse,
+        "nom_bdd": "",
+        "date": date_facture,    # Date de la facture (AAAA-MM-JJ)
+        "montant": montant,      # Montant total
+        "statut": "Importée",
+        "code_client": "",
+        "code_chorus": "",
+        "ligne_bdd": "",
+        "cellule": cellule,
+    }
+
+
+def parse_amount(value):
+    """Montant d'une cellule (nombre, ou texte comme "1 234,50 €"), 0.0 s'il est illisible"""
+    if isinstance(value, bool) or value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).replace('\u00a0', '').replace('\u202f', '').replace(' ', '').replace('€', '')
+    if ',' in text:
+        # Virgule décimale, points éventuels des milliers
+        text = text.replace('.', '').replace(',', '.')
+    try:
+        return float(text)
+    except ValueError:
+        return 0.0
+
+
+def parse_date(value):
+    """Date d'une cellule (date, numéro de série Excel ou texte JJ/MM/AAAA), au format AAAA-MM-JJ; "" si illisible"""
+    if isinstance(value, datetime):
+        return value.strftime(_DATE_FORMAT)
+    if isinstance(value, date):
+        return value.strftime(_DATE_FORMAT)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        # Date sans format de date dans le fichier: numéro de série Excel
+        if _EXCEL_SERIAL_RANGE[0] <= value <= _EXCEL_SERIAL_RANGE[1]:
+            return from_excel(value).strftime(_DATE_FORMAT)
+        return ""
+    text = str(value or "").strip()
+    for text_format in _TEXT_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, text_format).strftime(_DATE_FORMAT)
+        except ValueError:
+            continue
+    return ""
+
+
+def merged_cell_index(ranges):
+    """Coin supérieur gauche de la plage fusionnée de chaque cellule fusionnée, calculé en un passage
+
+    Args:
+        ranges (list): Plages fusionnées (min_col, min_row, max_col, max_row), voir merged_ranges
+
+    Returns:
+        dict: (ligne, colonne) -> (ligne, colonne) du coin supérieur gauche
+    """
+    index = {}
+    for min_col, min_row, max_col, max_row in ranges:
+        top_left = (min_row, min_col)
+        for row in range(min_row, max_row + 1):
+            for column in range(min_col, max_col + 1):
+                index.setdefault((row, column), top_left)
+    return index
+
+
+def _is_anchor(value):
+    return bool(value) and ANCHOR_TEXT in str(value)
+
+
+def _has_label(value, label):
+    return isinstance(value, str) and value.strip().lower().startswith(label.lower())
+
+
+def detect_layout(anchor_columns, profiles=LAYOUT_PROFILES):
+    """Disposition des premières ancres trouvées dans une feuille
+
+    Args:
+        anchor_columns (iterable): Colonnes des premières ancres
+
+    Returns:
+        LayoutProfile: Première disposition connue dont les colonnes contiennent celles des ancres,
+        sinon la première disposition, ancres dans les colonnes trouvées
+    """
+    columns = set(anchor_columns)
+    for profile in profiles:
+        if columns <= set(profile.anchor_columns):
+            return profile
+    return profiles[0].with_anchor_columns(columns)
+
+
+def read_invoice(sheet_name, anchor_row, anchor_col, value_at, merged=None, corner_value=None, layout=BILLING_LAYOUT):
+    """Facture d'une ancre "Intitulé"
+
+    Args:
+        sheet_name (str): Nom de la feuille (UH)
+        anchor_row (int): Ligne de l'ancre
+        anchor_col (int): Colonne de l'ancre
+        value_at (callable): Valeur de la cellule (ligne, colonne), None si elle est vide
+        merged (dict): Cellule fusionnée -> coin de sa plage (voir merged_cell_index)
+        corner_value (callable): Valeur du coin (ligne, colonne) d'une plage fusionnée
+        layout (LayoutProfile): Position des champs par rapport à l'ancre
+
+    Returns:
+        dict: Facture (voir new_invoice), None si elle a déjà un code client
+    """
+    def field(offset):
+        row, column = anchor_row + offset[0], anchor_col + offset[1]
+        found = value_at(row, column)
+        if not found and merged:
+            top_left = merged.get((row, column))
+            found = corner_value(top_left) if top_left else None
+        return found if found else ""
+
+    client_code = value_at(anchor_row + layout.client_code_offset[0], anchor_col + layout.client_code_offset[1])
+    if client_code is not None and str(client_code).strip() != "":
+        logger.debug(f"Facture ignorée car elle a déjà un code client: {field(layout.number_offset)}")
+        return None
+
+    def labelled_row(offset, label):
+        """Ligne du champ à droite du libellé `label`: à sa place, sinon première ligne du bloc qui le porte"""
+        row, column = anchor_row + offset[0], anchor_col + offset[1]
+        if _has_label(value_at(row, column - 1), label):
+            return row
+        for candidate in range(anchor_row + 1, anchor_row + layout.window_rows):
+            if _has_label(value_at(candidate, column - 1), label):
+                return candidate
+        return None
+
+    def amount():
+        row = labelled_row(layout.amount_offset, layout.amount_label)
+        if row is None:
+            row = anchor_row + layout.amount_offset[0]
+        return parse_amount(value_at(row, anchor_col + layout.amount_offset[1]))
+
+    def invoice_date():
+        # Sans libellé "Date", la cellule n'est pas lue: elle pourrait contenir autre chose
+        row = labelled_row(layout.date_offset, layout.date_label)
+        if row is None:
+            return ""
+        return parse_date(field((row - anchor_row, layout.date_offset[1])))
+
+    number_cell = (sheet_name, anchor_row + layout.number_offset[0], anchor_col + layout.number_offset[1])
+    invoice = new_invoice(
+        sheet_name, field(layout.number_offset), field(layout.name_offset), field(layout.address_offset),
+        cellule=number_cell, date_facture=invoice_date(), montant=amount(),
+    )
+    logger.debug(f"Facture trouvée: {invoice}")
+    return invoice
+
+
+def read_invoices(sheet_name, anchors, value_at, merged=None, corner_value=None, layout=BILLING_LAYOUT):
+    """Factures d'une suite d'ancres (ligne, colonne), voir read_invoice
+
+    Returns:
+        tuple: (factures dans l'ordre des ancres, nombre de factures ignorées car déjà codées)
+    """
+    invoices = []
+    ignored = 0
+    for anchor_row, anchor_col in anchors:
+        try:
+            invoice = read_invoice(sheet_name, anchor_row, anchor_col, value_at, merged, corner_value, layout)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'extraction d'une facture: {str(e)}")
+            continue
+        if invoice is None:
+            ignored += 1
+        else:
+            invoices.append(invoice)
+    return invoices, ignored
+
+
+def extract_sheet_invoices(sheet_name, rows, ranges=(), value=None, is_anchor=_is_anchor, layout=BILLING_LAYOUT):
+    """Factures d'une feuille lue en flux
+
+    Args:
+        sheet_name (str): Nom de la feuille (UH)
+        rows (iterable): Lignes non vides de la feuille, dans l'ordre: (numéro, {colonne: cellule})
+        ranges (list): Plages fusionnées (min_col, min_row, max_col, max_row), voir xlsx_reader.merged_ranges
+        value (callable): Valeur d'une cellule (les cellules sont déjà des valeurs si absent)
+        is_anchor (callable): Indique si une cellule est une ancre "Intitulé"
+        layout (LayoutProfile): Position des champs (toutes les colonnes sont examinées)
+
+    Returns:
+        tuple: (factures dans l'ordre de la feuille, nombre de factures ignorées car déjà codées)
+    """
+    value = value or (lambda cell: cell)
+    invoices = []
+    ignored = 0
+    # Cellule fusionnée -> coin de sa plage; cellules des coins relevées au passage
+    merged = merged_cell_index(ranges)
+    top_lefts = {}
+    for min_col, min_row, _, _ in ranges:
+        top_lefts.setdefault(min_row, []).append(min_col)
+    top_left_cells = {}
+    window = deque()
+
+    def value_at(row, column):
+        for number, cells in window:
+            if number == row:
+                return value(cells.get(column))
+        return None
+
+    def corner_value(top_left):
+        return value(top_left_cells.get(top_left))
+
+    def read_anchors():
+        nonlocal ignored
+        anchor_row, cells = window[0]
+        anchors = [(anchor_row, column) for column, cell in cells.items() if is_anchor(cell)]
+        found, skipped = read_invoices(sheet_name, anchors, value_at, merged, corner_value, layout)
+        invoices.extend(found)
+        ignored += skipped
+
+    for row_number, cells in rows:
+        for column in top_lefts.get(row_number, ()):
+            if cells.get(column) is not None:
+                top_left_cells[(row_number, column)] = cells[column]
+        # Les lignes trop anciennes ont maintenant toutes leurs lignes de champs
+        while window and window[0][0] + layout.window_rows - 1 < row_number:
+            read_anchors()
+            window.popleft()
+        window.append((row_number, cells))
+    # Ancres des dernières lignes de la feuille
+    while window:
+        read_anchors()
+        window.popleft()
+    return invoices, ignored
+
+
+class _OpenpyxlSource:
+    """Fichier ouvert avec openpyxl en lecture seule"""
+
+    def __init__(self, file_path):
+        self.workbook = load_workbook(file_path, read_only=True, data_only=True)
+        self.archive = zipfile.ZipFile(file_path)
+        self.parts = sheet_parts(self.archive)
+
+    def read(self, sheet_names):
+        """Factures de quelques feuilles (voir _read_sheets)"""
+        for sheet_name in sheet_names:
+            ranges = merged_ranges(self.archive, self.parts[sheet_name]) if sheet_name in self.parts else []
+            rows = (
+                (number, {column: cell for column, cell in enumerate(values, start=1) if cell is not None})
+                for number, values in enumerate(self.workbook[sheet_name].iter_rows(min_row=1, values_only=True), start=1)
+            )
+            invoices, ignored = extract_sheet_invoices(sheet_name, rows, ranges)
+            yield sheet_name, invoices, ignored
+
+    def close(self):
+        # Les feuilles en lecture seule gardent le fichier ouvert jusqu'à la fermeture
+        self.workbook.close()
+        self.archive.close()
+
+
+class _XmlSource:
+    """Fichier lu directement (voir xlsx_reader.XlsxReader)"""
+
+    def __init__(self, file_path):
+        self.reader = XlsxReader(file_path)
+        # Une ancre est une chaîne partagée contenant ANCHOR_TEXT, ou une chaîne en ligne
+        self.anchor_strings = {str(index) for index in self.reader.string_indexes(ANCHOR_TEXT)}
+        # Cellules candidates dans le XML brut: référence à l'une de ces chaînes, ou texte
+        # en ligne; "Intitul" couvre aussi un "é" écrit &#233;
+        references = b'|'.join(index.encode('ascii') for index in sorted(self.anchor_strings))
+        alternatives = [rb'<(?:\w+:)?v>(?:' + references + rb')</'] if references else []
+        self.anchor_pattern = re.compile(b'|'.join(alternatives + [b'Intitul']))
+        # Valeurs <v> d'une chaîne d'ancre; la cellule qui les porte doit être de type "s"
+        self.anchor_values = [b'v>' + index.encode('ascii') + b'</' for index in sorted(self.anchor_strings)]
+
+    def is_anchor(self, cell):
+        kind, text, _ = cell
+        if kind == 's':
+            return text in self.anchor_strings
+        return kind in ('inlineStr', 'str') and ANCHOR_TEXT in text
+
+    def anchor_count(self, content):
+        """Nombre d'ancres d'une feuille, compté sur le XML brut
+
+        Le compte peut dépasser le nombre d'ancres ("Intitul" dans un autre texte,
+        une formule), jamais lui être inférieur: find_anchors examine alors toute la feuille.
+        """
+        count = content.count(b'Intitul')
+        for literal in self.anchor_values:
+            position = content.find(literal)
+            while position != -1:
+                # Balise de la cellule qui précède <v>, quel que soit l'ordre de ses attributs
+                value_start = content.rfind(b'<', 0, position)
+                if _SHARED_STRING_KIND.search(content, content.rfind(b'<', 0, value_start), value_start):
+                    count += 1
+                position = content.find(literal, position + len(literal))
+        return count
+
+    def find_anchors(self, sheet_name, cells, content):
+        """Ancres d'une feuille: colonnes des ancres seules, selon la disposition des premières ancres
+
+        La disposition est détectée sur la première ligne qui contient une ancre;
+        si les ancres trouvées dans ses colonnes ne sont pas toutes celles de la
+        feuille, toute la feuille est examinée.
+        """
+        first_row = cells.first_row(self.anchor_pattern)
+        if first_row is None:
+            return [], BILLING_LAYOUT
+        first_anchors = cells.find(self.anchor_pattern, self.is_anchor, row=first_row)
+        if not first_anchors:
+            return cells.find(self.anchor_pattern, self.is_anchor), BILLING_LAYOUT
+        layout = detect_layout(column for _, column in first_anchors)
+        anchors = cells.probe(layout.anchor_columns, self.anchor_pattern, self.is_anchor)
+        if len(anchors) != self.anchor_count(content):
+            logger.debug(f"Feuille {sheet_name}: disposition {layout.name} incomplète, feuille examinée entièrement")
+            return cells.find(self.anchor_pattern, self.is_anchor), layout
+        return anchors, layout
+
+    def read_sheet(self, sheet_name, content):
+        """Factures d'une feuille: ancres repérées dans le XML brut, puis lecture de leurs seuls champs"""
+        ranges = merged_ranges_from_xml(content)
+        try:
+            cells = SheetCells(content)
+        except ValueError:
+            # XML sans références de cellules: lecture complète de la feuille
+            return extract_sheet_invoices(
+                sheet_name, self.reader.rows(content), ranges, value=self.reader.value, is_anchor=self.is_anchor,
+            )
+        anchors, layout = self.find_anchors(sheet_name, cells, content)
+
+        def value_at(row, column):
+            return self.reader.value(cells.cell(row, column))
+
+        return read_invoices(
+            sheet_name, anchors, value_at, merged_cell_index(ranges), lambda top_left: value_at(*top_left), layout,
+        )
+
+    def read(self, sheet_names):
+        """Factures de quelques feuilles (voir _read_sheets)"""
+        for sheet_name in sheet_names:
+            content = self.reader.sheet_xml(sheet_name)
+            if not self.anchor_pattern.search(content):
+                yield sheet_name, [], 0
+                continue
+            invoices, ignored = self.read_sheet(sheet_name, content)
+            yield sheet_name, invoices, ignored
+
+    def close(self):
+        self.reader.close()
+
+
+def _open_source(file_path, engine=ENGINE_XML):
+    """Ouvre un fichier de facturation avec le moteur demandé (openpyxl si la lecture directe échoue)"""
+    if engine == ENGINE_XML:
+        try:
+            return _XmlSource(file_path)
+        except Exception as e:
+            logger.warning(f"Lecture directe impossible ({str(e)}), lecture avec openpyxl")
+    return _OpenpyxlSource(file_path)
+
+
+def _parse_sheets(file_path, sheet_names, engine=ENGINE_XML):
+    """Factures de quelques feuilles d'un fichier de facturation, ouvert ici en lecture seule
+
+    Générateur: chaque feuille est rendue dès qu'elle est lue.
+
+    Yields:
+        tuple: (nom de la feuille, factures, nombre de factures ignorées)
+    """
+    source = _open_source(file_path, engine)
+    try:
+        yield from source.read(sheet_names)
+    finally:
+        source.close()
+
+
+def _init_worker(file_path, engine):
+    """Ouvre le fichier en lecture seule une fois pour toutes les tâches du processus"""
+    global _source
+    _source = _open_source(file_path, engine)
+
+
+def _parse_sheet_group(sheet_names):
+    """Tâche d'un processus du pool: factures d'un groupe de feuilles"""
+    return list(_source.read(sheet_names))
+
+
+def sheet_groups(sheet_names, group_count):
+    """Découpe les feuilles en `group_count` groupes de feuilles consécutives, de tailles voisines"""
+    group_count = max(1, min(group_count, len(sheet_names)))
+    size, extra = divmod(len(sheet_names), group_count)
+    groups = []
+    start = 0
+    for group in range(group_count):
+        end = start + size + (1 if group < extra else 0)
+        groups.append(sheet_names[start:end])
+        start = end
+    return groups
+
+
+def parse_by_sheet(file_path, sheet_names, workers=None, engine=ENGINE_XML):
+    """Lit les feuilles d'un fichier de facturation, en parallèle par groupes de feuilles
+
+    Chaque processus ouvre le fichier en lecture seule une seule fois, puis lit
+    les groupes de feuilles qui lui sont confiés. Générateur: les feuilles sont rendues dans l'ordre de fin de
+    lecture. Fermer le générateur (break) annule les groupes pas encore commencés.
+
+    Args:
+        file_path (str): Chemin du fichier xlsx/xlsm
+        sheet_names (list): Feuilles à lire
+        workers (int): Nombre de processus (défaut: default_workers();
+            1 ou peu de feuilles: lecture dans le processus courant)
+        engine (str): ENGINE_XML (lecture directe) ou ENGINE_OPENPYXL
+
+    Yields:
+        tuple: (nom de la feuille, factures, nombre de factures ignorées)
+    """
+    workers = default_workers() if workers is None else workers
+    if workers <= 1 or len(sheet_names) < PARALLEL_MIN_SHEETS:
+        yield from _parse_sheets(file_path, sheet_names, engine)
+        return
+
+    # Plusieurs groupes par processus: la progression avance régulièrement et
+    # les processus qui finissent tôt reprennent un groupe
+    groups = sheet_groups(sheet_names, workers * GROUPS_PER_WORKER)
+    executor = ProcessPoolExecutor(
+        max_workers=min(workers, len(groups)),
+        initializer=_init_worker,
+        initargs=(file_path, engine),
+    )
+    try:
+        futures = [executor.submit(_parse_sheet_group, group) for group in groups]
+        for future in as_completed(futures):
+            yield from future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def workbook_sheet_names(file_path):
+    """Noms des feuilles d'un fichier xlsx/xlsm, dans l'ordre du classeur"""
+    with zipfile.ZipFile(file_path) as archive:
+        return list(sheet_parts(archive))
+
+
+def cached_invoices(sheet_name, sheet):
+    """Factures d'une feuille conservée par parse_cache.ParseCache"""
+    return [
+        new_invoice(
+            sheet_name, numero, client, adresse, cellule=(sheet_name, row, column),
+            date_facture=date_facture, montant=montant,
+        )
+        for numero, client, adresse, row, column, date_facture, montant in sheet['invoices']
+    ]
+
+
+def parse_invoice_workbook(file_path, progress=None, should_stop=None, workers=None, engine=ENGINE_XML, cache=None,
+                           on_sheet=None):
+    """Factures de toutes les feuilles d'un fichier de facturation, chaque feuille lue une seule fois
+
+    Args:
+        file_path (str): Chemin du fichier xlsx/xlsm
+        progress (callable): Appelée avec (feuilles lues, nombre de feuilles, nom de la feuille)
+            après chaque feuille
+        should_stop (callable): Renvoie True pour interrompre la lecture (factures déjà lues conservées)
+        workers (int): Nombre de processus (voir parse_by_sheet)
+        engine (str): Moteur de lecture (voir parse_by_sheet)
+        cache (ParseCache): Fichiers déjà lus (facultatif): un fichier inchangé n'est pas relu,
+            un fichier modifié ne relit que ses feuilles modifiées
+        on_sheet (callable): Appelée avec (nom de la feuille, factures, nombre de factures ignorées)
+            pour chaque feuille, dans l'ordre du classeur, dès que les feuilles précédentes sont lues
+
+    Returns:
+        tuple: (factures dans l'ordre des feuilles, nombre de factures ignorées, lecture interrompue)
+    """
+    by_sheet = {}
+    digests = {}
+    emitted = 0
+
+    def emit_ready(final=False):
+        """Transmet à on_sheet les feuilles lues qui suivent les feuilles déjà transmises"""
+        nonlocal emitted
+        while on_sheet and emitted < len(sheet_names):
+            sheet_name = sheet_names[emitted]
+            if sheet_name in by_sheet:
+                on_sheet(sheet_name, *by_sheet[sheet_name])
+            elif not final:
+                break
+            emitted += 1
+
+    if cache is not None:
+        cache.bind(PARSER_VERSION)
+        workbook_digest = file_digest(file_path)
+        known_workbook = cache.workbook(workbook_digest)
+        digests = known_workbook
+        if digests is None:
+            sheet_names = workbook_sheet_names(file_path)
+            try:
+                digests = sheet_digests(file_path, sheet_names)
+            except Exception as e:
+                logger.warning(f"Empreintes des feuilles impossibles à calculer, fichier relu entièrement: {str(e)}")
+                digests = {}
+        else:
+            sheet_names = list(digests)
+        for sheet_name, key in digests.items():
+            sheet = cache.sheet(key)
+            if sheet is not None:
+                by_sheet[sheet_name] = (cached_invoices(sheet_name, sheet), sheet['ignored'])
+        if by_sheet:
+            logger.info(f"{len(by_sheet)}/{len(sheet_names)} feuille(s) reprise(s) du cache des fichiers lus")
+            if progress:
+                progress(len(by_sheet), len(sheet_names), sheet_names[-1])
+            emit_ready()
+    else:
+        sheet_names = workbook_sheet_names(file_path)
+
+    interrupted = False
+    pending = [sheet_name for sheet_name in sheet_names if sheet_name not in by_sheet]
+    if pending:
+        reader = parse_by_sheet(file_path, pending, workers, engine)
+        try:
+            for sheet_name, invoices, ignored in reader:
+                by_sheet[sheet_name] = (invoices, ignored)
+                if sheet_name in digests:
+                    cache.store_sheet(digests[sheet_name], invoices, ignored)
+                if progress:
+                    progress(len(by_sheet), len(sheet_names), sheet_name)
+                emit_ready()
+                if should_stop and should_stop():
+                    interrupted = len(by_sheet) < len(sheet_names)
+                    break
+        finally:
+            reader.close()
+    # Lecture interrompue: feuilles lues après une feuille manquante
+    emit_ready(final=True)
+
+    if cache is not None:
+        # Fichier mémorisé seulement si toutes ses feuilles sont en cache
+        complete = len(digests) == len(sheet_names) and all(cache.sheet(key) for key in digests.values())
+        if known_workbook is None and digests and complete:
+            cache.store_workbook(workbook_digest, digests)
+        cache.save()
+
+    # Feuilles remises dans l'ordre du classeur
+    invoices = []
+    ignored = 0
+    for sheet_name in sheet_names:
+        if sheet_name in by_sheet:
+            invoices.extend(by_sheet[sheet_name][0])
+            ignored += by_sheet[sheet_name][1]
+    return invoices, ignored, interrupted
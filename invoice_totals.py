@@ -0,0 +1,126 @@
+"""
+Synthèse des montants des factures importées.
+
+Les montants et dates lus par invoice_parser sont ajoutés, feuille par
+feuille, à des colonnes de codes entiers (UH, client, jour) ; ces colonnes
+deviennent des tableaux NumPy au moment où la synthèse est affichée, et les
+totaux par UH et par client sont alors calculés d'un bloc (bincount), sans
+relire le fichier de facturation.
+
+Ce module n'importe pas PyQt.
+"""
+
+import numpy as np
+
+# Date absente (facture sans date lisible), en jours depuis 1970
+_NO_DATE = int(np.datetime64('NaT', 'D').astype(np.int64))
+
+
+class InvoiceTotals:
+    """Montants et dates des factures importées, agrégés par UH et par client
+
+    Les UH, les clients et les dates sont numérotés à l'ajout (codes entiers):
+    l'ajout d'une feuille ne fait que compléter des listes, et l'agrégation ne
+    manipule ensuite que des tableaux numériques.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        return len(self._amounts)
+
+    def clear(self):
+        """Oublie toutes les factures"""
+        self._uh_codes = {}
+        self._client_codes = {}
+        self._day_codes = {"": _NO_DATE}
+        self._uhs = []
+        self._clients = []
+        self._amounts = []
+        self._days = []
+        self._arrays = None
+
+    def extend(self, invoices):
+        """Ajoute des factures importées (dicts de invoice_parser.new_invoice)"""
+        if not invoices:
+            return
+        uh_codes, client_codes, day_codes = self._uh_codes, self._client_codes, self._day_codes
+        uhs, clients, amounts, days = self._uhs, self._clients, self._amounts, self._days
+        for invoice in invoices:
+            uh = invoice['uh']
+            code = uh_codes.get(uh)
+            if code is None:
+                code = uh_codes[uh] = len(uh_codes)
+            uhs.append(code)
+            client = invoice['client']
+            client = client.strip() if isinstance(client, str) else str(client or "").strip()
+            code = client_codes.get(client)
+            if code is None:
+                code = client_codes[client] = len(client_codes)
+            clients.append(code)
+            amounts.append(invoice['montant'])
+            # Jours depuis 1970, convertis une fois par date distincte
+            text = invoice['date'] or ""
+            day = day_codes.get(text)
+            if day is None:
+                day = day_codes[text] = int(np.datetime64(text, 'D').astype(np.int64))
+            days.append(day)
+        self._arrays = None
+
+    def _columns(self):
+        """Colonnes en tableaux (codes UH, codes clients, montants, dates), recalculés après un ajout"""
+        if self._arrays is None:
+            self._arrays = (
+                np.array(self._uhs, dtype=np.int64),
+                np.array(self._clients, dtype=np.int64),
+                np.array(self._amounts, dtype=np.float64),
+                np.array(self._days, dtype=np.int64).view('datetime64[D]'),
+            )
+        return self._arrays
+
+    @property
+    def total(self):
+        """Montant total des factures"""
+        return float(self._columns()[2].sum())
+
+    def by_uh(self):
+        """Totaux par UH, dans l'ordre des UH
+
+        Returns:
+            list: (UH, nombre de factures, montant, première date, dernière date);
+            dates au format AAAA-MM-JJ, vides si aucune facture de l'UH n'est datée
+        """
+        codes, _, amounts, dates = self._columns()
+        size = len(self._uh_codes)
+        counts = np.bincount(codes, minlength=size)
+        sums = np.bincount(codes, weights=amounts, minlength=size)
+        # Dates en jours (NaT exclus): minimum et maximum par UH
+        dated = ~np.isnat(dates)
+        days = dates[dated].astype(np.int64)
+        first = np.full(size, np.iinfo(np.int64).max)
+        last = np.full(size, np.iinfo(np.int64).min)
+        np.minimum.at(first, codes[dated], days)
+        np.maximum.at(last, codes[dated], days)
+        has_date = last >= first
+        first = np.where(has_date, np.datetime_as_string(np.where(has_date, first, 0).astype('datetime64[D]')), "")
+        last = np.where(has_date, np.datetime_as_string(np.where(has_date, last, 0).astype('datetime64[D]')), "")
+        return sorted(
+            (uh, int(counts[code]), float(sums[code]), str(first[code]), str(last[code]))
+            for uh, code in self._uh_codes.items()
+        )
+
+    def by_client(self):
+        """Totaux par client (nom de la facture), par montant décroissant
+
+        Returns:
+            list: (client, nombre de factures, montant)
+        """
+        _, codes, amounts, _ = self._columns()
+        size = len(self._client_codes)
+        counts = np.bincount(codes, minlength=size)
+        sums = np.bincount(codes, weights=amounts, minlength=size)
+        names = list(self._client_codes)
+        # Montant décroissant, puis nom
+        order = sorted(range(size), key=lambda code: (-sums[code], names[code]))
+        return [(names[code], int(counts[code]), float(sums[code])) for code in order]
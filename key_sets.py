@@ -0,0 +1,61 @@
+"""
+Ensembles de clés par valeur, copiables en lecture seule à moindre coût.
+
+Les index du référentiel (entrées par code postal, par forme canonique, par
+clé phonétique) sont copiés figés pour les threads de recherche
+(Database.matching_snapshot) pendant que la base reste modifiable. KeySets.frozen
+ne copie que le dictionnaire : les ensembles sont partagés avec la copie et ne
+sont recopiés qu'au moment où l'index les modifie.
+"""
+
+
+class KeySets:
+    """Valeur -> ensemble des clés des entrées qui la portent"""
+
+    def __init__(self):
+        self._sets = {}
+        # Valeurs dont l'ensemble est partagé avec une copie figée (copié avant modification)
+        self._shared = set()
+
+    def __len__(self):
+        return len(self._sets)
+
+    def __contains__(self, value):
+        return value in self._sets
+
+    def add(self, value, key):
+        """Ajoute une clé à l'ensemble d'une valeur"""
+        self._writable(value).add(key)
+
+    def discard(self, value, key):
+        """Retire une clé de l'ensemble d'une valeur (sans effet si elle est absente)"""
+        if value not in self._sets:
+            return
+        keys = self._writable(value)
+        keys.discard(key)
+        if not keys:
+            del self._sets[value]
+            self._shared.discard(value)
+
+    def get(self, value):
+        """Copie de l'ensemble des clés d'une valeur (vide si la valeur est absente)"""
+        return set(self._sets.get(value, ()))
+
+    def _writable(self, value):
+        keys = self._sets.get(value)
+        if keys is None or value in self._shared:
+            keys = self._sets[value] = set(keys or ())
+            self._shared.discard(value)
+        return keys
+
+    def clear(self):
+        """Vide l'index"""
+        self._sets = {}
+        self._shared = set()
+
+    def frozen(self):
+        """Copie en lecture seule, à interroger depuis un autre thread pendant que l'index est modifié"""
+        frozen = KeySets()
+        frozen._sets = dict(self._sets)
+        self._shared = set(self._sets)
+        return frozen
@@ -1,6 +1,7 @@
 import os
 import sys
 import json
+import multiprocessing
 import pandas as pd
 from PyQt5 import sip
 from datetime import datetime
@@ -12,11 +13,11 @@ from PyQt5.QtWidgets import (
     QTabWidget, QMenu, QStatusBar, QFrame, QGroupBox, QComboBox, QCheckBox,
     QSpinBox, QStyle, QStyleFactory, QFormLayout, QGridLayout, QSplitter, QDialog, 
     QDialogButtonBox, QScrollArea, QToolBar, QToolButton, QInputDialog, 
-    QProgressDialog, QSystemTrayIcon, QSplashScreen
+    QProgressDialog, QSystemTrayIcon, QSplashScreen, QStyledItemDelegate
 )
 from floating_window import FloatingWindow
 
-from PyQt5.QtCore import Qt, QTimer, QByteArray, QSize, QThread, pyqtSignal, QPoint, QEvent, QRect
+from PyQt5.QtCore import Qt, QTimer, QByteArray, QSize, QThread, pyqtSignal, QPoint, QEvent, QRect, QEventLoop
 from PyQt5.QtGui import QFont, QIcon, QColor, QStandardItemModel, QStandardItem, QPalette, QPixmap, QCursor, QPainter, QPen
 
 # Configuration du logging
@@ -538,14 +539,22 @@ import traceback
 from datetime import datetime
 import shutil
 import re
-from unidecode import unidecode
-
-def normalize_text(text):
-    """Normalise le texte pour la recherche"""
-    if text is None:
-        return ""
-    # Convertir en chaîne, supprimer les accents, mettre en minuscules et supprimer les espaces superflus
-    return unidecode(str(text).lower().strip())
+import heapq
+from text_normalization import normalize_text, normalize_many
+from french_phonetic import PhoneticIndex
+from matching_engine import MatchDependencies, match_batch, suggest_batch, DUPLICATE_KEY_SUFFIX, STATUS_PARFAITE, STATUS_PARTIELLE, STATUS_AUCUNE, LSH_MIN_ENTRIES
+from invoice_matching import invoice_record, run_matching
+from match_cache import MatchCache, matching_fingerprint, referential_fingerprint
+from alias_table import AliasTable
+from tfidf_index import TfidfIndex
+from address_normalization import AddressIndex
+from canonical_names import CanonicalIndex, Canonicalizer
+from vocabulary import ABBREVIATIONS_FILE, load_vocabulary
+from minhash_lsh import SharedMinHashLSH, DEFAULT_LSH_FILE
+from invoice_parser import parse_invoice_workbook
+from parse_cache import ParseCache
+from invoice_totals import InvoiceTotals
+from optimized_search import ecrire_codes, ecrire_win32com, position_enregistree
 
 # Configuration du logging
 def setup_logging():
@@ -596,14 +605,241 @@ CYBERPUNK_COLORS = {
 # Constantes globales
 EMPTY_CELL_SYMBOL = ""  # Cellules vides sans symbole
 
+# Nombre de résultats affichés par page dans la recherche de la base de données
+DB_SEARCH_PAGE_SIZE = 200
+
 class Database:
+    # Champs pour lesquels un index inverse (code -> clés des entrées) est maintenu
+    INDEXED_CODE_FIELDS = ('client_code', 'chorus_code')
+    
+    # Champs de la recherche classée, par ordre de priorité en cas d'égalité ('name' = clé de l'entrée)
+    RANKED_SEARCH_FIELDS = ('name', 'client_code', 'chorus_code', 'address')
+    
+    # Rangs de pertinence de la recherche classée (plus petit = plus pertinent)
+    RANK_EXACT, RANK_PREFIX, RANK_TOKEN, RANK_SUBSTRING = range(4)
+
     def __init__(self):
-        self.data = {}
+        self._data = {}
+        self._code_indexes = {field: {} for field in self.INDEXED_CODE_FIELDS}
+        self._search_fields = {}
+        self._tfidf = TfidfIndex()
+        self._addresses = AddressIndex()
+        self._canonical = CanonicalIndex()
+        self._phonetic = PhoneticIndex()
+        # Index MinHash-LSH des très grands référentiels, construit ou relu par le premier thread de recherche
+        self._lsh = SharedMinHashLSH(DEFAULT_LSH_FILE)
+        # Version du contenu, incrémentée à chaque modification (invalide les caches dérivés)
+        self.version = 0
+        self._positions = None
+        self._positions_version = None
+        self._fingerprint = None
+        self._fingerprint_version = None
         self.db_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database.json')
         self._loaded = False
         self._loading = False
         self._loader_thread = None
         self._on_loaded_callback = None
+        self.load_abbreviations()
+
+    @property
+    def data(self):
+        """Entrées de la base de données (clé normalisée -> entrée)"""
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        # Toute réaffectation complète reconstruit les index inverses
+        self._data = value
+        self.rebuild_indexes()
+
+    def rebuild_indexes(self):
+        """Reconstruit les index inverses (codes client et chorus, clés phonétiques)"""
+        self._code_indexes = {field: {} for field in self.INDEXED_CODE_FIELDS}
+        self._search_fields = {}
+        self._tfidf.clear()
+        self._addresses.clear()
+        self._canonical.clear()
+        self._phonetic.clear()
+        self.version += 1
+        if not isinstance(self._data, dict):
+            return
+        for key, entry in self._data.items():
+            self._index_entry(key, entry)
+        logger.debug(f"Index des codes reconstruits: "
+                     f"{len(self._code_indexes['client_code'])} codes client, "
+                     f"{len(self._code_indexes['chorus_code'])} codes chorus, "
+                     f"{len(self._phonetic)} clés phonétiques")
+
+    def _index_entry(self, key, entry):
+        """Ajoute une entrée aux index inverses"""
+        self._tfidf.add(key, DUPLICATE_KEY_SUFFIX.sub('', str(key)))
+        self._canonical.add(key, DUPLICATE_KEY_SUFFIX.sub('', str(key)))
+        self._phonetic.add(key, DUPLICATE_KEY_SUFFIX.sub('', str(key)))
+        if not isinstance(entry, dict):
+            return
+        # Valeurs normalisées une fois pour toutes pour la recherche classée
+        self._search_fields[key] = (normalize_text(key),) + tuple(
+            normalize_text(entry.get(field)) for field in self.RANKED_SEARCH_FIELDS[1:]
+        )
+        if entry.get('address'):
+            self._addresses.add(key, entry['address'])
+        for field, index in self._code_indexes.items():
+            code = normalize_text(entry.get(field))
+            if code:
+                index.setdefault(code, set()).add(key)
+
+    def _unindex_entry(self, key, entry):
+        """Retire une entrée des index inverses"""
+        self._tfidf.remove(key)
+        self._addresses.remove(key)
+        self._canonical.remove(key)
+        self._phonetic.remove(key)
+        self._search_fields.pop(key, None)
+        if not isinstance(entry, dict):
+            return
+        for field, index in self._code_indexes.items():
+            code = normalize_text(entry.get(field))
+            keys = index.get(code)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[code]
+
+    def set_entry(self, key, entry):
+        """Insère ou remplace une entrée en maintenant les index à jour"""
+        old_entry = self._data.get(key)
+        if old_entry is not None:
+            self._unindex_entry(key, old_entry)
+        self._data[key] = entry
+        self._index_entry(key, entry)
+        self.version += 1
+
+    def update_entry(self, key, field, value):
+        """Modifie un champ d'une entrée existante en maintenant les index à jour"""
+        entry = self._data[key]
+        self._unindex_entry(key, entry)
+        # Entrée remplacée, jamais modifiée: les instantanés des threads de travail gardent l'ancienne
+        entry = dict(entry, **{field: value})
+        self._data[key] = entry
+        self._index_entry(key, entry)
+        self.version += 1
+
+    def rename_entry(self, old_key, new_key, entry=None):
+        """Renomme une entrée sans changer sa position dans la base (Ligne BDD des factures inchangée)
+
+        Args:
+            entry (dict): Nouveau contenu de l'entrée (contenu actuel si absent)
+        """
+        if new_key in self._data:
+            raise ValueError(f"L'entrée {new_key} existe déjà")
+        old_entry = self._data[old_key]
+        entry = old_entry if entry is None else entry
+        self._unindex_entry(old_key, old_entry)
+        self._data = {new_key if key == old_key else key: value for key, value in self._data.items()}
+        self._data[new_key] = entry
+        self._index_entry(new_key, entry)
+        self.version += 1
+
+    def remove_entry(self, key):
+        """Supprime une entrée et la retire des index"""
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._unindex_entry(key, entry)
+            self.version += 1
+        return entry
+
+    def find_by_code(self, field, code):
+        """Retourne les clés des entrées portant exactement ce code
+
+        Args:
+            field (str): 'client_code' ou 'chorus_code'
+            code (str): Code recherché (comparé après normalisation)
+
+        Returns:
+            set: Clés des entrées correspondantes
+        """
+        return set(self._code_indexes[field].get(normalize_text(code), ()))
+
+    def find_by_postal_code(self, postal_code):
+        """Retourne les clés des entrées dont l'adresse porte ce code postal"""
+        return self._addresses.by_postal_code(str(postal_code).strip())
+
+    def match_invoices(self, invoices):
+        """Meilleure entrée pour chaque facture d'un lot (similarité TF-IDF, voir matching_engine.match_batch)
+
+        Args:
+            invoices (list): Tuples (nom_facture, adresse_facture)
+
+        Returns:
+            list: Résultat de concordance (ou None) pour chaque facture
+        """
+        return match_batch(
+            self._tfidf, self._data, invoices, self._current_positions(), self._addresses, self._canonical,
+            phonetic=self._phonetic,
+        )
+
+    def _current_positions(self):
+        """Clé -> position dans la base (Ligne BDD - 1), recalculé seulement après une modification"""
+        if self._positions is None or self._positions_version != self.version:
+            self._positions = {key: position for position, key in enumerate(self._data)}
+            self._positions_version = self.version
+        return self._positions
+
+    def content_fingerprint(self):
+        """Empreinte persistante du référentiel (voir match_cache), recalculée seulement après une modification"""
+        if self._fingerprint is None or self._fingerprint_version != self.version:
+            self._fingerprint = referential_fingerprint(self._data)
+            self._fingerprint_version = self.version
+        return self._fingerprint
+
+    def matching_fingerprint(self):
+        """Empreinte des réglages de la concordance (voir match_cache): version et abréviations"""
+        return matching_fingerprint(self.vocabulary.fingerprint)
+
+    def matching_snapshot(self):
+        """Référentiel compilé à transmettre aux threads et processus de recherche (voir parallel_matching)
+
+        Appelé depuis le thread de l'interface: l'index TF-IDF y est compilé et
+        les index sont copiés figés, la base pouvant être modifiée pendant la recherche.
+
+        Returns:
+            tuple: (index TF-IDF, données, positions, index des adresses, index des formes canoniques,
+            index MinHash-LSH ou None, index des clés phonétiques)
+        """
+        return (
+            self._tfidf.frozen(), dict(self._data), self._current_positions(), self._addresses.frozen(),
+            self._canonical.frozen(), self._lsh if len(self._data) >= LSH_MIN_ENTRIES else None,
+            self._phonetic.frozen(),
+        )
+
+    def save_lsh(self):
+        """Enregistre l'index MinHash-LSH s'il a été mis à jour depuis sa lecture (fermeture de l'application)"""
+        try:
+            self._lsh.save_if_dirty()
+        except Exception as e:
+            logger.warning(f"Impossible d'enregistrer l'index MinHash-LSH: {str(e)}")
+
+    def load_abbreviations(self):
+        """Charge le vocabulaire (abbreviations.json à côté de database.json) et réindexe les noms et les adresses"""
+        path = os.path.join(os.path.dirname(self.db_file), ABBREVIATIONS_FILE)
+        self.vocabulary = load_vocabulary(path)
+        self._canonical = CanonicalIndex(Canonicalizer(self.vocabulary.names))
+        self._phonetic = PhoneticIndex(self.vocabulary.names)
+        self._addresses = AddressIndex(self.vocabulary.addresses)
+        for key, entry in self._data.items():
+            self._canonical.add(key, DUPLICATE_KEY_SUFFIX.sub('', str(key)))
+            self._phonetic.add(key, DUPLICATE_KEY_SUFFIX.sub('', str(key)))
+            if isinstance(entry, dict) and entry.get('address'):
+                self._addresses.add(key, entry['address'])
+        self.version += 1
+
+    def duplicate_codes(self, field):
+        """Retourne les codes partagés par plusieurs entrées (code -> clés triées)"""
+        return {
+            code: sorted(keys)
+            for code, keys in self._code_indexes[field].items()
+            if len(keys) > 1
+        }
 
     def load_file(self, file_path):
         """Charge les données depuis un fichier JSON"""
@@ -613,10 +849,7 @@ class Database:
                 data = json.load(f)
 
             # Normaliser les noms pour la recherche
-            normalized_data = {}
-            for key, value in data.items():
-                normalized_key = normalize_text(key)
-                normalized_data[normalized_key] = value
+            normalized_data = dict(zip(normalize_many(data.keys()), data.values()))
 
             self.data = normalized_data
             self._loaded = True
@@ -712,12 +945,12 @@ class Database:
             final_name = f"{base_name}_{counter}"
             counter += 1
 
-        self.data[final_name] = {
+        self.set_entry(final_name, {
             'name': name,
             'client_code': client_code if client_code is not None else "",
             'chorus_code': chorus_code if chorus_code is not None else "",
             'address': address if address is not None else ""
-        }
+        })
         return final_name
 
     def load_from_dataframe(self, df, mapping):
@@ -848,6 +1081,12 @@ class Database:
         query = normalize_text(query)
         results = {}
         
+        # Recherche exacte sur un code: consultation directe de l'index inverse
+        if exact_match and category in self._code_indexes:
+            for name in self._code_indexes[category].get(query, ()):
+                results[name] = self.data[name]
+            return results
+        
         for name, entry in self.data.items():
             # Si une catégorie est spécifiée, ne chercher que dans cette catégorie
             if category and category in entry:
@@ -877,6 +1116,89 @@ class Database:
                     results[name] = entry
         return results
 
+    @classmethod
+    def _match_rank(cls, query, value):
+        """Rang de pertinence de `query` dans `value` (None si absent)"""
+        position = value.find(query)
+        if position < 0:
+            return None
+        if position == 0:
+            return cls.RANK_EXACT if len(value) == len(query) else cls.RANK_PREFIX
+        # Début d'un mot à l'intérieur du champ
+        while position > 0:
+            if not value[position - 1].isalnum():
+                return cls.RANK_TOKEN
+            position = value.find(query, position + 1)
+        return cls.RANK_SUBSTRING
+
+    def search_ranked(self, query, category=None):
+        """Recherche classée par pertinence, consommée page par page
+
+        Ordre: correspondance exacte, préfixe, début de mot, sous-chaîne, puis
+        priorité du champ (nom, code client, code chorus, adresse) et ordre de la base.
+
+        Args:
+            query (str): Texte à rechercher
+            category (str, optional): Limiter la recherche à un champ de RANKED_SEARCH_FIELDS
+
+        Returns:
+            SearchCursor: Curseur dont fetch_more() renvoie les clés des k résultats suivants
+        """
+        query = normalize_text(query)
+        if not query:
+            return SearchCursor([])
+        
+        if category is not None:
+            field_ranks = [(self.RANKED_SEARCH_FIELDS.index(category), category)]
+        else:
+            field_ranks = list(enumerate(self.RANKED_SEARCH_FIELDS))
+        
+        match_rank = self._match_rank
+        search_fields = self._search_fields
+        scored = []
+        # Parcours dans l'ordre de la base: la position départage les égalités
+        for position, key in enumerate(self._data):
+            values = search_fields.get(key)
+            if values is None:
+                continue
+            best = None
+            for field_rank, _ in field_ranks:
+                rank = match_rank(query, values[field_rank])
+                if rank is not None and (best is None or rank < best[0]):
+                    best = (rank, field_rank)
+                    if rank == self.RANK_EXACT:
+                        break
+            if best is not None:
+                scored.append((best[0], best[1], position, key))
+        return SearchCursor(scored)
+
+
+class SearchCursor:
+    """Résultats d'une recherche classée, extraits page par page
+
+    Les candidats (rang, champ, position, clé) sont organisés en tas une seule
+    fois (O(n), sur place); chaque page dépile ensuite ses k résultats
+    (O(k log n)) à partir de l'état laissé par la page précédente.
+    """
+
+    def __init__(self, scored):
+        heapq.heapify(scored)
+        self._heap = scored
+        self.total = len(scored)
+        self.returned = 0
+
+    @property
+    def has_more(self):
+        """True s'il reste des résultats non encore renvoyés"""
+        return self.returned < self.total
+
+    def fetch_more(self, count):
+        """Renvoie les clés des `count` résultats suivants, par pertinence décroissante"""
+        heap = self._heap
+        page = [heapq.heappop(heap)[3] for _ in range(min(max(count, 0), len(heap)))]
+        self.returned += len(page)
+        return page
+
 
 class CustomButton(QPushButton):
     def __init__(self, text, parent=None):
@@ -1036,6 +1358,329 @@ class ConfirmationDialog(QDialog):
         self.setLayout(layout)
 
 
+class AliasReviewDialog(QDialog):
+    """Revue et suppression des alias appris des validations manuelles"""
+
+    COLUMNS = ["Nom facture", "Adresse facture", "Nom BDD", "Ligne BDD", "Validations", "Dernière validation"]
+
+    def __init__(self, alias_table, database, parent=None):
+        super().__init__(parent)
+        self.alias_table = alias_table
+        self.database = database
+        self.modified = False
+        self.setWindowTitle("Alias appris")
+        self.setMinimumSize(900, 500)
+
+        layout = QVBoxLayout()
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+
+        # Boutons
+        button_layout = QHBoxLayout()
+        remove_btn = CustomButton("Supprimer la sélection")
+        remove_stale_btn = CustomButton("Supprimer les alias obsolètes")
+        close_btn = CustomButton("Fermer")
+
+        remove_btn.clicked.connect(self.remove_selected)
+        remove_stale_btn.clicked.connect(self.remove_stale)
+        close_btn.clicked.connect(self.accept)
+
+        button_layout.addWidget(remove_btn)
+        button_layout.addWidget(remove_stale_btn)
+        button_layout.addStretch()
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+
+        self.setLayout(layout)
+        self.refresh()
+
+    def refresh(self):
+        """Remplit le tableau avec les alias actuels"""
+        positions = {key: position for position, key in enumerate(self.database.data)}
+        stale = 0
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(self.alias_table.aliases))
+        for row, (alias, record) in enumerate(sorted(self.alias_table.aliases.items(), key=lambda item: item[1].get('nom', ''))):
+            key = record.get('key')
+            position = positions.get(key)
+            values = [
+                record.get('nom', ''),
+                record.get('adresse', ''),
+                key,
+                str(position + 1) if position is not None else "introuvable",
+                str(record.get('validations', 1)),
+                record.get('date', ''),
+            ]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setData(Qt.ItemDataRole.UserRole, alias)
+                if position is None:
+                    item.setForeground(QColor(CYBERPUNK_COLORS['warning']))
+                self.table.setItem(row, col, item)
+            if position is None:
+                stale += 1
+        self.table.setSortingEnabled(True)
+        self.table.resizeColumnsToContents()
+        self.summary_label.setText(f"{len(self.alias_table)} alias, dont {stale} vers une entrée supprimée de la base")
+
+    def remove_selected(self):
+        """Supprime les alias des lignes sélectionnées"""
+        rows = {index.row() for index in self.table.selectionModel().selectedRows()}
+        aliases = [self.table.item(row, 0).data(Qt.ItemDataRole.UserRole) for row in rows]
+        if aliases and self.alias_table.remove(aliases):
+            self.modified = True
+            self.refresh()
+
+    def remove_stale(self):
+        """Supprime les alias dont l'entrée n'existe plus dans la base"""
+        if self.alias_table.remove(self.alias_table.stale_aliases(self.database.data)):
+            self.modified = True
+            self.refresh()
+
+
+def format_amount(amount):
+    """Montant en euros à la française (1 234,50 €)"""
+    return f"{amount:,.2f} €".replace(",", "\u202f").replace(".", ",")
+
+
+class InvoiceSummaryDialog(QDialog):
+    """Synthèse des montants des factures importées, par UH et par client (voir invoice_totals)"""
+
+    UH_COLUMNS = ["UH", "Factures", "Montant", "Première date", "Dernière date"]
+    CLIENT_COLUMNS = ["Nom facture", "Factures", "Montant"]
+
+    def __init__(self, totals, parent=None):
+        super().__init__(parent)
+        self.totals = totals
+        self.setWindowTitle("Synthèse des montants")
+        self.setMinimumSize(900, 500)
+
+        layout = QVBoxLayout()
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        tables = QHBoxLayout()
+        self.uh_table = self._new_table(self.UH_COLUMNS)
+        self.client_table = self._new_table(self.CLIENT_COLUMNS)
+        tables.addWidget(self.uh_table)
+        tables.addWidget(self.client_table)
+        layout.addLayout(tables)
+
+        # Boutons
+        button_layout = QHBoxLayout()
+        close_btn = CustomButton("Fermer")
+        close_btn.clicked.connect(self.accept)
+        button_layout.addStretch()
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+
+        self.setLayout(layout)
+        self.refresh()
+
+    @staticmethod
+    def _new_table(columns):
+        table = QTableWidget()
+        table.setColumnCount(len(columns))
+        table.setHorizontalHeaderLabels(columns)
+        table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        table.horizontalHeader().setStretchLastSection(True)
+        return table
+
+    @staticmethod
+    def _fill(table, rows):
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if col in (1, 2):
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                table.setItem(row, col, item)
+        table.resizeColumnsToContents()
+
+    def refresh(self):
+        """Remplit les tableaux avec les totaux actuels"""
+        by_uh = self.totals.by_uh()
+        by_client = self.totals.by_client()
+        self._fill(self.uh_table, [
+            (uh, str(count), format_amount(amount), first, last)
+            for uh, count, amount, first, last in by_uh
+        ])
+        self._fill(self.client_table, [
+            (client, str(count), format_amount(amount)) for client, count, amount in by_client
+        ])
+        self.summary_label.setText(
+            f"{len(self.totals)} factures, {len(by_uh)} UH, {len(by_client)} clients: "
+            f"{format_amount(self.totals.total)}"
+        )
+
+
+# Rôle de la cellule "Nom facture" portant les entrées suggérées pour la colonne "Ligne BDD"
+SUGGESTIONS_ROLE = Qt.ItemDataRole.UserRole + 1
+
+# Rôle de la cellule "N°Facture" portant la position du numéro dans le fichier (feuille, ligne, colonne)
+INVOICE_CELL_ROLE = Qt.ItemDataRole.UserRole + 2
+
+# Rôle de la cellule "Ligne BDD" portant la valeur remplie par le traitement (distingue le choix de l'opérateur)
+AUTO_LINE_ROLE = Qt.ItemDataRole.UserRole + 3
+
+
+def sync_snapshot_lsh(snapshot):
+    """Met l'index MinHash-LSH d'un instantané à jour de ses entrées (dans le thread de travail:
+    la première fois, l'index est relu ou construit entièrement)"""
+    lsh = snapshot[5]
+    if lsh is not None:
+        lsh.sync(snapshot[1], lambda key: DUPLICATE_KEY_SUFFIX.sub('', str(key)))
+
+
+class MatchingThread(QThread):
+    """Thread de travail du traitement des factures (voir invoice_matching.run_matching)"""
+    progress = pyqtSignal(int, str)
+    finished = pyqtSignal(list, dict)
+    error = pyqtSignal(str)
+
+    def __init__(self, snapshot, records, aliases=None, cache=None):
+        super().__init__()
+        self.snapshot = snapshot
+        self.records = records
+        self.aliases = aliases
+        self.cache = cache
+
+    def run(self):
+        try:
+            sync_snapshot_lsh(self.snapshot)
+            results, stats = run_matching(
+                self.snapshot, self.records, self.aliases, self.cache,
+                progress=lambda count, uh: self.progress.emit(count, uh or ""),
+                should_stop=self.isInterruptionRequested,
+            )
+            self.finished.emit(results, stats)
+        except Exception as e:
+            self.error.emit(str(e))
+            logger.error(f"Erreur dans le thread de traitement: {str(e)}")
+
+
+class InvoiceLoaderThread(QThread):
+    """Thread de lecture d'un fichier de facturation (voir invoice_parser.parse_invoice_workbook)
+
+    Les factures sont transmises feuille par feuille, dans l'ordre du classeur.
+    """
+    sheet_loaded = pyqtSignal(int, str, list)
+    progress = pyqtSignal(int, int, str)
+    finished = pyqtSignal(int, int, bool)
+    error = pyqtSignal(int, str)
+
+    def __init__(self, generation, file_path, cache=None):
+        super().__init__()
+        self.generation = generation
+        self.file_path = file_path
+        self.cache = cache
+
+    def run(self):
+        try:
+            _, ignored, interrupted = parse_invoice_workbook(
+                self.file_path,
+                progress=lambda done, total, sheet_name: self.progress.emit(done, total, sheet_name),
+                should_stop=self.isInterruptionRequested,
+                cache=self.cache,
+                on_sheet=lambda sheet_name, invoices, _: self.sheet_loaded.emit(self.generation, sheet_name, invoices),
+            )
+            self.finished.emit(self.generation, ignored, interrupted)
+        except Exception as e:
+            self.error.emit(self.generation, str(e))
+            logger.error(f"Erreur dans le thread de lecture des factures: {str(e)}", exc_info=True)
+
+
+class SuggestionThread(QThread):
+    """Thread calculant en arrière-plan les entrées candidates de chaque facture"""
+    finished = pyqtSignal(int, list)
+    error = pyqtSignal(str)
+
+    def __init__(self, generation, snapshot, invoices):
+        super().__init__()
+        self.generation = generation
+        self.snapshot = snapshot
+        self.invoices = invoices
+
+    def run(self):
+        try:
+            sync_snapshot_lsh(self.snapshot)
+            index, data, positions, addresses, _, lsh, phonetic = self.snapshot
+            self.finished.emit(
+                self.generation, suggest_batch(index, data, self.invoices, positions, addresses, lsh, phonetic)
+            )
+        except Exception as e:
+            self.error.emit(str(e))
+            logger.error(f"Erreur dans le thread de suggestions: {str(e)}")
+
+
+class LigneBddDelegate(QStyledItemDelegate):
+    """Éditeur de la colonne "Ligne BDD": liste déroulante des entrées suggérées pour la facture
+
+    Sans suggestion pour la ligne, l'éditeur texte habituel est utilisé. Un numéro
+    de ligne peut toujours être saisi directement dans la liste.
+    """
+
+    def __init__(self, name_column, parent=None):
+        super().__init__(parent)
+        self.name_column = name_column
+
+    def createEditor(self, parent, option, index):
+        suggestions = index.sibling(index.row(), self.name_column).data(SUGGESTIONS_ROLE)
+        if not suggestions:
+            return super().createEditor(parent, option, index)
+        
+        combo = QComboBox(parent)
+        combo.setEditable(True)
+        for suggestion in suggestions:
+            combo.addItem(
+                f"{suggestion['position'] + 1} - {suggestion['name']} "
+                f"(client: {suggestion['client_code'] or '-'}, chorus: {suggestion['chorus_code'] or '-'}) "
+                f"{suggestion['score']}%",
+                suggestion['position'] + 1
+            )
+        # Un clic sur une suggestion la valide immédiatement
+        combo.activated.connect(lambda _: self._commit_and_close(combo))
+        QTimer.singleShot(0, combo.showPopup)
+        return combo
+
+    def _commit_and_close(self, editor):
+        self.commitData.emit(editor)
+        self.closeEditor.emit(editor)
+
+    def setEditorData(self, editor, index):
+        if isinstance(editor, QComboBox):
+            editor.setCurrentIndex(-1)
+            editor.setEditText(index.data() or "")
+        else:
+            super().setEditorData(editor, index)
+
+    def setModelData(self, editor, model, index):
+        if isinstance(editor, QComboBox):
+            text = editor.currentText().strip()
+            suggestion_index = editor.findText(text)
+            if suggestion_index >= 0:
+                value = str(editor.itemData(suggestion_index))
+            else:
+                # Saisie libre: le numéro de ligne est le premier mot
+                value = text.split(' ', 1)[0] if text else ""
+            model.setData(index, value)
+        else:
+            super().setModelData(editor, model, index)
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -1058,6 +1703,8 @@ class MainWindow(QMainWindow):
         
         # Gestion des modifications en attente
         self.pending_changes = {}
+        # Entrées renommées dans le tableau, en attente d'enregistrement (ancien nom -> nouveau nom)
+        self.pending_renames = {}
         self._updating_table = False  # Drapeau pour éviter les boucles de mise à jour
         
         # Activer les boutons de minimisation et plein écran pour la fenêtre principale
@@ -1252,6 +1899,9 @@ class MainWindow(QMainWindow):
             
         try:
             search_text = self.db_search_edit.text().strip().lower()
+            self.db_search_cursor = None
+            self._reset_db_rank_order()
+            self._update_db_search_status()
             if not force and not search_text:
                 # Si le champ est vide, afficher toutes les lignes
                 for row in range(self.db_table.rowCount()):
@@ -1281,25 +1931,14 @@ class MainWindow(QMainWindow):
                     self.db_table.setRowHidden(row, False)
                 return
             
-            # Nombre de correspondances trouvées
-            matches = 0
-            
-            # Parcourir toutes les lignes du tableau
+            # Recherche classée: seules les lignes les plus pertinentes sont affichées,
+            # les suivantes via le bouton "Plus de résultats"
+            self.db_search_cursor = self.database.search_ranked(search_text)
             for row in range(self.db_table.rowCount()):
-                hide_row = True
-                
-                # Vérifier chaque colonne de la ligne
-                for col in range(self.db_table.columnCount()):
-                    item = self.db_table.item(row, col)
-                    if item is not None and search_text in item.text().lower():
-                        hide_row = False
-                        matches += 1
-                        break
-                
-                # Masquer ou afficher la ligne selon les résultats
-                self.db_table.setRowHidden(row, hide_row)
+                self.db_table.setRowHidden(row, True)
+            self.show_more_database_results()
             
-            logger.debug(f"{matches} correspondance(s) trouvée(s) pour '{search_text}'")
+            logger.debug(f"{self.db_search_cursor.total} correspondance(s) trouvée(s) pour '{search_text}'")
             
         except Exception as e:
             logger.error(f"Erreur lors du filtrage de la base de données: {e}", exc_info=True)
@@ -1314,6 +1953,74 @@ class MainWindow(QMainWindow):
                 self.db_table.setUpdatesEnabled(True)
                 self.db_table.viewport().update()
                 
+    def show_more_database_results(self):
+        """Affiche la page suivante des résultats de la recherche classée"""
+        cursor = getattr(self, 'db_search_cursor', None)
+        if cursor is None:
+            return
+        # Lignes placées en tête du tableau dans l'ordre du classement (ordre
+        # d'affichage seulement: les indices des lignes ne changent pas)
+        header = self.db_table.verticalHeader()
+        for row in self._db_rows_for_keys(cursor.fetch_more(DB_SEARCH_PAGE_SIZE)):
+            target = len(self._db_rank_moves)
+            visual = header.visualIndex(row)
+            if visual != target:
+                header.moveSection(visual, target)
+            self._db_rank_moves.append((visual, target))
+            self.db_table.setRowHidden(row, False)
+        self._update_db_search_status()
+    
+    def _reset_db_rank_order(self):
+        """Rend aux lignes du tableau de la base leur ordre d'affichage d'origine"""
+        moves = getattr(self, '_db_rank_moves', [])
+        header = self.db_table.verticalHeader()
+        for visual, target in reversed(moves):
+            if visual != target:
+                header.moveSection(target, visual)
+        self._db_rank_moves = []
+        # Lignes ajoutées ou supprimées depuis le classement: ordre rétabli section par section
+        for row in range(self.db_table.rowCount()):
+            visual = header.visualIndex(row)
+            if visual != row:
+                header.moveSection(visual, row)
+    
+    def _db_rows_for_keys(self, keys):
+        """Lignes du tableau de la base pour des clés
+        
+        L'index clé -> ligne est reconstruit d'après la colonne Nom dès qu'il ne
+        correspond plus au tableau (ligne ajoutée, supprimée ou renommée).
+        """
+        keys = list(keys)
+        row_by_key = getattr(self, 'db_row_by_key', {})
+        for key in keys:
+            row = row_by_key.get(key)
+            item = self.db_table.item(row, 1) if row is not None else None
+            if item is None or item.text() != key:
+                row_by_key = self._rebuild_db_row_index()
+                break
+        return [row_by_key[key] for key in keys if key in row_by_key]
+    
+    def _rebuild_db_row_index(self):
+        """Reconstruit l'index clé -> ligne du tableau de la base"""
+        self.db_row_by_key = {}
+        for row in range(self.db_table.rowCount()):
+            item = self.db_table.item(row, 1)
+            if item is not None and item.text():
+                self.db_row_by_key.setdefault(item.text(), row)
+        return self.db_row_by_key
+    
+    def _update_db_search_status(self):
+        """Met à jour le compteur de résultats et la visibilité du bouton Plus de résultats"""
+        if not hasattr(self, 'db_more_results_btn'):
+            return
+        cursor = getattr(self, 'db_search_cursor', None)
+        if cursor is None:
+            self.db_search_status_label.setText("")
+            self.db_more_results_btn.setVisible(False)
+            return
+        self.db_search_status_label.setText(f"{cursor.returned} / {cursor.total} résultat(s)")
+        self.db_more_results_btn.setVisible(cursor.has_more)
+    
     def setup_database_interface(self):
         """Configure l'interface de la base de données"""
         logger.debug("[SETUP_DB_INTERFACE] Début de l'initialisation de l'interface")
@@ -1450,6 +2157,18 @@ class MainWindow(QMainWindow):
                 
             name = name_item.text().strip()
             
+            # Nom modifié: renommage de l'entrée chargée dans cette ligne
+            old_name = name_item.data(Qt.ItemDataRole.UserRole)
+            if column == 1 and old_name and old_name != name:
+                origin = next((old for old, new in self.pending_renames.items() if new == old_name), old_name)
+                self.pending_renames[origin] = name
+                self.pending_changes.pop(old_name, None)
+                self.db_table.blockSignals(True)
+                try:
+                    name_item.setData(Qt.ItemDataRole.UserRole, name)
+                finally:
+                    self.db_table.blockSignals(False)
+            
             # Mettre à jour les modifications en attente
             self.pending_changes[name] = {
                 'client_code': self.db_table.item(row, 2).text() if self.db_table.item(row, 2) else "",
@@ -1472,9 +2191,24 @@ class MainWindow(QMainWindow):
             return
             
         try:
+            # Entrées renommées: même position dans la base, alias reportés sur le nouveau nom
+            renommees = {}
+            for old_name, name in self.pending_renames.items():
+                if old_name in self.database.data and name not in self.database.data:
+                    self.database.rename_entry(old_name, name)
+                    renommees[old_name] = name
+            self.pending_renames.clear()
+            if renommees:
+                alias_table = self.get_alias_table()
+                for old_name, name in renommees.items():
+                    alias_table.rename_key(old_name, name)
+                self.state_save_timer.start(2000)
+            
             # Mettre à jour uniquement les entrées modifiées
+            nouvelles = [name for name in self.pending_changes if name not in self.database.data]
+            modifiees = list(self.pending_changes)
             for name, data in self.pending_changes.items():
-                self.database.data[name] = data
+                self.database.set_entry(name, data)
                 
             # Sauvegarder dans le fichier
             self.database.save_database()
@@ -1484,6 +2218,9 @@ class MainWindow(QMainWindow):
             # Mettre à jour l'interface utilisateur si nécessaire
             self.statusBar().showMessage("Modifications sauvegardées", 3000)
             
+            # Recalculer les seules factures concernées par les entrées modifiées
+            self.rematch_invoices(modifiees, nouvelles, renommees)
+            
         except Exception as e:
             logger.error(f"Erreur lors de la sauvegarde automatique: {e}")
             QMessageBox.warning(self, "Erreur", 
@@ -1507,9 +2244,12 @@ class MainWindow(QMainWindow):
             self.db_table.blockSignals(True)
             self._updating_table = True
             self.pending_changes.clear()  # Vider les modifications en attente
+            self.pending_renames.clear()
             
             # Vider le tableau
             self.db_table.setRowCount(0)
+            self.db_row_by_key = {}
+            self._db_rank_moves = []
             
             # Charger les données
             # Vérifier si self.database.data est un dictionnaire (format attendu)
@@ -1518,12 +2258,15 @@ class MainWindow(QMainWindow):
                 for name, data in self.database.data.items():
                     row_position = self.db_table.rowCount()
                     self.db_table.insertRow(row_position)
+                    self.db_row_by_key[name] = row_position
                     
                     # Ajouter le numéro de ligne dans la première colonne (#)
                     self.db_table.setItem(row_position, 0, QTableWidgetItem(str(row_position + 1)))
                     
-                    # Ajouter les données dans les autres colonnes
-                    self.db_table.setItem(row_position, 1, QTableWidgetItem(name))
+                    # Ajouter les données dans les autres colonnes (le nom garde la clé chargée, voir on_db_cell_changed)
+                    name_item = QTableWidgetItem(name)
+                    name_item.setData(Qt.ItemDataRole.UserRole, name)
+                    self.db_table.setItem(row_position, 1, name_item)
                     
                     # Vérifier si data est un dictionnaire
                     if isinstance(data, dict):
@@ -1588,6 +2331,18 @@ class MainWindow(QMainWindow):
         
         self.database_layout.addLayout(search_layout)
         
+        # Pagination des résultats de recherche
+        search_results_layout = QHBoxLayout()
+        self.db_search_status_label = QLabel("")
+        search_results_layout.addWidget(self.db_search_status_label)
+        search_results_layout.addStretch()
+        self.db_more_results_btn = QPushButton("Plus de résultats")
+        self.db_more_results_btn.clicked.connect(self.show_more_database_results)
+        self.db_more_results_btn.setVisible(False)
+        search_results_layout.addWidget(self.db_more_results_btn)
+        
+        self.database_layout.addLayout(search_results_layout)
+        
         # Tableau de la base de données
         self.db_table = QTableWidget()
         self.db_table.setColumnCount(5)  # Ajout d'une colonne pour le numéro de ligne
@@ -2087,15 +2842,12 @@ class MainWindow(QMainWindow):
             # Mettre à jour la barre de statut
             self.statusBar().showMessage(f"Chargement de la facture : {os.path.basename(file_path)}")
             
-            # Traiter le fichier de facture
+            # Traiter le fichier de facture (lecture en arrière-plan, message à la fin de la lecture)
             self.process_invoice_file(file_path)
             
             # Mettre à jour le titre de la fenêtre avec le nom du fichier
             self.setWindowTitle(f"Gestionnaire de Factures - {os.path.basename(file_path)}")
             
-            # Afficher un message de succès
-            self.statusBar().showMessage(f"Facture chargée : {os.path.basename(file_path)}", 5000)
-            
         except Exception as e:
             QMessageBox.critical(
                 self,
@@ -2106,138 +2858,45 @@ class MainWindow(QMainWindow):
             self.statusBar().showMessage("Erreur lors du chargement de la facture", 5000)
     
     def process_invoice_file(self, file_path):
-        """Traite un fichier Excel de facturation pour en extraire les informations
+        """Lit un fichier Excel de facturation dans un thread de travail
+        
+        Le tableau des factures se remplit feuille par feuille pendant la lecture;
+        l'annulation garde les factures des feuilles déjà lues.
         
         Args:
             file_path (str): Chemin vers le fichier Excel à traiter
         """
         try:
-            # Afficher un message de progression
+            # Une lecture encore en cours est abandonnée: ses signaux sont ignorés
+            self.stop_invoice_loading()
+            self._loading_generation = getattr(self, '_loading_generation', 0) + 1
+            self.invoices = []
+            self.invoice_totals = InvoiceTotals()
+            if hasattr(self, 'invoice_table'):
+                self.invoice_table.setRowCount(0)
+            else:
+                self.update_invoice_table()
+            self.reset_candidate_suggestions()
+            
+            # Fenêtre de progression non modale: le tableau reste utilisable pendant la lecture
             progress_dialog = QProgressDialog("Traitement du fichier de facturation...", "Annuler", 0, 100, self)
             progress_dialog.setWindowTitle("Importation des factures")
-            progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+            progress_dialog.setWindowModality(Qt.WindowModality.NonModal)
             progress_dialog.setMinimumDuration(0)
+            progress_dialog.setAutoClose(False)
+            progress_dialog.setAutoReset(False)
             progress_dialog.show()
-            QApplication.processEvents()
-            
-            # Charger le fichier Excel avec openpyxl
-            workbook = load_workbook(file_path, data_only=True)
-            
-            # Initialiser la liste des factures et le compteur de factures ignorées
-            self.invoices = []
-            ignored_invoices = 0
-            
-            # Nombre total de feuilles pour le calcul de progression
-            total_sheets = len(workbook.sheetnames)
-            processed_sheets = 0
-            
-            # Parcourir chaque feuille (UH)
-            for sheet_name in workbook.sheetnames:
-                sheet = workbook[sheet_name]
-                
-                # Mettre à jour la progression
-                processed_sheets += 1
-                progress_percent = int((processed_sheets / total_sheets) * 100)
-                progress_dialog.setValue(progress_percent)
-                progress_dialog.setLabelText(f"Traitement de l'UH: {sheet_name}")
-                QApplication.processEvents()
-                
-                if progress_dialog.wasCanceled():
-                    break
-                
-                # Rechercher les cellules contenant "Intitulé"
-                for row_idx in range(1, sheet.max_row + 1):
-                    for col_idx in range(1, sheet.max_column + 1):
-                        cell = sheet.cell(row=row_idx, column=col_idx)
-                        
-                        # Si la cellule contient "Intitulé", c'est le début d'une facture
-                        if cell.value and "Intitulé" in str(cell.value):
-                            try:
-                                # Extraire le nom de la facture (6 cellules fusionnées à droite)
-                                invoice_name_cell = sheet.cell(row=row_idx, column=col_idx + 1)
-                                invoice_name = invoice_name_cell.value if invoice_name_cell.value else ""
-                                
-                                # Extraire le numéro de facture (7 cellules à droite)
-                                invoice_number_cell = sheet.cell(row=row_idx, column=col_idx + 7)
-                                invoice_number = invoice_number_cell.value if invoice_number_cell.value else ""
-                                
-                                # Extraire l'adresse (2 cellules en bas et 5 cellules à droite)
-                                address_cell = sheet.cell(row=row_idx + 2, column=col_idx + 5)
-                                address = address_cell.value if address_cell.value else ""
-                                
-                                # Vérifier si les cellules sont fusionnées et extraire toutes les valeurs
-                                # Pour le nom de la facture (qui peut être sur plusieurs cellules)
-                                for merged_cell in sheet.merged_cells.ranges:
-                                    if invoice_name_cell.coordinate in merged_cell:
-                                        # Extraire toutes les valeurs des cellules fusionnées
-                                        for row in range(merged_cell.min_row, merged_cell.max_row + 1):
-                                            for col in range(merged_cell.min_col, merged_cell.max_col + 1):
-                                                cell_value = sheet.cell(row=row, column=col).value
-                                                if cell_value and not invoice_name:
-                                                    invoice_name = cell_value
-                                
-                                # Pour l'adresse (qui peut être sur plusieurs cellules)
-                                for merged_cell in sheet.merged_cells.ranges:
-                                    if address_cell.coordinate in merged_cell:
-                                        # Extraire toutes les valeurs des cellules fusionnées
-                                        for row in range(merged_cell.min_row, merged_cell.max_row + 1):
-                                            for col in range(merged_cell.min_col, merged_cell.max_col + 1):
-                                                cell_value = sheet.cell(row=row, column=col).value
-                                                if cell_value and not address:
-                                                    address = cell_value
-                                
-                                # Vérifier si cette facture a déjà un code client
-                                # Le code client est à 2 cellules en dessous et 6 cellules à gauche de la cellule du numéro de facture
-                                code_client_row = row_idx + 2  # 2 cellules en dessous
-                                code_client_col = col_idx + 7 - 6  # 6 cellules à gauche de la cellule du numéro de facture (qui est à col_idx + 7)
-                                code_client_cell = sheet.cell(row=code_client_row, column=code_client_col)
-                                has_client_code = code_client_cell.value is not None and str(code_client_cell.value).strip() != ""
-                                
-                                # Si la facture a déjà un code client, on l'ignore
-                                if has_client_code:
-                                    ignored_invoices += 1
-                                    logger.debug(f"Facture ignorée car elle a déjà un code client: {invoice_number}")
-                                    continue
-                                
-                                # Créer un dictionnaire pour la facture
-                                invoice = {
-                                    "uh": sheet_name,
-                                    "numero": invoice_number,  # Numéro de facture
-                                    "client": invoice_name,    # Nom de la facture
-                                    "adresse": address,
-                                    "nom_bdd": "",           # Nouvelle colonne Nom BDD
-                                    "date": datetime.now().strftime("%Y-%m-%d"),  # Date par défaut
-                                    "montant": 0.0,  # Montant par défaut
-                                    "statut": "Importée",  # Statut par défaut
-                                    "code_client": "",      # Colonne vide
-                                    "code_chorus": "",      # Colonne vide
-                                    "ligne_bdd": ""         # Colonne vide
-                                }
-                                
-                                # Ajouter la facture à la liste
-                                self.invoices.append(invoice)
-                                
-                                # Log pour débogage
-                                logger.debug(f"Facture trouvée: {invoice}")
-                            except Exception as e:
-                                logger.error(f"Erreur lors de l'extraction d'une facture: {str(e)}")
-            
-            # Fermer la boîte de dialogue de progression
-            progress_dialog.close()
-            
-            # Mettre à jour le tableau des factures
-            self.update_invoice_table()
-            
-            # Afficher un message de succès avec le nombre de factures ignorées
-            message = f"{len(self.invoices)} factures ont été importées avec succès."
-            if ignored_invoices > 0:
-                message += f"\n{ignored_invoices} factures ont été ignorées car elles ont déjà un code client."
-            
-            QMessageBox.information(
-                self,
-                "Importation terminée",
-                message
-            )
+            self._loading_dialog = progress_dialog
+            
+            # Lecture en flux du classeur, une seule fois; feuilles inchangées reprises du cache (voir invoice_parser)
+            thread = InvoiceLoaderThread(self._loading_generation, file_path, self.get_parse_cache())
+            thread.sheet_loaded.connect(self._on_invoice_sheet_loaded)
+            thread.progress.connect(self._on_invoice_loading_progress)
+            thread.finished.connect(self._on_invoice_loading_finished)
+            thread.error.connect(self._on_invoice_loading_error)
+            progress_dialog.canceled.connect(thread.requestInterruption)
+            self._invoice_loader = thread
+            thread.start()
             
         except Exception as e:
             logger.error(f"Erreur lors du traitement du fichier de facturation: {str(e)}", exc_info=True)
@@ -2247,6 +2906,81 @@ class MainWindow(QMainWindow):
                 f"Une erreur est survenue lors du traitement du fichier: {str(e)}"
             )
     
+    def stop_invoice_loading(self):
+        """Interrompt la lecture d'un fichier de facturation en cours et attend la fin du thread"""
+        thread = getattr(self, '_invoice_loader', None)
+        if thread is not None and thread.isRunning():
+            thread.requestInterruption()
+            thread.wait()
+        self._close_loading_dialog()
+    
+    def stop_background_threads(self):
+        """Interrompt les recherches en cours (concordances, suggestions) et attend la fin de leurs threads"""
+        threads = list(getattr(self, '_suggestion_threads', []))
+        for name in ('_matching_thread', '_rematch_thread'):
+            if getattr(self, name, None) is not None:
+                threads.append(getattr(self, name))
+        for thread in threads:
+            thread.requestInterruption()
+        for thread in threads:
+            thread.wait()
+    
+    def _close_loading_dialog(self):
+        dialog = getattr(self, '_loading_dialog', None)
+        if dialog is not None:
+            dialog.close()
+            self._loading_dialog = None
+    
+    def _on_invoice_loading_progress(self, processed_sheets, total_sheets, sheet_name):
+        dialog = getattr(self, '_loading_dialog', None)
+        if dialog is not None and total_sheets:
+            dialog.setValue(int((processed_sheets / total_sheets) * 100))
+            dialog.setLabelText(f"Traitement de l'UH: {sheet_name}")
+    
+    def _on_invoice_sheet_loaded(self, generation, sheet_name, invoices):
+        """Ajoute au tableau les factures d'une feuille lue"""
+        if generation != self._loading_generation or not invoices:
+            return
+        self.invoices.extend(invoices)
+        self.invoice_totals.extend(invoices)
+        # Suggestions de "Ligne BDD" calculées en arrière-plan dès la lecture de la feuille
+        self.queue_candidate_suggestions(self.append_invoice_rows(invoices))
+        self.statusBar().showMessage(f"{len(self.invoices)} factures chargées (UH {sheet_name})...")
+    
+    def _on_invoice_loading_finished(self, generation, ignored_invoices, interrupted):
+        if generation != self._loading_generation:
+            return
+        self._close_loading_dialog()
+        self.invoice_table.resizeColumnsToContents()
+        self.update_statistics()
+        
+        # Afficher un message de succès avec le nombre de factures ignorées
+        if interrupted:
+            message = f"Importation interrompue: {len(self.invoices)} factures des UH déjà lues ont été importées."
+        else:
+            message = f"{len(self.invoices)} factures ont été importées avec succès."
+        if ignored_invoices > 0:
+            message += f"\n{ignored_invoices} factures ont été ignorées car elles ont déjà un code client."
+        logger.info(message.replace("\n", " "))
+        self.statusBar().showMessage(message.split("\n")[0], 5000)
+        
+        QMessageBox.information(
+            self,
+            "Importation terminée",
+            message
+        )
+    
+    def _on_invoice_loading_error(self, generation, message):
+        if generation != self._loading_generation:
+            return
+        self._close_loading_dialog()
+        self.update_statistics()
+        QMessageBox.critical(
+            self,
+            "Erreur de traitement",
+            f"Une erreur est survenue lors du traitement du fichier: {message}"
+        )
+    
     def update_invoice_table(self):
         """Met à jour le tableau des factures avec les données importées"""
         try:
@@ -2291,13 +3025,43 @@ class MainWindow(QMainWindow):
                 return
             
             # Ajouter les factures au tableau
-            for i, invoice in enumerate(self.invoices):
+            self.append_invoice_rows(self.invoices)
+            
+            # Ajuster les colonnes pour qu'elles s'adaptent au contenu
+            self.invoice_table.resizeColumnsToContents()
+            
+            logger.info(f"{len(self.invoices)} factures affichées dans le tableau")
+            
+            # Mettre à jour les statistiques
+            self.update_statistics()
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la mise à jour du tableau des factures: {str(e)}", exc_info=True)
+    
+    def append_invoice_rows(self, invoices):
+        """Ajoute des factures à la fin du tableau des factures
+
+        Returns:
+            list: Éléments "Nom facture" des lignes ajoutées (ils suivent leur ligne quand le tableau est trié)
+        """
+        sorting_enabled = self.invoice_table.isSortingEnabled()
+        self.invoice_table.setSortingEnabled(False)
+        self.invoice_table.setUpdatesEnabled(False)
+        nom_items = []
+        try:
+            for invoice in invoices:
+                i = self.invoice_table.rowCount()
                 self.invoice_table.insertRow(i)
                 
                 # Ajouter les données de la facture au tableau avec les nouvelles colonnes
                 self.invoice_table.setItem(i, 0, QTableWidgetItem(invoice.get("uh", "")))
-                self.invoice_table.setItem(i, 1, QTableWidgetItem(str(invoice.get("numero", ""))))  # N° Facture
-                self.invoice_table.setItem(i, 2, QTableWidgetItem(invoice.get("client", "")))      # Nom facture
+                numero_item = QTableWidgetItem(str(invoice.get("numero", "")))                  # N° Facture
+                if invoice.get("cellule"):
+                    # Position relevée à l'importation, utilisée par la saisie des codes
+                    numero_item.setData(INVOICE_CELL_ROLE, list(invoice["cellule"]))
+                self.invoice_table.setItem(i, 1, numero_item)
+                nom_items.append(QTableWidgetItem(invoice.get("client", "")))
+                self.invoice_table.setItem(i, 2, nom_items[-1])                                   # Nom facture
                 self.invoice_table.setItem(i, 3, QTableWidgetItem(invoice.get("adresse", "")))     # Adresse facture
                 # Remplir les colonnes avec des valeurs vides
                 self.invoice_table.setItem(i, 4, QTableWidgetItem(""))                           # Nom BDD (vide)
@@ -2314,17 +3078,10 @@ class MainWindow(QMainWindow):
                 validate_btn.setStyleSheet("background-color: #4CAF50; color: white;")
                 validate_btn.clicked.connect(self.on_validate_button_clicked)
                 self.invoice_table.setCellWidget(i, 8, validate_btn)                          # Statut (bouton Valider)
-            
-            # Ajuster les colonnes pour qu'elles s'adaptent au contenu
-            self.invoice_table.resizeColumnsToContents()
-            
-            logger.info(f"{len(self.invoices)} factures affichées dans le tableau")
-            
-            # Mettre à jour les statistiques
-            self.update_statistics()
-            
-        except Exception as e:
-            logger.error(f"Erreur lors de la mise à jour du tableau des factures: {str(e)}", exc_info=True)
+        finally:
+            self.invoice_table.setUpdatesEnabled(True)
+            self.invoice_table.setSortingEnabled(sorting_enabled)
+        return nom_items
     
     def on_validate_button_clicked(self):
         """Méthode appelée quand un bouton Valider est cliqué - retrouve dynamiquement la ligne"""
@@ -2639,6 +3396,7 @@ class MainWindow(QMainWindow):
             
             # Compteurs pour le rapport
             factures_traitees = 0
+            factures_directes = 0
             total_rows = len(validated_rows)
             
             # Étape 3: Traitement des factures (30-90%)
@@ -2655,7 +3413,17 @@ class MainWindow(QMainWindow):
                 code_client = row_data['code_client']
                 code_chorus = row_data['code_chorus']
                 
-                # Traiter la facture (code existant)
+                # Position du numéro relevée à l'importation: codes insérés sans recherche
+                position = position_enregistree(
+                    row_data, lambda feuille, ligne, col: workbook.Sheets(feuille).Cells(ligne, col).Value
+                )
+                if position:
+                    ecrire_codes(ecrire_win32com(workbook.Sheets(position[0])), *position[1:], code_client, code_chorus)
+                    factures_traitees += 1
+                    factures_directes += 1
+                    continue
+                
+                # Position inconnue ou cellule modifiée: recherche dans la feuille de l'UH
                 facture_traitee = False
                 feuille_uh_trouvee = False
                 
@@ -2696,28 +3464,16 @@ class MainWindow(QMainWindow):
                         
                         # Si on a trouvé le numéro de facture, insérer les codes
                         if facture_trouvee:
-                            # Insérer le code client
-                            if code_client:
-                                client_cell_row = facture_row + 2
-                                client_cell_col = facture_col - 6
-                                if client_cell_col < 1:
-                                    client_cell_col = 1
-                                
-                                sheet.Cells(client_cell_row, client_cell_col).Value = code_client
-                            
-                            # Insérer le code chorus
-                            if code_chorus:
-                                chorus_cell_row = facture_row + 1
-                                chorus_cell_col = facture_col - 6
-                                if chorus_cell_col < 1:
-                                    chorus_cell_col = 1
-                                
-                                sheet.Cells(chorus_cell_row, chorus_cell_col).Value = code_chorus
-                            
+                            ecrire_codes(ecrire_win32com(sheet), facture_row, facture_col, code_client, code_chorus)
                             factures_traitees += 1
                             facture_traitee = True
                             break
             
+            logger.info(
+                f"Saisie des codes: {factures_traitees} facture(s) traitée(s), "
+                f"dont {factures_directes} à la position relevée à l'importation"
+            )
+            
             # Étape 4: Finalisation (90-100%)
             progress_dialog.setValue(90)
             progress_dialog.setLabelText("Sauvegarde du fichier...")
@@ -2789,7 +3545,8 @@ class MainWindow(QMainWindow):
                         'nom_bdd': self.invoice_table.item(row, 4).text() if self.invoice_table.item(row, 4) else "",
                         'code_client': self.invoice_table.item(row, 5).text() if self.invoice_table.item(row, 5) else "",
                         'code_chorus': self.invoice_table.item(row, 6).text() if self.invoice_table.item(row, 6) else "",
-                        'ligne_bdd': self.invoice_table.item(row, 7).text() if self.invoice_table.item(row, 7) else ""
+                        'ligne_bdd': self.invoice_table.item(row, 7).text() if self.invoice_table.item(row, 7) else "",
+                        'cellule': self.invoice_table.item(row, 1).data(INVOICE_CELL_ROLE) if self.invoice_table.item(row, 1) else None
                     }
                     validated_rows.append(row_data)
             
@@ -3105,6 +3862,10 @@ class MainWindow(QMainWindow):
             if 'last_directory' in state and os.path.isdir(state['last_directory']):
                 self.last_directory = state['last_directory']
                 
+            # Restaurer les alias appris des validations manuelles
+            if isinstance(state.get('manual_matches'), dict):
+                self.manual_matches = state['manual_matches']
+                
             # Restaurer le chemin du fichier de facture récent s'il existe, mais ne pas le charger automatiquement
             if 'recent_invoice' in state and os.path.exists(state['recent_invoice']):
                 self.current_invoice_path = state['recent_invoice']
@@ -3125,6 +3886,7 @@ class MainWindow(QMainWindow):
                 'geometry': self.saveGeometry().toHex().data().decode(),
                 'window_state': self.saveState().toHex().data().decode(),
                 'last_directory': getattr(self, 'last_directory', os.path.expanduser('~')),
+                'manual_matches': self.manual_matches,
             }
             
             # Ajouter le fichier de facture actuel s'il existe
@@ -3325,6 +4087,10 @@ class MainWindow(QMainWindow):
         # Configuration du tableau
         self.invoice_table.verticalHeader().setVisible(False)
         self.invoice_table.setEditTriggers(QTableWidget.EditTrigger.DoubleClicked)
+        self.invoice_table.setItemDelegateForColumn(
+            ligne_bdd_col,
+            LigneBddDelegate(self.invoice_columns.index("Nom facture"), self.invoice_table)
+        )
         self.invoice_table.itemChanged.connect(self.on_invoice_item_changed)
         
         # Connecter le changement de sélection pour mettre à jour les statistiques
@@ -3341,6 +4107,11 @@ class MainWindow(QMainWindow):
         self.save_timer.setSingleShot(True)
         self.save_timer.timeout.connect(self.save_pending_changes)
         
+        # Enregistrement de l'état (alias appris) après une série de validations
+        self.state_save_timer = QTimer(self)
+        self.state_save_timer.setSingleShot(True)
+        self.state_save_timer.timeout.connect(lambda: self.save_state(show_message=False))
+        
         # Sauvegarde périodique toutes les 5 minutes
         self.auto_save_timer = QTimer(self)
         self.auto_save_timer.timeout.connect(self.force_save_database)
@@ -3503,6 +4274,12 @@ class MainWindow(QMainWindow):
                     else:
                         partial_match = True
                     
+                    # Mémoriser le choix de l'opérateur pour les prochains traitements (pas une
+                    # Ligne BDD remplie par le traitement), enregistré peu après la dernière validation
+                    if db_line_item.data(AUTO_LINE_ROLE) != db_line_item.text().strip():
+                        self.get_alias_table().record(invoice_name, invoice_address, db_name)
+                        self.state_save_timer.start(2000)
+                    
                     logger.info(f"Correspondance trouvée à la ligne {db_line+1} de la base de données: {db_name}")
                 else:
                     logger.warning(f"Ligne BDD hors limites: {db_line+1}. La base contient {len(db_items)} entrées.")
@@ -3607,6 +4384,23 @@ class MainWindow(QMainWindow):
         logger.debug(f"Statistiques mises à jour: Bleu={blue_percent:.1f}%, Vert={green_percent:.1f}%, "
                     f"Orange={orange_percent:.1f}%, Sans couleur={no_color_percent:.1f}%")
     
+    def show_duplicate_codes_report(self):
+        """Affiche les codes client et chorus partagés par plusieurs entrées"""
+        sections = []
+        for field, label in (('client_code', "Codes client"), ('chorus_code', "Codes chorus")):
+            duplicates = self.database.duplicate_codes(field)
+            lines = [f"{label} en double: {len(duplicates)}"]
+            for code, keys in sorted(duplicates.items()):
+                lines.append(f"  {code} ({len(keys)} entrées): {', '.join(keys)}")
+            sections.append("\n".join(lines))
+        
+        message_box = QMessageBox(self)
+        message_box.setWindowTitle("Codes en double")
+        message_box.setIcon(QMessageBox.Icon.Information)
+        message_box.setText("\n".join(section.splitlines()[0] for section in sections))
+        message_box.setDetailedText("\n\n".join(sections))
+        message_box.exec_()
+    
     def show_about_dialog(self):
         """Affiche la boîte de dialogue À propos"""
         about_text = """
@@ -3681,9 +4475,17 @@ class MainWindow(QMainWindow):
         clear_db_action = QAction("&Vider la base de données", self)
         clear_db_action.triggered.connect(self.clear_database)
         
+        duplicate_codes_action = QAction("Codes en &double...", self)
+        duplicate_codes_action.triggered.connect(self.show_duplicate_codes_report)
+        
+        alias_action = QAction("&Alias appris...", self)
+        alias_action.triggered.connect(self.show_alias_review)
+        
         # Ajouter les actions au menu Base de données
         db_menu.addAction(load_db_action)
         db_menu.addAction(export_db_action)
+        db_menu.addAction(duplicate_codes_action)
+        db_menu.addAction(alias_action)
         db_menu.addSeparator()
         db_menu.addAction(clear_db_action)
         
@@ -3701,9 +4503,13 @@ class MainWindow(QMainWindow):
         fullscreen_action.setShortcut("F11")
         fullscreen_action.triggered.connect(self.toggle_fullscreen)
         
+        summary_action = QAction("&Synthèse des montants...", self)
+        summary_action.triggered.connect(self.show_invoice_summary)
+        
         # Ajouter les actions au menu Affichage
         view_menu.addAction(toggle_db_action)
         view_menu.addAction(toggle_invoice_action)
+        view_menu.addAction(summary_action)
         view_menu.addSeparator()
         view_menu.addAction(fullscreen_action)
         
@@ -4119,6 +4925,14 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         """Gère la fermeture de l'application"""
         try:
+            # Arrêter une lecture de fichier de facturation en cours, puis les recherches en arrière-plan
+            self.stop_invoice_loading()
+            self.stop_background_threads()
+            self.database.save_lsh()
+            
+            # Les alias en attente d'enregistrement sont enregistrés avec l'état ci-dessous
+            self.state_save_timer.stop()
+            
             # Vérifier si la méthode save_state accepte le paramètre show_message
             import inspect
             sig = inspect.signature(self.save_state)
@@ -4311,6 +5125,16 @@ class MainWindow(QMainWindow):
                 )
                 return False
             
+            # Feuilles encore en cours de lecture: le tableau n'est pas complet
+            loader = getattr(self, '_invoice_loader', None)
+            if loader is not None and loader.isRunning():
+                QMessageBox.warning(
+                    self,
+                    "Importation en cours",
+                    "Le fichier de facturation est encore en cours de lecture. Veuillez attendre la fin de l'importation avant de lancer le traitement."
+                )
+                return False
+            
             # Créer une boîte de dialogue de progression améliorée
             progress_dialog = QProgressDialog("Initialisation de la saisie des codes...", "Annuler", 0, self.invoice_table.rowCount(), self)
             progress_dialog.setWindowTitle("Saisie des codes en cours")
@@ -4330,22 +5154,11 @@ class MainWindow(QMainWindow):
             progress_dialog.show()
             QApplication.processEvents()  # Forcer la mise à jour de l'interface
             
-            # Compteurs pour le rapport
-            concordances_parfaites = 0
-            concordances_partielles = 0
-            sans_concordance = 0
-            
-            # Traiter chaque ligne du tableau des factures
+            # Lignes complètes du tableau (UH, N° facture et nom renseignés)
+            records = []
+            # Les lignes peuvent être triées pendant la recherche: la facture suit son élément "Nom facture"
+            items = {}
             for row in range(self.invoice_table.rowCount()):
-                # Vérifier si l'utilisateur a annulé
-                if progress_dialog.wasCanceled():
-                    break
-                    
-                # Mettre à jour la progression
-                progress_dialog.setValue(row)
-                progress_dialog.setLabelText(f"Traitement de la ligne {row+1}/{self.invoice_table.rowCount()}...")
-                
-                # Récupérer les informations de la ligne
                 uh_item = self.invoice_table.item(row, 0)
                 facture_num_item = self.invoice_table.item(row, 1)
                 nom_facture_item = self.invoice_table.item(row, 2)
@@ -4354,101 +5167,79 @@ class MainWindow(QMainWindow):
                 if not uh_item or not facture_num_item or not nom_facture_item:
                     continue  # Ignorer les lignes incomplètes
                 
-                uh = uh_item.text().strip()
-                facture_num = facture_num_item.text().strip()
-                nom_facture = nom_facture_item.text().strip()
-                adresse_facture = adresse_facture_item.text().strip() if adresse_facture_item else ""
-                
-                # Nettoyer le numéro de facture pour la recherche
-                facture_num_clean = facture_num.lower()
-                for prefix in ["facture n°", "facture n", "facture"]:
-                    if facture_num_clean.startswith(prefix):
-                        facture_num_clean = facture_num_clean.replace(prefix, "").strip()
-                        break
-                
-                # Rechercher dans la base de données
-                meilleure_correspondance = None
-                meilleur_score = 0
-                correspondance_exacte = False
-                
-                # Convertir le dictionnaire en liste pour itération
-                db_items = list(self.database.data.items())
-                
-                for idx, (name, data) in enumerate(db_items):
-                    # Calculer un score de similarité basé sur le nom et l'adresse
-                    score = 0
-                    
-                    # Vérifier si le nom de la facture correspond exactement au nom dans la base de données
-                    if nom_facture.lower() == name.lower():
-                        score += 100  # Score élevé pour une correspondance exacte du nom
-                        correspondance_exacte = True
-                    elif nom_facture.lower() in name.lower() or name.lower() in nom_facture.lower():
-                        # Score partiel pour une correspondance partielle
-                        score += 50
-                    
-                    # Vérifier l'adresse si elle est disponible
-                    if adresse_facture and 'address' in data and data['address']:
-                        if adresse_facture.lower() == data['address'].lower():
-                            score += 50  # Score pour une correspondance exacte de l'adresse
-                        elif adresse_facture.lower() in data['address'].lower() or data['address'].lower() in adresse_facture.lower():
-                            score += 25  # Score partiel pour une correspondance partielle de l'adresse
-                    
-                    # Si le score est meilleur que le précédent, mettre à jour la meilleure correspondance
-                    if score > meilleur_score:
-                        meilleur_score = score
-                        meilleure_correspondance = (idx, name, data)
-                
-                # Traiter la meilleure correspondance trouvée
-                if meilleure_correspondance:
-                    idx, name, data = meilleure_correspondance
-                    
-                    # Mettre à jour les cellules du tableau
-                    self.invoice_table.setItem(row, 4, QTableWidgetItem(name))  # Nom BDD
-                    
-                    if 'client_code' in data and data['client_code']:
-                        self.invoice_table.setItem(row, 5, QTableWidgetItem(str(data['client_code'])))  # Code client
-                    
-                    if 'chorus_code' in data and data['chorus_code']:
-                        self.invoice_table.setItem(row, 6, QTableWidgetItem(str(data['chorus_code'])))  # Code chorus
-                    
-                    # Mettre à jour la ligne BDD (index + 1 car l'interface commence à 1)
-                    self.invoice_table.setItem(row, 7, QTableWidgetItem(str(idx + 1)))  # Ligne BDD
-                    
-                    # Appliquer la couleur selon le type de correspondance
-                    couleur = None
-                    if correspondance_exacte and meilleur_score >= 100:
-                        # Concordance parfaite - vert
-                        couleur = QColor(CYBERPUNK_COLORS['success'])  # Vert
-                        concordances_parfaites += 1
-                        statut = "Parfaite"
-                    elif meilleur_score >= 50:
-                        # Concordance partielle - orange
-                        couleur = QColor(CYBERPUNK_COLORS['warning'])  # Orange
-                        concordances_partielles += 1
-                        statut = "Partielle"
-                    else:
-                        # Pas de concordance suffisante
-                        sans_concordance += 1
-                        statut = "Aucune"
-                        continue  # Passer à la ligne suivante sans changer la couleur
-                    
-                    # Appliquer la couleur à toutes les cellules de la ligne
-                    for col in range(self.invoice_table.columnCount()):
-                        item = self.invoice_table.item(row, col)
-                        if item:
-                            item.setBackground(couleur)
-                    
-                    # Mettre à jour le statut
-                    self.invoice_table.setItem(row, 8, QTableWidgetItem(statut))
-                    
-                    logger.info(f"Ligne {row+1}: Concordance {statut} trouvée avec {name} (score: {meilleur_score})")
-                else:
-                    # Aucune correspondance trouvée
-                    sans_concordance += 1
-                    logger.info(f"Ligne {row+1}: Aucune concordance trouvée pour {nom_facture}")
+                records.append(invoice_record(
+                    row,
+                    uh_item.text().strip(),
+                    nom_facture_item.text().strip(),
+                    adresse_facture_item.text().strip() if adresse_facture_item else ""
+                ))
+                items[row] = nom_facture_item
+            
+            progress_dialog.setMaximum(len(records))
+            progress_dialog.setLabelText("Recherche des concordances dans la base de données...")
+            QApplication.processEvents()
+            
+            # Recherche dans un thread de travail (alias appris, cache des concordances, puis recherche UH par UH)
+            cache = self.get_match_cache()
+            cache.bind(self.database.matching_fingerprint(), self.database.content_fingerprint())
+            thread = MatchingThread(self.database.matching_snapshot(), records, self.get_alias_table(), cache)
+            self._matching_thread = thread
+            sortie = {}
+            boucle = QEventLoop()
+            
+            def on_progress(count, uh):
+                progress_dialog.setValue(count)
+                if uh:
+                    progress_dialog.setLabelText(f"UH {uh} traitée ({count}/{len(records)} factures)...")
+            
+            def on_finished(results, stats):
+                sortie['results'], sortie['stats'] = results, stats
+                boucle.quit()
+            
+            def on_error(message):
+                sortie['error'] = message
+                boucle.quit()
+            
+            thread.progress.connect(on_progress)
+            thread.finished.connect(on_finished)
+            thread.error.connect(on_error)
+            progress_dialog.canceled.connect(thread.requestInterruption)
+            # Boucle d'événements imbriquée: ni sauvegarde périodique ni recalcul partiel
+            # des concordances pendant la recherche (recalculs rejoués ensuite)
+            self.auto_save_timer.stop()
+            self._matching_running = True
+            try:
+                thread.start()
+                boucle.exec_()
+                thread.wait()
+            finally:
+                self._matching_running = False
+                self.auto_save_timer.start()
+            
+            if 'error' in sortie:
+                raise RuntimeError(sortie['error'])
+            results, stats = sortie['results'], sortie['stats']
+            applicables = []
+            for resultat in results:
+                item = items.get(resultat['row'])
+                if item is None or sip.isdeleted(item) or item.row() < 0:
+                    continue  # Tableau rechargé pendant la recherche
+                resultat['row'] = item.row()
+                applicables.append(resultat)
+            
+            # Reporter tous les résultats dans le tableau en une fois
+            progress_dialog.setLabelText("Mise à jour du tableau des factures...")
+            QApplication.processEvents()
+            statuts = self._appliquer_resultats(applicables)
+            # Entrées modifiées pendant la recherche: factures concernées recalculées sur le référentiel à jour
+            self._replay_deferred_rematch()
+            concordances_parfaites = statuts.count(STATUS_PARFAITE)
+            concordances_partielles = statuts.count(STATUS_PARTIELLE)
+            sans_concordance = len(statuts) - concordances_parfaites - concordances_partielles
+            alias_utilises = stats['alias']
             
             # Fermer la boîte de dialogue de progression
-            progress_dialog.setValue(self.invoice_table.rowCount())
+            progress_dialog.setValue(len(records))
             
             # Afficher un résumé des résultats
             QMessageBox.information(
@@ -4457,7 +5248,9 @@ class MainWindow(QMainWindow):
                 f"Résultats du traitement:\n\n"
                 f"- Concordances parfaites: {concordances_parfaites}\n"
                 f"- Concordances partielles: {concordances_partielles}\n"
-                f"- Sans concordance: {sans_concordance}"
+                f"- Sans concordance: {sans_concordance}\n\n"
+                f"Alias appris utilisés: {alias_utilises}\n"
+                f"Cache des concordances: {stats['cache_hits']} reprises, {stats['cache_misses']} recherchées"
             )
             
             # Mettre à jour la barre de statut
@@ -4477,6 +5270,338 @@ class MainWindow(QMainWindow):
             self.statusBar().showMessage("Erreur lors du traitement", 5000)
             return False
             
+    def reset_candidate_suggestions(self):
+        """Tableau rechargé: calculs de suggestions en cours et liens facture -> entrées obsolètes"""
+        # Un nouveau calcul rend obsolètes les résultats des calculs précédents
+        self._suggestion_generation = getattr(self, '_suggestion_generation', 0) + 1
+        self._pending_suggestion_items = []
+        self.get_match_dependencies().clear()
+        self._dependency_items = {}
+    
+    def queue_candidate_suggestions(self, items):
+        """Ajoute des factures (éléments "Nom facture") au calcul des suggestions en arrière-plan
+
+        Un seul calcul à la fois: les factures arrivées pendant un calcul (feuilles
+        lues entre-temps) sont traitées ensemble au calcul suivant.
+        """
+        self._pending_suggestion_items = getattr(self, '_pending_suggestion_items', []) + [
+            item for item in items if item is not None
+        ]
+        if not getattr(self, '_suggestion_running', False):
+            self._start_next_suggestions()
+    
+    def _start_next_suggestions(self):
+        items = [item for item in getattr(self, '_pending_suggestion_items', []) if not sip.isdeleted(item)]
+        self._pending_suggestion_items = []
+        if not items or not self.database.data:
+            return
+        invoices = []
+        for item in items:
+            adresse_facture_item = self.invoice_table.item(item.row(), 3)
+            invoices.append((
+                item.text().strip(),
+                adresse_facture_item.text().strip() if adresse_facture_item else ""
+            ))
+        
+        thread = SuggestionThread(self._suggestion_generation, self.database.matching_snapshot(), invoices)
+        thread.finished.connect(lambda generation, suggestions: self._on_suggestions_ready(generation, suggestions, items))
+        thread.error.connect(lambda _: self._on_suggestions_ready(None, [], items))
+        # Garder une référence aux threads encore en cours
+        self._suggestion_threads = [t for t in getattr(self, '_suggestion_threads', []) if t.isRunning()] + [thread]
+        self._suggestion_running = True
+        thread.start()
+    
+    def _on_suggestions_ready(self, generation, suggestions, items):
+        """Attache les suggestions calculées aux lignes du tableau des factures, puis lance le calcul suivant"""
+        self._suggestion_running = False
+        if generation == getattr(self, '_suggestion_generation', None):
+            sorting_enabled = self.invoice_table.isSortingEnabled()
+            self.invoice_table.setSortingEnabled(False)
+            self.invoice_table.blockSignals(True)
+            try:
+                for item, candidates in zip(items, suggestions):
+                    if not sip.isdeleted(item):
+                        item.setData(SUGGESTIONS_ROLE, candidates)
+                        self._record_dependencies(item, [candidate['key'] for candidate in candidates])
+            finally:
+                self.invoice_table.blockSignals(False)
+                self.invoice_table.setSortingEnabled(sorting_enabled)
+            self.statusBar().showMessage(f"Suggestions de ligne BDD disponibles pour {len(suggestions)} factures", 5000)
+        # Sinon: tableau rechargé depuis le lancement du calcul
+        self._start_next_suggestions()
+    
+    def get_match_dependencies(self):
+        """Liens entre les factures du tableau et les entrées retenues ou suggérées (voir rematch_invoices)"""
+        if getattr(self, 'match_dependencies', None) is None:
+            self.match_dependencies = MatchDependencies()
+            self._dependency_items = {}
+        return self.match_dependencies
+    
+    def _record_dependencies(self, item, keys):
+        """Lie la facture d'un élément "Nom facture" à des entrées de la base"""
+        # Les éléments Qt ne sont pas hachables: la facture est désignée par l'identité de l'élément,
+        # qui suit la ligne quand le tableau est trié
+        self.get_match_dependencies().record(id(item), keys)
+        self._dependency_items[id(item)] = item
+    
+    def rematch_invoices(self, keys, new_keys=(), renamed=None):
+        """Recalcule en arrière-plan les concordances des factures liées aux entrées modifiées
+
+        Seules les factures qui avaient retenu ou qui se voyaient suggérer l'une des
+        entrées sont recalculées. Une entrée nouvelle (nom saisi dans la base) peut
+        convenir à toute facture encore sans concordance parfaite: celles-ci sont
+        recalculées aussi. Une entrée renommée garde ses factures: leurs liens et le
+        Nom BDD des lignes passent au nouveau nom, puis ces factures sont recalculées.
+        Les lignes validées manuellement ne sont jamais recalculées.
+
+        La recherche s'exécute dans un MatchingThread; les demandes reçues pendant
+        un calcul (ou un traitement complet) sont rejouées à sa fin.
+
+        Args:
+            keys (list): Clés des entrées modifiées
+            new_keys (list): Clés des entrées ajoutées
+            renamed (dict): Entrées renommées (ancienne clé -> nouvelle clé)
+
+        Returns:
+            int: Nombre de factures dont le recalcul est lancé
+        """
+        renamed = dict(renamed or {})
+        deferred = getattr(self, '_deferred_rematch', None)
+        if getattr(self, '_matching_running', False) or getattr(self, '_rematch_running', False):
+            # Traitement complet (voir save_invoice_as) ou recalcul en cours: recalcul rejoué à sa fin
+            if deferred is None:
+                deferred = self._deferred_rematch = ([], [], {})
+            deferred[0].extend(keys)
+            deferred[1].extend(new_keys)
+            deferred[2].update(renamed)
+            return 0
+        if deferred is not None:
+            self._deferred_rematch = None
+            keys, new_keys = list(keys) + deferred[0], list(new_keys) + deferred[1]
+            renamed = {**deferred[2], **renamed}
+        
+        if not hasattr(self, 'invoice_table') or self.invoice_table.rowCount() == 0:
+            return 0
+        
+        dependencies = self.get_match_dependencies()
+        if renamed:
+            # Entrée renommée: ses factures la suivent sous son nouveau nom
+            for old_key, new_key in renamed.items():
+                for item_id in dependencies.rows_for([old_key]):
+                    dependencies.record(item_id, [new_key])
+            self.invoice_table.blockSignals(True)
+            try:
+                for row in range(self.invoice_table.rowCount()):
+                    nom_bdd_item = self.invoice_table.item(row, 4)
+                    if nom_bdd_item and nom_bdd_item.text() in renamed:
+                        nom_bdd_item.setText(renamed[nom_bdd_item.text()])
+            finally:
+                self.invoice_table.blockSignals(False)
+            keys = list(keys) + list(renamed.values())
+        
+        rows = set()
+        for item_id in dependencies.rows_for(keys):
+            item = self._dependency_items.get(item_id)
+            if item is None or sip.isdeleted(item) or item.row() < 0:
+                dependencies.forget(item_id)
+                self._dependency_items.pop(item_id, None)
+                continue
+            rows.add(item.row())
+        if new_keys:
+            for row in range(self.invoice_table.rowCount()):
+                statut_item = self.invoice_table.item(row, 8)
+                if not statut_item or statut_item.text() != STATUS_PARFAITE:
+                    rows.add(row)
+        
+        # Le choix de l'opérateur (lignes validées, en bleu) est conservé
+        records = []
+        self._rematch_items = {}
+        for row in sorted(rows):
+            statut_item = self.invoice_table.item(row, 8)
+            uh_item = self.invoice_table.item(row, 0)
+            nom_facture_item = self.invoice_table.item(row, 2)
+            if not nom_facture_item or (statut_item and statut_item.text().startswith("Validé")):
+                continue
+            adresse_facture_item = self.invoice_table.item(row, 3)
+            records.append(invoice_record(
+                row,
+                uh_item.text().strip() if uh_item else "",
+                nom_facture_item.text().strip(),
+                adresse_facture_item.text().strip() if adresse_facture_item else ""
+            ))
+            # Les lignes peuvent être triées pendant le calcul: la facture suit son élément "Nom facture"
+            self._rematch_items[row] = nom_facture_item
+        if not records:
+            return 0
+        
+        thread = MatchingThread(self.database.matching_snapshot(), records, self.get_alias_table())
+        thread.finished.connect(self._on_rematch_finished)
+        thread.error.connect(self._on_rematch_error)
+        self._rematch_thread = thread
+        self._rematch_running = True
+        thread.start()
+        self.statusBar().showMessage(f"Recalcul des concordances de {len(records)} facture(s)...", 5000)
+        return len(records)
+    
+    def _on_rematch_finished(self, results, _stats):
+        """Reporte les concordances recalculées (voir rematch_invoices) dans les lignes encore concernées"""
+        self._rematch_running = False
+        items, self._rematch_items = self._rematch_items, {}
+        applicables = []
+        for resultat in results:
+            item = items.get(resultat['row'])
+            if item is None or sip.isdeleted(item) or item.row() < 0:
+                continue  # Tableau rechargé depuis le lancement du calcul
+            statut_item = self.invoice_table.item(item.row(), 8)
+            if statut_item and statut_item.text().startswith("Validé"):
+                continue  # Ligne validée par l'opérateur pendant le calcul
+            resultat['row'] = item.row()
+            applicables.append(resultat)
+        if applicables:
+            self._appliquer_resultats(applicables, effacer=True)
+        
+        logger.info(f"Référentiel modifié: {len(applicables)} facture(s) recalculée(s)")
+        self.statusBar().showMessage(f"Concordances mises à jour pour {len(applicables)} facture(s)", 5000)
+        self._replay_deferred_rematch()
+    
+    def _on_rematch_error(self, message):
+        self._rematch_running = False
+        self._rematch_items = {}
+        logger.error(f"Erreur lors du recalcul des concordances: {message}")
+        self._replay_deferred_rematch()
+    
+    def _replay_deferred_rematch(self):
+        """Rejoue les recalculs demandés pendant un calcul en cours"""
+        if getattr(self, '_deferred_rematch', None) and not getattr(self, '_matching_running', False):
+            self.rematch_invoices([])
+    
+    def get_alias_table(self):
+        """Alias appris des validations manuelles (table manual_matches enregistrée avec l'état)"""
+        return AliasTable(self.manual_matches)
+    
+    def show_alias_review(self):
+        """Affiche la revue des alias appris et enregistre les suppressions"""
+        dialog = AliasReviewDialog(self.get_alias_table(), self.database, self)
+        dialog.exec_()
+        if dialog.modified:
+            self.save_state()
+            self.statusBar().showMessage(f"Alias appris: {len(self.manual_matches)} conservés", 5000)
+    
+    def show_invoice_summary(self):
+        """Affiche les totaux par UH et par client des factures importées, sans relire le fichier"""
+        totals = getattr(self, 'invoice_totals', None)
+        if not totals:
+            QMessageBox.information(self, "Synthèse des montants", "Aucune facture importée.")
+            return
+        InvoiceSummaryDialog(totals, self).exec_()
+    
+    def get_match_cache(self):
+        """Cache persistant des concordances, chargé au premier traitement"""
+        if getattr(self, 'match_cache', None) is None:
+            self.match_cache = MatchCache()
+            self.match_cache.load()
+        return self.match_cache
+    
+    def get_parse_cache(self):
+        """Cache persistant des fichiers de facturation lus, chargé à la première importation"""
+        if getattr(self, 'parse_cache', None) is None:
+            self.parse_cache = ParseCache()
+            self.parse_cache.load()
+        return self.parse_cache
+    
+    def _appliquer_resultats(self, results, effacer=False):
+        """Reporte en une fois les résultats de invoice_matching.run_matching dans le tableau des factures
+
+        Args:
+            results (list): Résultats structurés (la ligne du tableau est dans 'row')
+            effacer (bool): Effacer d'abord l'ancienne concordance des lignes (cellules de la base, couleur, statut)
+
+        Returns:
+            list: Statut de chaque résultat
+        """
+        # Ni tri ni signal de modification pendant la mise à jour: les lignes gardent leur place
+        # et les statistiques sont recalculées une seule fois
+        sorting_enabled = self.invoice_table.isSortingEnabled()
+        self.invoice_table.setSortingEnabled(False)
+        self.invoice_table.setUpdatesEnabled(False)
+        self.invoice_table.blockSignals(True)
+        try:
+            statuts = []
+            for resultat in results:
+                row = resultat['row']
+                if effacer:
+                    for col in range(4, 9):
+                        self.invoice_table.setItem(row, col, QTableWidgetItem(""))
+                    for col in range(self.invoice_table.columnCount()):
+                        item = self.invoice_table.item(row, col)
+                        if item:
+                            item.setData(Qt.ItemDataRole.BackgroundRole, None)
+                statuts.append(self._appliquer_concordance(row, resultat))
+        finally:
+            self.invoice_table.blockSignals(False)
+            self.invoice_table.setUpdatesEnabled(True)
+            self.invoice_table.setSortingEnabled(sorting_enabled)
+        
+        self.update_statistics()
+        logger.info(f"{len(results)} résultat(s) de concordance reportés dans le tableau des factures")
+        return statuts
+    
+    def _appliquer_concordance(self, row, resultat):
+        """Reporte une concordance dans une ligne du tableau des factures (noms, codes, Ligne BDD, couleur)
+
+        Args:
+            resultat (dict): Résultat structuré (voir invoice_matching.match_result)
+
+        Returns:
+            str: Statut de la concordance ("Parfaite", "Partielle" ou "Aucune")
+        """
+        if not resultat or resultat['key'] is None:
+            nom_facture_item = self.invoice_table.item(row, 2)
+            logger.debug(f"Ligne {row+1}: Aucune concordance trouvée pour {nom_facture_item.text() if nom_facture_item else ''}")
+            return STATUS_AUCUNE
+        
+        idx, name = resultat['position'], resultat['key']
+        
+        # Retenir le lien facture -> entrée pour les recalculs après modification de la base
+        nom_facture_item = self.invoice_table.item(row, 2)
+        if nom_facture_item:
+            self._record_dependencies(nom_facture_item, [name])
+        
+        # Mettre à jour les cellules du tableau
+        self.invoice_table.setItem(row, 4, QTableWidgetItem(name))  # Nom BDD
+        
+        if resultat['client_code']:
+            self.invoice_table.setItem(row, 5, QTableWidgetItem(resultat['client_code']))  # Code client
+        
+        if resultat['chorus_code']:
+            self.invoice_table.setItem(row, 6, QTableWidgetItem(resultat['chorus_code']))  # Code chorus
+        
+        # Mettre à jour la ligne BDD (index + 1 car l'interface commence à 1)
+        ligne_bdd_item = QTableWidgetItem(str(idx + 1))
+        ligne_bdd_item.setData(AUTO_LINE_ROLE, ligne_bdd_item.text())
+        self.invoice_table.setItem(row, 7, ligne_bdd_item)  # Ligne BDD
+        
+        # Appliquer la couleur selon le type de correspondance
+        if resultat['status'] == STATUS_PARFAITE:
+            couleur = QColor(CYBERPUNK_COLORS['success'])  # Vert
+        elif resultat['status'] == STATUS_PARTIELLE:
+            couleur = QColor(CYBERPUNK_COLORS['warning'])  # Orange
+        else:
+            # Pas de concordance suffisante: la couleur de la ligne est conservée
+            return STATUS_AUCUNE
+        
+        # Appliquer la couleur à toutes les cellules de la ligne
+        for col in range(self.invoice_table.columnCount()):
+            item = self.invoice_table.item(row, col)
+            if item:
+                item.setBackground(couleur)
+        
+        # Mettre à jour le statut
+        self.invoice_table.setItem(row, 8, QTableWidgetItem(resultat['status']))
+        
+        logger.debug(f"Ligne {row+1}: Concordance {resultat['status']} trouvée avec {name} (score: {resultat['score']})")
+        return resultat['status']
+    
     def export_to_pdf(self):
         """Exporte la facture actuelle en PDF"""
         if not hasattr(self, 'invoice_table') or self.invoice_table.rowCount() == 0:
@@ -4832,6 +5957,7 @@ class MainWindow(QMainWindow):
             
             # Mettre à jour le tableau de la base de données principale
             self.db_table.setRowCount(0)
+            self._db_rank_moves = []
             if hasattr(self, 'full_db_table'):
                 self.full_db_table.setRowCount(0)
             
@@ -4954,19 +6080,22 @@ class MainWindow(QMainWindow):
         
         # Mettre à jour la valeur dans la base de données
         if col == 0:  # Nom
-            self.database.data[key]['name'] = value
+            self.database.update_entry(key, 'name', value)
         elif col == 1:  # Code Client
-            self.database.data[key]['client_code'] = value
+            self.database.update_entry(key, 'client_code', value)
         elif col == 2:  # Code Chorus
-            self.database.data[key]['chorus_code'] = value
+            self.database.update_entry(key, 'chorus_code', value)
         elif col == 3:  # Adresse
-            self.database.data[key]['address'] = value
+            self.database.update_entry(key, 'address', value)
         
         # Sauvegarder la base de données
         self.database.save_database()
         
         # Mettre à jour le tableau principal
         self.db_table.item(row, col).setText(value)
+        
+        # Recalculer les seules factures concernées par l'entrée modifiée
+        self.rematch_invoices([key])
 
 def __init__(self):
     super().__init__()
@@ -5279,33 +6408,6 @@ def load_database_from_excel(self):
                             'confidence': 0
                         }
                         
-                        # Si les codes ne sont pas dans le fichier, essayer de les trouver dans la base de données
-                        if not entry['client_code'] or not entry['chorus_code']:
-                            normalized_name = entry['normalized_name']
-                            best_match = None
-                            best_score = 0
-                            
-                            for key, db_entry in self.database.data.items():
-                                if normalized_name == key:
-                                    best_match = db_entry
-                                    best_score = 100
-                                    break
-                                
-                                # Recherche floue
-                                if normalized_name in key or key in normalized_name:
-                                    score = len(key) / max(len(normalized_name), 1) * 100
-                                    if score > best_score:
-                                        best_match = db_entry
-                                        best_score = score
-                            
-                            # Mettre à jour avec les données de la base de données
-                            if best_match:
-                                if not entry['client_code']:
-                                    entry['client_code'] = best_match.get('client_code', '')
-                                if not entry['chorus_code']:
-                                    entry['chorus_code'] = best_match.get('chorus_code', '')
-                                entry['confidence'] = best_score
-                        
                         entries.append(entry)
             
             if entries:
@@ -5313,6 +6415,25 @@ def load_database_from_excel(self):
         
         # Fermer le workbook
         workbook.close()
+        
+        # Si les codes ne sont pas dans le fichier, les rechercher dans la base de données en un seul lot
+        a_completer = [
+            entry for _, entries in self.current_tables for entry in entries
+            if not entry['client_code'] or not entry['chorus_code']
+        ]
+        resultats = self.database.match_invoices(
+            [(entry['nom_facture'], entry['adresse_facture']) for entry in a_completer]
+        )
+        for entry, resultat in zip(a_completer, resultats):
+            if not resultat:
+                continue
+            best_match = resultat['entry']
+            if not entry['client_code']:
+                entry['client_code'] = best_match.get('client_code', '')
+            if not entry['chorus_code']:
+                entry['chorus_code'] = best_match.get('chorus_code', '')
+            entry['database_line'] = resultat['position'] + 1
+            entry['confidence'] = resultat['score']
     
     def update_preview_table(self):
         """Met à jour l'affichage du tableau des factures avec les nouvelles colonnes"""
@@ -6146,6 +7267,8 @@ def save_invoice_file(self):
 
             
 if __name__ == '__main__':
+    # Nécessaire aux processus de recherche des concordances dans l'exécutable PyInstaller
+    multiprocessing.freeze_support()
 
     app = QApplication(sys.argv)
     app.setStyle(QStyleFactory.create('Fusion'))
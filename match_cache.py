@@ -0,0 +1,188 @@
+"""
+Cache persistant des concordances factures -> base de données.
+
+Les mêmes établissements reviennent sur chaque fichier de facturation mensuel :
+la concordance trouvée pour un couple (nom, adresse) normalisé est conservée
+sur disque et réutilisée au traitement suivant sans nouvelle recherche.
+
+Le cache n'est entièrement vidé que si l'algorithme de concordance ou ses
+réglages changent (voir matching_fingerprint). Une modification du
+référentiel n'invalide que les concordances qu'elle peut changer :
+- chaque concordance garde l'empreinte de l'entrée retenue et n'est
+  réutilisée que si cette entrée existe toujours, inchangée ;
+- une concordance "Parfaite" (nom identique) reste valable quand d'autres
+  entrées sont ajoutées ;
+- une concordance partielle, ou l'absence de concordance, garde l'empreinte
+  du référentiel entier : une entrée ajoutée pourrait faire mieux, elle est
+  donc recalculée dès que le référentiel a changé.
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+from matching_engine import STATUS_PARFAITE
+from text_normalization import normalize_text
+
+logger = logging.getLogger('FacturesManager')
+
+# Version de l'algorithme de concordance: à incrémenter quand les scores ou seuils changent
+MATCHING_VERSION = 4
+
+# Emplacement par défaut, à côté de app_state.json
+DEFAULT_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.factures_manager', 'match_cache.json')
+
+# Séparateur des champs d'une clé de cache (absent des textes normalisés)
+_SEPARATOR = '\x1f'
+
+
+def entry_fingerprint(key, entry):
+    """Empreinte des champs d'une entrée qui influencent la concordance (clé et adresse)"""
+    address = entry.get('address') if isinstance(entry, dict) else None
+    return hashlib.sha1(f"{key}{_SEPARATOR}{address or ''}".encode('utf-8')).hexdigest()
+
+
+def matching_fingerprint(settings=""):
+    """Empreinte de l'algorithme de concordance et de ses réglages
+
+    Args:
+        settings (str): Empreinte des réglages de la concordance (dictionnaire des abréviations)
+    """
+    return hashlib.sha1(f"{MATCHING_VERSION}{_SEPARATOR}{settings}".encode('utf-8')).hexdigest()
+
+
+def referential_fingerprint(data):
+    """Empreinte du référentiel entier (entrées dans l'ordre des lignes BDD)"""
+    digest = hashlib.sha1()
+    for key, entry in data.items():
+        address = entry.get('address') if isinstance(entry, dict) else None
+        digest.update(f"{key}{_SEPARATOR}{address or ''}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def cache_key(nom_facture, adresse_facture=""):
+    """Clé de cache d'une facture: nom et adresse normalisés"""
+    return f"{normalize_text(nom_facture)}{_SEPARATOR}{normalize_text(adresse_facture)}"
+
+
+class MatchCache:
+    """Concordances déjà calculées, par (nom, adresse) normalisés
+
+    Args:
+        cache_file (str): Fichier JSON du cache
+    """
+
+    def __init__(self, cache_file=DEFAULT_CACHE_FILE):
+        self.cache_file = cache_file
+        self.matching = None
+        self.referential = None
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._modified = False
+
+    def load(self):
+        """Charge le cache depuis le disque (cache vide si le fichier est absent ou illisible)"""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                content = json.load(f)
+            self.matching = content.get('matching')
+            self.entries = content.get('entries', {})
+        except FileNotFoundError:
+            self.matching, self.entries = None, {}
+        except Exception as e:
+            logger.warning(f"Cache des concordances illisible, il sera reconstruit: {str(e)}")
+            self.matching, self.entries = None, {}
+        self._modified = False
+
+    def save(self):
+        """Enregistre le cache s'il a été modifié"""
+        if not self._modified:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            temp_file = self.cache_file + '.tmp'
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'matching': self.matching, 'entries': self.entries}, f, ensure_ascii=False)
+            os.replace(temp_file, self.cache_file)
+            self._modified = False
+        except Exception as e:
+            logger.error(f"Erreur lors de l'enregistrement du cache des concordances: {str(e)}")
+
+    def bind(self, matching, referential):
+        """Associe le cache aux réglages de la concordance et à l'état du référentiel
+
+        Le cache n'est vidé que si les réglages ont changé; l'empreinte du
+        référentiel sert à valider les concordances partielles une à une.
+
+        Args:
+            matching (str): Empreinte de l'algorithme et des réglages (voir matching_fingerprint)
+            referential (str): Empreinte du référentiel (voir referential_fingerprint)
+        """
+        if self.matching != matching:
+            if self.entries:
+                logger.info(f"Réglages de concordance modifiés: {len(self.entries)} concordances en cache invalidées")
+            self.matching = matching
+            self.entries = {}
+            self._modified = True
+        self.referential = referential
+
+    def reset_stats(self):
+        """Remet à zéro les compteurs de succès et d'échecs"""
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, nom_facture, adresse_facture, data, positions):
+        """Concordance en cache d'une facture
+
+        Args:
+            data (dict): Entrées de la base (clé -> entrée)
+            positions (dict): Clé -> position dans la base
+
+        Returns:
+            tuple: (trouvée, résultat) — résultat au format de matching_engine.match_batch,
+            None si la facture n'avait aucune concordance
+        """
+        record = self.entries.get(cache_key(nom_facture, adresse_facture))
+        if record is None:
+            self.misses += 1
+            return False, None
+        key, fingerprint, score, exact, status, referential = record
+        if referential is not None and referential != self.referential:
+            # Concordance partielle ou absente, référentiel modifié depuis: concordance à recalculer
+            stale = True
+        elif key is None:
+            self.hits += 1
+            return True, None
+        else:
+            # Entrée retenue supprimée ou modifiée depuis: concordance à recalculer
+            entry = data.get(key)
+            stale = entry is None or key not in positions or entry_fingerprint(key, entry) != fingerprint
+        if stale:
+            del self.entries[cache_key(nom_facture, adresse_facture)]
+            self._modified = True
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, {
+            'position': positions[key],
+            'key': key,
+            'entry': entry,
+            'score': score,
+            'exact': exact,
+            'status': status,
+        }
+
+    def store(self, nom_facture, adresse_facture, result):
+        """Mémorise la concordance (ou l'absence de concordance) d'une facture"""
+        if result is None:
+            record = [None, None, 0, False, None, self.referential]
+        else:
+            record = [
+                result['key'], entry_fingerprint(result['key'], result['entry']),
+                result['score'], result['exact'], result['status'],
+                None if result['status'] == STATUS_PARFAITE else self.referential,
+            ]
+        self.entries[cache_key(nom_facture, adresse_facture)] = record
+        self._modified = True
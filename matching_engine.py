@@ -0,0 +1,338 @@
+"""
+Moteur de recherche de concordances entre factures et base de données.
+
+match_batch compare en une fois un lot de factures au référentiel par
+similarité cosinus TF-IDF sur les n-grammes de caractères (voir tfidf_index),
+plus tolérante aux fautes que la recherche de sous-chaînes ; les meilleurs
+candidats sont ensuite départagés par la similarité de Jaro-Winkler (voir
+string_similarity). Les adresses sont comparées une fois normalisées (voir
+address_normalization) et les entrées du même code postal que la facture
+rejoignent toujours les candidats, comme celles dont le nom se prononce de
+la même façon (clé phonétique, voir french_phonetic). Avant toute recherche approximative, les
+factures dont le nom a la même forme canonique qu'une entrée (abréviations
+développées, voir canonical_names) sont résolues par simple lecture d'un
+dictionnaire. Pour les très grands référentiels (LSH_MIN_ENTRIES entrées),
+les candidats viennent d'un index MinHash-LSH (voir minhash_lsh) au lieu du
+parcours de l'index TF-IDF entier.
+
+MatchDependencies retient, pour chaque entrée de la base, les factures qui
+l'ont retenue ou proposée : après une modification du référentiel, seules ces
+factures sont recalculées.
+"""
+
+import re
+
+from french_phonetic import PhoneticIndex, phonetic_key
+from string_similarity import jaro_winkler
+from tfidf_index import clean_text
+from address_normalization import AddressIndex, address_similarity
+from canonical_names import CanonicalIndex
+
+# Statuts de concordance affichés dans la colonne "Statut"
+STATUS_PARFAITE = "Parfaite"
+STATUS_PARTIELLE = "Partielle"
+STATUS_AUCUNE = "Aucune"
+
+# Score d'une concordance "Parfaite" (sur 100)
+SCORE_NOM_EXACT = 100
+
+# Seuils de similarité cosinus TF-IDF (0 à 1) des statuts de match_batch
+SIMILARITE_PARFAITE = 0.98
+SIMILARITE_PARTIELLE = 0.6
+
+# Part de l'adresse dans le score de match_batch (adresse identique: +POIDS_ADRESSE)
+POIDS_ADRESSE = 0.1
+
+# Au-delà de ce nombre d'entrées, un code postal est trop peu discriminant pour ajouter ses entrées aux candidats
+POSTAL_BLOCK_MAX = 50
+
+# Au-delà de ce nombre d'entrées, une clé phonétique est trop courante pour ajouter ses entrées aux candidats
+PHONETIC_BLOCK_MAX = 20
+
+# Nombre de candidats TF-IDF départagés par l'adresse
+TFIDF_TOP_K = 5
+
+# À partir de ce nombre d'entrées, les candidats sont pris dans l'index MinHash-LSH
+LSH_MIN_ENTRIES = 200000
+
+# Nombre de noms candidats lus dans l'index MinHash-LSH par facture
+LSH_CANDIDATES = 20
+
+# Nombre de suggestions proposées par facture dans la colonne "Ligne BDD"
+SUGGESTION_COUNT = 5
+
+# Suffixe ajouté aux clés en double par Database.add_entry ("nom_1", "nom_1_2"...)
+DUPLICATE_KEY_SUFFIX = re.compile(r'(?:_\d+)+$')
+
+
+def entry_phonetic_key(key):
+    """Clé phonétique d'une entrée, calculée sur sa clé sans suffixe de doublon"""
+    return phonetic_key(DUPLICATE_KEY_SUFFIX.sub('', str(key)))
+
+
+def _address_candidates(addresses, invoices):
+    """Adresses découpées des factures et candidats supplémentaires de leur code postal
+
+    Returns:
+        tuple: (adresses découpées, clés des entrées du même code postal) pour chaque facture
+    """
+    parsed_invoices = [addresses.parse(adresse) for _, adresse in invoices]
+    blocks = []
+    for parsed in parsed_invoices:
+        block = addresses.by_postal_code(parsed['postal_code']) if parsed['postal_code'] else ()
+        blocks.append(block if len(block) <= POSTAL_BLOCK_MAX else ())
+    return parsed_invoices, blocks
+
+
+def _phonetic_candidates(phonetic, invoices, blocks):
+    """Candidats de chaque facture complétés par les entrées de même clé phonétique que son nom"""
+    extended = []
+    for (nom_facture, _), block in zip(invoices, blocks):
+        homophones = phonetic.lookup(nom_facture)
+        extended.append(set(block) | homophones if len(homophones) <= PHONETIC_BLOCK_MAX else block)
+    return extended
+
+
+def _address_bonus(addresses, parsed_invoice, key):
+    """Part de l'adresse dans le score d'une entrée pour une facture"""
+    parsed_entry = addresses.parsed(key)
+    if not parsed_entry or not parsed_invoice['text']:
+        return 0.0
+    return POIDS_ADRESSE * address_similarity(parsed_invoice, parsed_entry)
+
+
+def _canonical_match(canonical, data, positions, addresses, nom_facture, parsed_invoice):
+    """Entrée de même forme canonique que la facture
+
+    Parmi plusieurs entrées, celle de nom identique est préférée, puis la mieux
+    placée par l'adresse, puis la première dans l'ordre de la base.
+    """
+    keys = [key for key in canonical.lookup(nom_facture) if key in positions and key in data]
+    if not keys:
+        return None
+    nom = clean_text(nom_facture)
+    key = min(keys, key=lambda key: (
+        clean_text(DUPLICATE_KEY_SUFFIX.sub('', str(key))) != nom,
+        -_address_bonus(addresses, parsed_invoice, key),
+        positions[key],
+    ))
+    return {
+        'position': positions[key],
+        'key': key,
+        'entry': data[key],
+        'score': SCORE_NOM_EXACT,
+        'exact': True,
+        'status': STATUS_PARFAITE,
+        'canonical': True,
+    }
+
+
+def _search_candidates(index, lsh, texts, top_k, include, min_entries=LSH_MIN_ENTRIES):
+    """Candidats (clé, similarité cosinus) de chaque texte: index TF-IDF entier, ou index LSH si le référentiel est très grand"""
+    if lsh is None or len(lsh) < min_entries:
+        return index.search_batch(texts, top_k, include=include)
+    results = []
+    for text, found, extra in zip(texts, lsh.query_batch(texts, max(top_k, LSH_CANDIDATES)), include):
+        extra = set(extra)
+        keys = list(dict.fromkeys([key for key, _ in found] + sorted(extra)))
+        candidates = [
+            (key, similarity) for key, similarity in index.similarities(text, keys)
+            if similarity > 0 or key in extra
+        ]
+        results.append(sorted(candidates, key=lambda candidate: -candidate[1]))
+    return results
+
+
+def canonical_index(data):
+    """Index des formes canoniques des noms de la base (abréviations par défaut)"""
+    return CanonicalIndex.from_names((key, DUPLICATE_KEY_SUFFIX.sub('', str(key))) for key in data)
+
+
+def phonetic_index(data):
+    """Index des clés phonétiques des noms de la base (abréviations par défaut)"""
+    return PhoneticIndex.from_names((key, DUPLICATE_KEY_SUFFIX.sub('', str(key))) for key in data)
+
+
+def match_batch(index, data, invoices, positions=None, addresses=None, canonical=None, lsh=None, phonetic=None,
+                top_k=TFIDF_TOP_K):
+    """Meilleure entrée de la base pour chaque facture d'un lot, par similarité TF-IDF
+
+    Une facture dont le nom a la même forme canonique qu'une entrée est
+    "Parfaite" sans autre recherche. Pour les autres, les `top_k` noms les plus proches de chaque facture, plus les entrées de
+    son code postal et celles de même clé phonétique, sont classés par la moyenne des similarités cosinus et
+    Jaro-Winkler, plus l'adresse (address_similarity ramenée à POIDS_ADRESSE),
+    puis par l'ordre de la base.
+    Le statut dépend du score cosinus + adresse de l'entrée retenue :
+    "Parfaite" si le nom est quasi identique (SIMILARITE_PARFAITE),
+    "Partielle" au-dessus de SIMILARITE_PARTIELLE.
+
+    Args:
+        index (TfidfIndex): Index des noms de la base (clé -> nom)
+        data (dict): Entrées de la base (clé -> entrée)
+        invoices (list): Tuples (nom_facture, adresse_facture)
+        positions (dict): Clé -> position dans la base (calculé si absent)
+        addresses (AddressIndex): Adresses normalisées de la base (calculé si absent)
+        canonical (CanonicalIndex): Formes canoniques des noms de la base (calculé si absent)
+        lsh (MinHashLSH): Index MinHash-LSH des noms (utilisé à partir de LSH_MIN_ENTRIES entrées)
+        phonetic (PhoneticIndex): Clés phonétiques des noms de la base (calculé si absent)
+        top_k (int): Nombre de candidats départagés par l'adresse
+
+    Returns:
+        list: Pour chaque facture, dict (position, key, entry, score sur 100, exact, status) ou None
+    """
+    if positions is None:
+        positions = {key: position for position, key in enumerate(data)}
+    if addresses is None:
+        addresses = AddressIndex.from_data(data)
+    if canonical is None:
+        canonical = canonical_index(data)
+    if phonetic is None:
+        phonetic = phonetic_index(data)
+    invoices = list(invoices)
+    parsed_invoices, blocks = _address_candidates(addresses, invoices)
+
+    # Noms identiques aux abréviations près: aucune recherche approximative
+    results = [
+        _canonical_match(canonical, data, positions, addresses, nom_facture, parsed_invoice)
+        for (nom_facture, _), parsed_invoice in zip(invoices, parsed_invoices)
+    ]
+    pending = [i for i, result in enumerate(results) if result is None]
+    blocks = _phonetic_candidates(phonetic, [invoices[i] for i in pending], [blocks[i] for i in pending])
+    candidates_by_invoice = _search_candidates(index, lsh, [invoices[i][0] for i in pending], top_k, blocks)
+
+    for i, candidates in zip(pending, candidates_by_invoice):
+        nom_facture, parsed_invoice = invoices[i][0], parsed_invoices[i]
+        nom = clean_text(nom_facture)
+        best = None
+        for key, similarity in candidates:
+            entry = data.get(key)
+            if key not in positions or entry is None:
+                continue
+            bonus = _address_bonus(addresses, parsed_invoice, key)
+            # Jaro-Winkler minimal pour égaler le meilleur candidat (calcul interrompu en dessous)
+            needed = 2 * (-best[0] - bonus) - similarity - 1e-9 if best else 0.0
+            rank = (similarity + jaro_winkler(nom, index.text(key), max(needed, 0.0))) / 2 + bonus
+            candidate = (-rank, positions[key], key, entry, similarity + bonus, similarity)
+            if best is None or candidate[:2] < best[:2]:
+                best = candidate
+        if best is None:
+            continue
+
+        position, key, entry, score, similarity = best[1:]
+        exact = similarity >= SIMILARITE_PARFAITE
+        if exact:
+            status = STATUS_PARFAITE
+        elif score >= SIMILARITE_PARTIELLE:
+            status = STATUS_PARTIELLE
+        else:
+            status = STATUS_AUCUNE
+        results[i] = {
+            'position': position,
+            'key': key,
+            'entry': entry,
+            'score': round(min(score, 1.0) * 100),
+            'exact': exact,
+            'status': status,
+        }
+    return results
+
+
+def suggest_batch(index, data, invoices, positions=None, addresses=None, lsh=None, phonetic=None, count=SUGGESTION_COUNT):
+    """Meilleures entrées candidates pour chaque facture d'un lot (suggestions de "Ligne BDD")
+
+    Les candidats (noms proches, même code postal, même clé phonétique) sont
+    classés comme dans match_batch (cosinus, Jaro-Winkler, adresse).
+
+    Args:
+        index (TfidfIndex): Index des noms de la base (clé -> nom)
+        data (dict): Entrées de la base (clé -> entrée)
+        invoices (list): Tuples (nom_facture, adresse_facture)
+        positions (dict): Clé -> position dans la base (calculé si absent)
+        addresses (AddressIndex): Adresses normalisées de la base (calculé si absent)
+        lsh (MinHashLSH): Index MinHash-LSH des noms (utilisé à partir de LSH_MIN_ENTRIES entrées)
+        phonetic (PhoneticIndex): Clés phonétiques des noms de la base (calculé si absent)
+        count (int): Nombre de suggestions par facture
+
+    Returns:
+        list: Pour chaque facture, liste de dict (position, key, name, client_code,
+        chorus_code, score sur 100) du meilleur au moins bon
+    """
+    if positions is None:
+        positions = {key: position for position, key in enumerate(data)}
+    if addresses is None:
+        addresses = AddressIndex.from_data(data)
+    if phonetic is None:
+        phonetic = phonetic_index(data)
+    invoices = list(invoices)
+    parsed_invoices, blocks = _address_candidates(addresses, invoices)
+    blocks = _phonetic_candidates(phonetic, invoices, blocks)
+    candidates_by_invoice = _search_candidates(index, lsh, [nom for nom, _ in invoices], count, blocks)
+
+    suggestions = []
+    for (nom_facture, _), parsed_invoice, candidates in zip(invoices, parsed_invoices, candidates_by_invoice):
+        nom = clean_text(nom_facture)
+        ranked = []
+        for key, similarity in candidates:
+            entry = data.get(key)
+            if key not in positions or not isinstance(entry, dict):
+                continue
+            bonus = _address_bonus(addresses, parsed_invoice, key)
+            rank = (similarity + jaro_winkler(nom, index.text(key))) / 2 + bonus
+            ranked.append((-rank, positions[key], key, entry))
+        ranked.sort(key=lambda candidate: candidate[:2])
+        suggestions.append([
+            {
+                'position': position,
+                'key': key,
+                'name': entry.get('name') or key,
+                'client_code': str(entry.get('client_code') or ''),
+                'chorus_code': str(entry.get('chorus_code') or ''),
+                'score': round(min(-rank, 1.0) * 100),
+            }
+            for rank, position, key, entry in ranked[:count]
+        ])
+    return suggestions
+
+
+class MatchDependencies:
+    """Factures liées à chaque entrée de la base (concordance retenue ou candidate)
+
+    Les factures sont désignées par un identifiant quelconque (hachable).
+    """
+
+    def __init__(self):
+        self._rows_by_key = {}
+        self._keys_by_row = {}
+
+    def __len__(self):
+        return len(self._keys_by_row)
+
+    def record(self, row, keys):
+        """Lie une facture à des entrées (en plus des liens déjà connus)"""
+        row_keys = self._keys_by_row.setdefault(row, set())
+        for key in keys:
+            if key is None:
+                continue
+            row_keys.add(key)
+            self._rows_by_key.setdefault(key, set()).add(row)
+
+    def forget(self, row):
+        """Retire tous les liens d'une facture"""
+        for key in self._keys_by_row.pop(row, ()):
+            rows = self._rows_by_key.get(key)
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del self._rows_by_key[key]
+
+    def rows_for(self, keys):
+        """Factures liées à l'une des entrées"""
+        rows = set()
+        for key in keys:
+            rows.update(self._rows_by_key.get(key, ()))
+        return rows
+
+    def clear(self):
+        """Oublie tous les liens"""
+        self._rows_by_key = {}
+        self._keys_by_row = {}
@@ -0,0 +1,398 @@
+"""
+Index MinHash-LSH des noms pour les très grands référentiels.
+
+Au-delà de quelques centaines de milliers d'entrées, comparer chaque facture à
+tout le référentiel (même par listes inverses) devient trop coûteux : les
+n-grammes courants ("ch", "hopital") touchent une grande partie des entrées.
+
+Chaque nom est résumé par une signature MinHash de NUM_PERMUTATIONS valeurs
+calculée sur ses n-grammes de caractères (voir tfidf_index.char_ngrams) : la
+proportion de valeurs communes à deux signatures estime l'indice de Jaccard
+de leurs ensembles de n-grammes. Les signatures sont découpées en BANDS bandes
+de ROWS_PER_BAND valeurs ; deux noms partageant une bande identique sont
+candidats l'un pour l'autre. Une requête ne lit donc que quelques listes de
+hachage, quel que soit le nombre d'entrées. Les bandes partagées par plus de
+MAX_BUCKET_SIZE noms ne distinguent rien et sont ignorées.
+
+L'index peut être enregistré sur disque (save/load, fichier NumPy .npz) pour
+éviter de recalculer les signatures à chaque démarrage.
+
+SharedMinHashLSH partage un index entre les threads de travail : il est relu
+ou construit dans le thread qui en a besoin le premier, puis mis à jour par
+différence de clés avec le référentiel de chaque recherche (seules les
+entrées ajoutées sont signées). Il est réenregistré après une construction
+complète et, après des mises à jour, à la fermeture de l'application.
+"""
+
+import json
+import os
+import threading
+import weakref
+import zlib
+
+import numpy as np
+
+from tfidf_index import char_ngrams, clean_text
+
+# Signature: BANDS bandes de ROWS_PER_BAND valeurs
+BANDS = 16
+ROWS_PER_BAND = 4
+NUM_PERMUTATIONS = BANDS * ROWS_PER_BAND
+
+# Au-delà, une bande est trop commune pour fournir des candidats
+MAX_BUCKET_SIZE = 2000
+
+# Emplacement par défaut de l'index enregistré, à côté de app_state.json
+DEFAULT_LSH_FILE = os.path.join(os.path.expanduser('~'), '.factures_manager', 'minhash_lsh.npz')
+
+# Nombre de textes dont les signatures sont calculées ensemble (mémoire des calculs vectorisés)
+SIGNATURE_CHUNK = 4096
+
+# Hachage universel (a * x + b) mod p, p premier de Mersenne
+_PRIME = (1 << 61) - 1
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+def _permutations(seed):
+    """Coefficients (a, b) des fonctions de hachage de la signature"""
+    rng = np.random.RandomState(seed)
+    # a et b < 2^31, n-grammes hachés sur 32 bits: a * x + b tient dans 64 bits
+    a = rng.randint(1, 1 << 31, size=NUM_PERMUTATIONS).astype(np.uint64)
+    b = rng.randint(0, 1 << 31, size=NUM_PERMUTATIONS).astype(np.uint64)
+    return a, b
+
+
+def shingle_hashes(text):
+    """Hachés 32 bits stables (indépendants du processus) des n-grammes d'un texte"""
+    return np.array([zlib.crc32(gram.encode('utf-8')) for gram in char_ngrams(text)], dtype=np.uint64)
+
+
+class MinHashLSH:
+    """Index LSH incrémental (clé -> texte) sur des signatures MinHash
+
+    Args:
+        seed (int): Graine des fonctions de hachage (identique entre index comparables)
+    """
+
+    def __init__(self, seed=1):
+        self.seed = seed
+        self._a, self._b = _permutations(seed)
+        self._slot_by_key = {}
+        self._slot_by_text = {}
+        self._texts = []
+        self._keys = []
+        self._free_slots = []
+        self._signatures = np.zeros((0, NUM_PERMUTATIONS), dtype=np.uint32)
+        self._buckets = [{} for _ in range(BANDS)]
+
+    def __len__(self):
+        return len(self._slot_by_key)
+
+    def __contains__(self, key):
+        return key in self._slot_by_key
+
+    def keys(self):
+        """Clés indexées"""
+        return self._slot_by_key.keys()
+
+    def clear(self):
+        """Vide l'index"""
+        self.__init__(self.seed)
+
+    def signatures(self, texts):
+        """Signatures MinHash d'une liste de textes (tableau textes x NUM_PERMUTATIONS)"""
+        result = np.full((len(texts), NUM_PERMUTATIONS), 0xFFFFFFFF, dtype=np.uint32)
+        for start in range(0, len(texts), SIGNATURE_CHUNK):
+            hashes = [shingle_hashes(text) for text in texts[start:start + SIGNATURE_CHUNK]]
+            lengths = np.array([len(h) for h in hashes])
+            filled = np.flatnonzero(lengths)
+            if not len(filled):
+                continue
+            # Tous les n-grammes du lot à la suite, puis minimum par texte (reduceat)
+            flat = np.concatenate([hashes[i] for i in filled])
+            values = ((flat[:, None] * self._a + self._b) % np.uint64(_PRIME)) & _MAX_HASH
+            offsets = np.concatenate(([0], np.cumsum(lengths[filled])[:-1]))
+            result[start + filled] = np.minimum.reduceat(values, offsets, axis=0).astype(np.uint32)
+        return result
+
+    def _band_keys(self, signature):
+        """Clés de hachage des bandes d'une signature"""
+        return [signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes() for band in range(BANDS)]
+
+    def _new_slot(self):
+        if self._free_slots:
+            return self._free_slots.pop()
+        slot = len(self._texts)
+        if slot >= len(self._signatures):
+            # Capacité doublée: ajouts en temps constant amorti
+            grown = np.zeros((max(64, 2 * len(self._signatures)), NUM_PERMUTATIONS), dtype=np.uint32)
+            grown[:len(self._signatures)] = self._signatures
+            self._signatures = grown
+        self._texts.append(None)
+        self._keys.append(None)
+        return slot
+
+    def add_many(self, items):
+        """Ajoute (ou remplace) des couples (clé, texte); les signatures sont calculées par lots"""
+        pending = {}
+        for key, text in items:
+            if key in self._slot_by_key:
+                self.remove(key)
+            text = clean_text(text)
+            slot = self._slot_by_text.get(text)
+            if slot is not None:
+                # Texte déjà indexé: la clé rejoint sa ligne
+                self._keys[slot].append(key)
+                self._slot_by_key[key] = slot
+            else:
+                pending.setdefault(text, []).append(key)
+        if not pending:
+            return
+        texts = list(pending)
+        for text, signature in zip(texts, self.signatures(texts)):
+            slot = self._new_slot()
+            self._texts[slot] = text
+            self._keys[slot] = pending[text]
+            self._signatures[slot] = signature
+            self._slot_by_text[text] = slot
+            for key in pending[text]:
+                self._slot_by_key[key] = slot
+            self._insert_bands(slot)
+
+    def add(self, key, text):
+        """Ajoute (ou remplace) le texte associé à une clé"""
+        self.add_many([(key, text)])
+
+    def _insert_bands(self, slot):
+        if not self._texts[slot]:
+            return
+        for buckets, band_key in zip(self._buckets, self._band_keys(self._signatures[slot])):
+            buckets.setdefault(band_key, set()).add(slot)
+
+    def remove(self, key):
+        """Retire une clé de l'index (sans effet si elle est absente)"""
+        slot = self._slot_by_key.pop(key, None)
+        if slot is None:
+            return
+        self._keys[slot].remove(key)
+        if self._keys[slot]:
+            return
+        if self._texts[slot]:
+            for buckets, band_key in zip(self._buckets, self._band_keys(self._signatures[slot])):
+                bucket = buckets.get(band_key)
+                if bucket is not None:
+                    bucket.discard(slot)
+                    if not bucket:
+                        del buckets[band_key]
+        del self._slot_by_text[self._texts[slot]]
+        self._texts[slot] = None
+        self._keys[slot] = None
+        self._free_slots.append(slot)
+
+    def text(self, key):
+        """Texte indexé (normalisé) d'une clé, vide si la clé n'est pas indexée"""
+        slot = self._slot_by_key.get(key)
+        return (self._texts[slot] or "") if slot is not None else ""
+
+    def query_batch(self, texts, limit=20, threshold=0.0):
+        """Clés des noms proches de chaque texte, par indice de Jaccard estimé décroissant
+
+        Args:
+            texts (list): Textes recherchés
+            limit (int): Nombre maximal de textes candidats par requête
+            threshold (float): Indice de Jaccard estimé minimal
+
+        Returns:
+            list: Pour chaque texte, liste de (clé, Jaccard estimé); toutes les clés
+            des `limit` textes les plus proches sont retournées
+        """
+        texts = list(texts)
+        results = []
+        for text, signature in zip(texts, self.signatures(texts)):
+            if not clean_text(text):
+                results.append([])
+                continue
+            slots = set()
+            for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+                bucket = buckets.get(band_key)
+                if bucket and len(bucket) <= MAX_BUCKET_SIZE:
+                    slots.update(bucket)
+            if not slots:
+                results.append([])
+                continue
+            slots = np.fromiter(slots, dtype=np.int64, count=len(slots))
+            estimates = (self._signatures[slots] == signature).mean(axis=1)
+            if len(slots) > limit:
+                best = np.argpartition(-estimates, limit - 1)[:limit]
+                slots, estimates = slots[best], estimates[best]
+            # Jaccard décroissant, puis ordre d'insertion
+            order = np.lexsort((slots, -estimates))
+            results.append([
+                (key, float(estimates[i]))
+                for i in order if estimates[i] >= threshold and estimates[i] > 0
+                for key in self._keys[slots[i]]
+            ])
+        return results
+
+    def query(self, text, limit=20, threshold=0.0):
+        """Clés des noms proches d'un texte (voir query_batch)"""
+        return self.query_batch([text], limit, threshold)[0]
+
+    def save(self, path, fingerprint=""):
+        """Enregistre l'index (textes, clés et signatures) dans un fichier .npz
+
+        Args:
+            fingerprint (str): Empreinte du référentiel indexé, relue par load
+        """
+        slots = [slot for slot, text in enumerate(self._texts) if text is not None]
+        header = {'seed': self.seed, 'bands': BANDS, 'rows': ROWS_PER_BAND, 'fingerprint': fingerprint}
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                header=np.array(json.dumps(header)),
+                texts=np.array([self._texts[slot] for slot in slots], dtype=str),
+                keys=np.array(json.dumps([self._keys[slot] for slot in slots], ensure_ascii=False)),
+                signatures=self._signatures[slots],
+            )
+
+    @classmethod
+    def load(cls, path, fingerprint=None):
+        """Relit un index enregistré par save
+
+        Args:
+            fingerprint (str): Empreinte attendue du référentiel (ignorée si None)
+
+        Returns:
+            MinHashLSH: Index relu, ou None si le fichier est absent, illisible, d'un
+            autre format ou d'une autre empreinte
+        """
+        try:
+            with np.load(path, allow_pickle=False) as content:
+                header = json.loads(str(content['header']))
+                if header.get('bands') != BANDS or header.get('rows') != ROWS_PER_BAND:
+                    return None
+                if fingerprint is not None and header.get('fingerprint') != fingerprint:
+                    return None
+                texts = content['texts'].tolist()
+                keys = json.loads(str(content['keys']))
+                signatures = content['signatures']
+        except (OSError, ValueError, KeyError):
+            return None
+        index = cls(header.get('seed', 1))
+        index._texts = texts
+        index._keys = keys
+        index._signatures = signatures.astype(np.uint32)
+        index._slot_by_text = {text: slot for slot, text in enumerate(texts)}
+        index._slot_by_key = {key: slot for slot, slot_keys in enumerate(keys) for key in slot_keys}
+        for slot in range(len(texts)):
+            index._insert_bands(slot)
+        return index
+
+
+class SharedMinHashLSH:
+    """Index MinHash-LSH partagé entre threads, synchronisé avec le référentiel de chaque recherche
+
+    Args:
+        path (str): Fichier .npz où l'index est relu et enregistré (aucun si None)
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._index = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        _shared_indexes.add(self)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._index) if self._index is not None else 0
+
+    def sync(self, keys, text_of):
+        """Met l'index à jour des clés d'un référentiel (appelé depuis le thread de travail)
+
+        Au premier appel, l'index est relu depuis `path` ou, à défaut, construit
+        entièrement puis enregistré. Ensuite, seules les clés ajoutées ou retirées
+        depuis l'appel précédent sont indexées ou retirées.
+
+        Args:
+            keys (iterable): Clés du référentiel
+            text_of (callable): Clé -> texte indexé
+        """
+        keys = set(keys)
+        with self._lock:
+            built = False
+            if self._index is None:
+                self._index = MinHashLSH.load(self.path) if self.path else None
+                if self._index is None:
+                    self._index = MinHashLSH()
+                    built = True
+            index = self._index
+            removed = [key for key in index.keys() if key not in keys]
+            added = [key for key in keys if key not in index]
+            for key in removed:
+                index.remove(key)
+            if added:
+                index.add_many((key, text_of(key)) for key in added)
+            self._dirty = self._dirty or bool(removed or added)
+            if built:
+                try:
+                    self._save()
+                except OSError:
+                    pass  # Index conservé en mémoire, nouvel essai à la fermeture (save_if_dirty)
+
+    def save_if_dirty(self):
+        """Enregistre l'index s'il a changé depuis sa lecture ou son dernier enregistrement"""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._index.save(self.path)
+        self._dirty = False
+
+    def query_batch(self, texts, limit=20, threshold=0.0):
+        """Voir MinHashLSH.query_batch (l'index n'est pas modifié pendant la requête)"""
+        with self._lock:
+            return self._index.query_batch(texts, limit, threshold) if self._index is not None else [[] for _ in texts]
+
+    def __getstate__(self):
+        # Copie vers un processus de recherche: index seul, sans verrou
+        with self._lock:
+            return {'path': None, '_index': self._index, '_dirty': False}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        _shared_indexes.add(self)
+
+
+# Index partagés du processus. Un fork (pool de processus de recherche) attend
+# qu'aucun thread ne les lise ni ne les modifie : le processus créé reçoit un
+# index cohérent et des verrous libres.
+_shared_indexes = weakref.WeakSet()
+_held_locks = []
+
+
+def _before_fork():
+    for shared in list(_shared_indexes):
+        shared._lock.acquire()
+        _held_locks.append(shared._lock)
+
+
+def _after_fork_in_parent():
+    while _held_locks:
+        _held_locks.pop().release()
+
+
+def _after_fork_in_child():
+    _held_locks.clear()
+    for shared in list(_shared_indexes):
+        shared._lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_before_fork, after_in_parent=_after_fork_in_parent,
+                        after_in_child=_after_fork_in_child)
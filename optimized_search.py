@@ -1,6 +1,88 @@
+import logging
+
+logger = logging.getLogger('FacturesManager')
+
+
+def numero_pur(texte):
+    """Numéro de facture sans préfixe, en minuscules ("Facture N° 1234" -> "1234")"""
+    texte = str(texte).lower().strip()
+    for prefixe in ("facture n°", "facture n", "facture"):
+        if prefixe in texte:
+            return texte.replace(prefixe, "").strip()
+    return texte
+
+
+def position_enregistree(row_data, lire_cellule):
+    """Position du numéro de facture relevée à l'importation, si la cellule le contient toujours
+
+    Args:
+        row_data (dict): Ligne validée; 'cellule' vaut (feuille, ligne, colonne) ou None
+        lire_cellule (callable): (feuille, ligne, colonne) -> valeur de la cellule
+
+    Returns:
+        tuple: (feuille, ligne, colonne), None si la position est inconnue ou ne
+        contient plus ce numéro (fichier modifié depuis l'importation: recherche)
+    """
+    cellule = row_data.get('cellule')
+    if not cellule:
+        return None
+    try:
+        valeur = lire_cellule(*cellule)
+    except Exception as e:
+        logger.debug(f"Cellule {cellule} illisible: {str(e)}")
+        return None
+    if valeur is None:
+        return None
+    attendu, lu = numero_pur(row_data['facture_num']), numero_pur(valeur)
+    chiffres_attendus = ''.join(c for c in attendu if c.isdigit())
+    if lu == attendu or (chiffres_attendus and ''.join(c for c in lu if c.isdigit()) == chiffres_attendus):
+        return tuple(cellule)
+    logger.info(f"Facture {row_data['facture_num']}: la cellule {cellule} a changé depuis l'importation, recherche dans la feuille")
+    return None
+
+
+def positions_codes(facture_row, facture_col):
+    """Cellules du code client (2 lignes sous le numéro) et du code chorus (1 ligne sous le numéro), 6 colonnes à gauche"""
+    col = max(facture_col - 6, 1)
+    return (facture_row + 2, col), (facture_row + 1, col)
+
+
+def ecrire_codes(ecrire_cellule, facture_row, facture_col, code_client, code_chorus):
+    """Insère les codes client et chorus à côté du numéro de facture (voir positions_codes)
+
+    Args:
+        ecrire_cellule (callable): (ligne, colonne, valeur) -> écrit la cellule dans la feuille de la facture
+    """
+    (client_cell_row, client_cell_col), (chorus_cell_row, chorus_cell_col) = positions_codes(facture_row, facture_col)
+    if code_client:
+        ecrire_cellule(client_cell_row, client_cell_col, code_client)
+        logger.info(f"Code client {code_client} inséré dans la cellule ({client_cell_row}, {client_cell_col})")
+    if code_chorus:
+        ecrire_cellule(chorus_cell_row, chorus_cell_col, code_chorus)
+        logger.info(f"Code chorus {code_chorus} inséré dans la cellule ({chorus_cell_row}, {chorus_cell_col})")
+
+
+def ecrire_win32com(sheet):
+    """Écriture d'une cellule d'une feuille ouverte avec win32com (voir ecrire_codes)"""
+    def ecrire_cellule(ligne, col, valeur):
+        sheet.Cells(ligne, col).Value = valeur
+    return ecrire_cellule
+
+
+def ecrire_openpyxl(sheet):
+    """Écriture d'une cellule d'une feuille openpyxl (voir ecrire_codes)"""
+    def ecrire_cellule(ligne, col, valeur):
+        sheet.cell(row=ligne, column=col).value = valeur
+    return ecrire_cellule
+
+
 # Fonction optimisée pour la recherche des factures
 def optimized_win32com_search(self, workbook, validated_rows):
-    """Version optimisée de la recherche de factures avec win32com"""
+    """Version optimisée de la recherche de factures avec win32com
+
+    Les lignes qui portent la position du numéro relevée à l'importation
+    ('cellule') sont traitées sans recherche.
+    """
     # Compteurs pour le rapport
     factures_traitees = 0
     
@@ -25,6 +107,14 @@ def optimized_win32com_search(self, workbook, validated_rows):
         # Log pour débogage
         logger.info(f"Traitement de la facture {facture_num} (UH: {uh}, numéro pur: {facture_num_pur})")
         
+        # Position relevée à l'importation: codes insérés sans recherche
+        position = position_enregistree(row_data, lambda feuille, ligne, col: workbook.Sheets(feuille).Cells(ligne, col).Value)
+        if position:
+            ecrire_codes(ecrire_win32com(workbook.Sheets(position[0])), *position[1:], code_client, code_chorus)
+            logger.info(f"Codes de la facture {facture_num} insérés à la position relevée {position}")
+            factures_traitees += 1
+            continue
+        
         # Facture trouvée et traitée pour cette ligne?
         facture_traitee = False
         
@@ -107,33 +197,8 @@ def optimized_win32com_search(self, workbook, validated_rows):
                 
                 # Si on a trouvé le numéro de facture exact, insérer les codes
                 if facture_trouvee:
-                    # Insérer le code client: 6 cellules à gauche et 2 cellules en dessous du numéro de facture
-                    if code_client:
-                        client_cell_row = facture_row + 2
-                        client_cell_col = facture_col - 6
-                        if client_cell_col < 1:  # Vérifier que la colonne est valide
-                            client_cell_col = 1
-                        
-                        # Log avant insertion pour vérification
-                        logger.info(f"Position du numéro de facture: ({facture_row}, {facture_col})")
-                        logger.info(f"Position calculée pour le code client: ({client_cell_row}, {client_cell_col})")
-                        
-                        sheet.Cells(client_cell_row, client_cell_col).Value = code_client
-                        logger.info(f"Code client {code_client} inséré dans la cellule ({client_cell_row}, {client_cell_col})")
-                    
-                    # Insérer le code chorus: 6 cellules à gauche et 1 cellule en dessous du numéro de facture
-                    if code_chorus:
-                        chorus_cell_row = facture_row + 1
-                        chorus_cell_col = facture_col - 6
-                        if chorus_cell_col < 1:  # Vérifier que la colonne est valide
-                            chorus_cell_col = 1
-                        
-                        # Log avant insertion pour vérification
-                        logger.info(f"Position calculée pour le code chorus: ({chorus_cell_row}, {chorus_cell_col})")
-                        
-                        sheet.Cells(chorus_cell_row, chorus_cell_col).Value = code_chorus
-                        logger.info(f"Code chorus {code_chorus} inséré dans la cellule ({chorus_cell_row}, {chorus_cell_col})")
-                    
+                    logger.info(f"Position du numéro de facture: ({facture_row}, {facture_col})")
+                    ecrire_codes(ecrire_win32com(sheet), facture_row, facture_col, code_client, code_chorus)
                     facture_traitee = True
                     factures_traitees += 1
                     break  # Sortir de la boucle des feuilles car on a trouvé et traité la facture
@@ -148,7 +213,7 @@ def optimized_win32com_search(self, workbook, validated_rows):
 
 # Fonction optimisée pour la recherche des factures avec openpyxl
 def optimized_openpyxl_search(self, workbook, validated_rows):
-    """Version optimisée de la recherche de factures avec openpyxl"""
+    """Version optimisée de la recherche de factures avec openpyxl (voir optimized_win32com_search)"""
     # Compteurs pour le rapport
     factures_traitees = 0
     
@@ -173,6 +238,14 @@ def optimized_openpyxl_search(self, workbook, validated_rows):
         # Log pour débogage
         logger.info(f"Traitement de la facture {facture_num} (UH: {uh}, numéro pur: {facture_num_pur})")
         
+        # Position relevée à l'importation: codes insérés sans recherche
+        position = position_enregistree(row_data, lambda feuille, ligne, col: workbook[feuille].cell(row=ligne, column=col).value)
+        if position:
+            ecrire_codes(ecrire_openpyxl(workbook[position[0]]), *position[1:], code_client, code_chorus)
+            logger.info(f"Codes de la facture {facture_num} insérés à la position relevée {position}")
+            factures_traitees += 1
+            continue
+        
         # Facture trouvée et traitée pour cette ligne?
         facture_traitee = False
         
@@ -253,33 +326,8 @@ def optimized_openpyxl_search(self, workbook, validated_rows):
                 
                 # Si on a trouvé le numéro de facture exact, insérer les codes
                 if facture_trouvee:
-                    # Insérer le code client: 6 cellules à gauche et 2 cellules en dessous du numéro de facture
-                    if code_client:
-                        client_cell_row = facture_row + 2
-                        client_cell_col = facture_col - 6
-                        if client_cell_col < 1:  # Vérifier que la colonne est valide
-                            client_cell_col = 1
-                        
-                        # Log avant insertion pour vérification
-                        logger.info(f"Position du numéro de facture: ({facture_row}, {facture_col})")
-                        logger.info(f"Position calculée pour le code client: ({client_cell_row}, {client_cell_col})")
-                        
-                        sheet.cell(row=client_cell_row, column=client_cell_col).value = code_client
-                        logger.info(f"Code client {code_client} inséré dans la cellule ({client_cell_row}, {client_cell_col})")
-                    
-                    # Insérer le code chorus: 6 cellules à gauche et 1 cellule en dessous du numéro de facture
-                    if code_chorus:
-                        chorus_cell_row = facture_row + 1
-                        chorus_cell_col = facture_col - 6
-                        if chorus_cell_col < 1:  # Vérifier que la colonne est valide
-                            chorus_cell_col = 1
-                        
-                        # Log avant insertion pour vérification
-                        logger.info(f"Position calculée pour le code chorus: ({chorus_cell_row}, {chorus_cell_col})")
-                        
-                        sheet.cell(row=chorus_cell_row, column=chorus_cell_col).value = code_chorus
-                        logger.info(f"Code chorus {code_chorus} inséré dans la cellule ({chorus_cell_row}, {chorus_cell_col})")
-                    
+                    logger.info(f"Position du numéro de facture: ({facture_row}, {facture_col})")
+                    ecrire_codes(ecrire_openpyxl(sheet), facture_row, facture_col, code_client, code_chorus)
                     facture_traitee = True
                     factures_traitees += 1
                     break  # Sortir de la boucle des feuilles car on a trouvé et traité la facture
@@ -0,0 +1,101 @@
+"""
+Recherche de concordances en parallèle, une tâche par UH.
+
+Les factures sont regroupées par UH et chaque groupe est confié à un processus
+du pool. Chaque processus reçoit une seule fois, à son démarrage, une copie en
+lecture seule du référentiel (index TF-IDF compilé, entrées, positions,
+adresses normalisées, formes canoniques et clés phonétiques des noms et,
+pour les très grands référentiels, index MinHash-LSH) ;
+les tâches ne transportent ensuite que les noms et adresses des factures.
+Les résultats sont rendus UH par UH, dans l'ordre de fin de traitement.
+
+Ce module n'importe ni PyQt ni main.py : il est chargé tel quel par les
+processus du pool (y compris en mode "spawn" sous Windows).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from matching_engine import match_batch
+
+# Nombre maximal de processus du pool
+MAX_WORKERS = 8
+
+# En dessous de ce nombre de factures, le démarrage du pool coûte plus qu'il ne rapporte
+PARALLEL_MIN_INVOICES = 2000
+
+# Référentiel du processus courant, installé par _init_worker
+_snapshot = None
+
+
+def default_workers():
+    """Nombre de processus par défaut: un par cœur, au plus MAX_WORKERS"""
+    return max(1, min(MAX_WORKERS, os.cpu_count() or 1))
+
+
+def group_by_uh(rows):
+    """Regroupe des lignes (row, uh, nom, adresse) par UH, dans l'ordre d'apparition
+
+    Returns:
+        list: Tuples (uh, [(row, nom, adresse), ...])
+    """
+    groups = {}
+    for row, uh, nom, adresse in rows:
+        groups.setdefault(uh, []).append((row, nom, adresse))
+    return list(groups.items())
+
+
+def _init_worker(snapshot):
+    """Installe la copie du référentiel dans le processus"""
+    global _snapshot
+    _snapshot = snapshot
+
+
+def _match_chunk(uh, rows, snapshot=None):
+    """Concordances d'un groupe de factures
+
+    Returns:
+        tuple: (uh, [(row, résultat), ...])
+    """
+    index, data, positions, addresses, canonical, lsh, phonetic = snapshot or _snapshot
+    results = match_batch(
+        index, data, [(nom, adresse) for _, nom, adresse in rows], positions, addresses, canonical, lsh, phonetic
+    )
+    return uh, [(row, result) for (row, _, _), result in zip(rows, results)]
+
+
+def match_by_uh(snapshot, rows, workers=None):
+    """Recherche les concordances de lignes de factures, UH par UH
+
+    Générateur: chaque UH est rendue dès que sa recherche est terminée, ce qui
+    permet de mettre à jour l'affichage au fil de l'eau. Fermer le générateur
+    (break) annule les UH pas encore commencées.
+
+    Args:
+        snapshot (tuple): (TfidfIndex, données, positions, AddressIndex, CanonicalIndex,
+            SharedMinHashLSH ou None, PhoneticIndex), voir Database.matching_snapshot
+        rows (list): Tuples (row, uh, nom_facture, adresse_facture)
+        workers (int): Nombre de processus (défaut: default_workers();
+            1 ou peu de factures: traitement dans le processus courant)
+
+    Yields:
+        tuple: (uh, [(row, résultat), ...])
+    """
+    groups = group_by_uh(rows)
+    workers = default_workers() if workers is None else workers
+    if workers <= 1 or len(groups) <= 1 or len(rows) < PARALLEL_MIN_INVOICES:
+        for uh, chunk in groups:
+            yield _match_chunk(uh, chunk, snapshot)
+        return
+
+    executor = ProcessPoolExecutor(
+        max_workers=min(workers, len(groups)),
+        initializer=_init_worker,
+        initargs=(snapshot,),
+    )
+    try:
+        futures = [executor.submit(_match_chunk, uh, chunk) for uh, chunk in groups]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
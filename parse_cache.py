@@ -0,0 +1,212 @@
+"""
+Cache persistant des fichiers de facturation déjà lus.
+
+Le même fichier mensuel est rouvert plusieurs fois par jour : les factures
+lues dans chaque feuille (champs, date, montant et cellule du numéro) sont conservées sur
+disque et réutilisées sans nouvelle lecture.
+
+Deux niveaux de clés :
+    fichier : empreinte du contenu complet du fichier ; un fichier inchangé
+              est rendu tel quel, sans ouvrir l'archive
+    feuille : empreinte de la partie XML de la feuille et des chaînes
+              partagées qu'elle utilise ; dans un fichier modifié, seules
+              les feuilles dont l'empreinte a changé sont relues ; une feuille
+              est mémorisée dès sa lecture, une lecture interrompue profite
+              donc à la suivante
+Le cache est lié à la version du lecteur (invoice_parser.PARSER_VERSION) : il
+est vidé quand les règles de lecture changent.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+
+from xlsx_reader import XlsxReader
+
+logger = logging.getLogger('FacturesManager')
+
+# Emplacement par défaut, à côté de app_state.json
+DEFAULT_PARSE_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.factures_manager', 'parse_cache.json')
+
+# Fichiers gardés en cache (les plus récemment lus); les feuilles des autres sont oubliées
+MAX_CACHED_WORKBOOKS = 24
+
+# Feuilles gardées hors des fichiers mémorisés (lecture interrompue, fichier oublié), les plus récemment lues
+MAX_LOOSE_SHEETS = 500
+
+# Taille des blocs lus pour l'empreinte d'un fichier
+_HASH_BLOCK = 1 << 20
+
+# Indices des chaînes partagées utilisées par une feuille
+_SHARED_STRING_CELL = re.compile(rb'<(?:\w+:)?c\s[^>]*\bt="s"[^>]*>\s*<(?:\w+:)?v>([0-9]+)<')
+
+# Séparateur des champs d'une empreinte
+_SEPARATOR = '\x1f'
+
+# Valeurs de cellule qui se relisent à l'identique depuis le JSON
+_JSON_SCALARS = (str, int, float, bool, type(None))
+
+
+def file_digest(file_path):
+    """Empreinte du contenu d'un fichier"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sheet_digests(file_path, sheet_names):
+    """Empreinte de chaque feuille: XML de la feuille, chaînes partagées utilisées et formats de date
+
+    Returns:
+        dict: Nom de la feuille -> empreinte (feuilles absentes de l'archive omises)
+    """
+    with XlsxReader(file_path) as reader:
+        # Les styles ne comptent que par les formats de date qu'ils désignent
+        settings = json.dumps([
+            sorted(reader.date_styles), sorted(reader.timedelta_styles), reader.epoch.isoformat(),
+        ])
+        digests = {}
+        for sheet_name in sheet_names:
+            if sheet_name not in reader.parts:
+                continue
+            content = reader.sheet_xml(sheet_name)
+            digest = hashlib.sha1(f"{sheet_name}{_SEPARATOR}{settings}{_SEPARATOR}".encode('utf-8'))
+            digest.update(content)
+            # Chaînes réellement utilisées: leur numérotation change à chaque enregistrement
+            strings = reader.shared_strings
+            used = sorted({int(index) for index in _SHARED_STRING_CELL.findall(content)})
+            digest.update(_SEPARATOR.join(
+                f"{index}{_SEPARATOR}{strings[index] if index < len(strings) else ''}" for index in used
+            ).encode('utf-8'))
+            digests[sheet_name] = digest.hexdigest()
+    return digests
+
+
+def cacheable(invoices):
+    """Indique si les factures d'une feuille se relisent à l'identique depuis le JSON"""
+    return all(
+        isinstance(invoice[field], _JSON_SCALARS)
+        for invoice in invoices for field in ('numero', 'client', 'adresse', 'date', 'montant')
+    )
+
+
+class ParseCache:
+    """Factures déjà lues, par empreinte de fichier et de feuille
+
+    Chaque feuille est conservée sous la forme {'invoices': [[numéro, nom, adresse,
+    ligne, colonne, date, montant], ...], 'ignored': nombre de factures ignorées}.
+
+    Args:
+        cache_file (str): Fichier JSON du cache
+    """
+
+    def __init__(self, cache_file=DEFAULT_PARSE_CACHE_FILE):
+        self.cache_file = cache_file
+        self.version = None
+        self.workbooks = {}
+        self.sheets = {}
+        self._modified = False
+
+    def load(self):
+        """Charge le cache depuis le disque (cache vide si le fichier est absent ou illisible)"""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                content = json.load(f)
+            self.version = content.get('version')
+            self.workbooks = content.get('workbooks', {})
+            self.sheets = content.get('sheets', {})
+        except FileNotFoundError:
+            self.version, self.workbooks, self.sheets = None, {}, {}
+        except Exception as e:
+            logger.warning(f"Cache des fichiers de facturation illisible, il sera reconstruit: {str(e)}")
+            self.version, self.workbooks, self.sheets = None, {}, {}
+        self._modified = False
+
+    def save(self):
+        """Enregistre le cache s'il a été modifié
+
+        Seuls les MAX_CACHED_WORKBOOKS derniers fichiers sont gardés avec leurs
+        feuilles, plus les MAX_LOOSE_SHEETS dernières feuilles lues hors de ces fichiers.
+        """
+        if not self._modified:
+            return
+        try:
+            for digest in list(self.workbooks)[:-MAX_CACHED_WORKBOOKS]:
+                del self.workbooks[digest]
+            used = {key for sheets in self.workbooks.values() for key in sheets.values()}
+            loose = [key for key in self.sheets if key not in used]
+            kept = used.union(loose[-MAX_LOOSE_SHEETS:]) if MAX_LOOSE_SHEETS else used
+            self.sheets = {key: sheet for key, sheet in self.sheets.items() if key in kept}
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            temp_file = self.cache_file + '.tmp'
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(
+                    {'version': self.version, 'workbooks': self.workbooks, 'sheets': self.sheets},
+                    f, ensure_ascii=False,
+                )
+            os.replace(temp_file, self.cache_file)
+            self._modified = False
+        except Exception as e:
+            logger.error(f"Erreur lors de l'enregistrement du cache des fichiers de facturation: {str(e)}")
+
+    def bind(self, version):
+        """Associe le cache à une version du lecteur; le vide si la version a changé"""
+        if self.version != version:
+            if self.workbooks or self.sheets:
+                logger.info(f"Lecteur modifié: {len(self.workbooks)} fichier(s) en cache invalidé(s)")
+            self.version = version
+            self.workbooks = {}
+            self.sheets = {}
+            self._modified = True
+
+    def workbook(self, digest):
+        """Empreinte de chaque feuille d'un fichier déjà lu entièrement, None s'il est inconnu
+
+        Returns:
+            dict: Nom de la feuille -> empreinte (ordre du classeur)
+        """
+        sheets = self.workbooks.get(digest)
+        if sheets is None or any(key not in self.sheets for key in sheets.values()):
+            return None
+        if next(reversed(self.workbooks)) != digest:
+            # Fichier le plus récemment lu: gardé le plus longtemps
+            self.workbooks[digest] = self.workbooks.pop(digest)
+            self._modified = True
+        return sheets
+
+    def sheet(self, key):
+        """Feuille en cache ({'invoices', 'ignored'}), None si l'empreinte est inconnue"""
+        return self.sheets.get(key)
+
+    def store_sheet(self, key, invoices, ignored):
+        """Mémorise les factures lues dans une feuille (sans effet si elles ne se relisent pas à l'identique)
+
+        Returns:
+            bool: Feuille mémorisée
+        """
+        if not cacheable(invoices):
+            return False
+        # Feuille la plus récemment lue: gardée le plus longtemps
+        self.sheets.pop(key, None)
+        self.sheets[key] = {
+            'invoices': [
+                [
+                    invoice['numero'], invoice['client'], invoice['adresse'], *invoice['cellule'][1:],
+                    invoice['date'], invoice['montant'],
+                ]
+                for invoice in invoices
+            ],
+            'ignored': ignored,
+        }
+        self._modified = True
+        return True
+
+    def store_workbook(self, digest, sheets):
+        """Mémorise les empreintes des feuilles d'un fichier lu entièrement (nom -> empreinte)"""
+        self.workbooks.pop(digest, None)
+        self.workbooks[digest] = dict(sheets)
+        self._modified = True
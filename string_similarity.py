@@ -0,0 +1,185 @@
+"""
+Mesures de similarité entre chaînes : Jaro-Winkler et distance de Levenshtein bornée.
+
+Les fonctions travaillent sur des chaînes déjà normalisées (voir
+text_normalization.normalize_text) et renvoient une similarité entre 0 et 1.
+Elles acceptent un seuil : dès qu'il est établi que le score ne peut plus
+l'atteindre, le calcul s'arrête et renvoie 0. Les fonctions de lot
+(best_candidate, score_candidates) s'en servent pour ne pas terminer le calcul
+des candidats qui ne peuvent plus battre le meilleur score courant.
+"""
+
+# Bonus Winkler par caractère de préfixe commun, et longueur maximale du préfixe pris en compte
+WINKLER_PREFIX_SCALE = 0.1
+WINKLER_MAX_PREFIX = 4
+
+
+def _common_prefix(a, b, limit):
+    """Longueur du préfixe commun de a et b, plafonnée à `limit`"""
+    length = 0
+    for char_a, char_b in zip(a, b):
+        if char_a != char_b or length == limit:
+            break
+        length += 1
+    return length
+
+
+def jaro_winkler(a, b, threshold=0.0):
+    """Similarité de Jaro-Winkler
+
+    Args:
+        a (str), b (str): Chaînes normalisées
+        threshold (float): Score minimal recherché; 0 est renvoyé dès qu'il devient inatteignable
+
+    Returns:
+        float: Similarité entre 0 et 1
+    """
+    if a == b:
+        return 1.0
+    length_a, length_b = len(a), len(b)
+    if not length_a or not length_b:
+        return 0.0
+
+    # Bonus maximal du préfixe commun, connu avant tout calcul
+    prefix_boost = _common_prefix(a, b, WINKLER_MAX_PREFIX) * WINKLER_PREFIX_SCALE
+
+    # Nombre minimal de caractères communs pour atteindre le seuil (transpositions nulles)
+    if threshold > 0:
+        jaro_needed = (threshold - prefix_boost) / (1 - prefix_boost)
+        matches_needed = (3 * jaro_needed - 1) / (1 / length_a + 1 / length_b)
+        if matches_needed > min(length_a, length_b):
+            return 0.0
+    else:
+        matches_needed = 0
+
+    window = max(max(length_a, length_b) // 2 - 1, 0)
+    matched_b = [False] * length_b
+    matches_a = []
+    for i, char in enumerate(a):
+        start = max(0, i - window)
+        end = min(i + window + 1, length_b)
+        j = b.find(char, start, end)
+        while j != -1 and matched_b[j]:
+            j = b.find(char, j + 1, end)
+        if j != -1:
+            matched_b[j] = True
+            matches_a.append(char)
+        # Arrêt anticipé: même si tous les caractères restants trouvaient un correspondant
+        elif len(matches_a) + length_a - i - 1 < matches_needed:
+            return 0.0
+
+    matches = len(matches_a)
+    if not matches:
+        return 0.0
+    matches_b = [char for char, matched in zip(b, matched_b) if matched]
+    transpositions = sum(1 for char_a, char_b in zip(matches_a, matches_b) if char_a != char_b) // 2
+    jaro = (matches / length_a + matches / length_b + (matches - transpositions) / matches) / 3
+    score = jaro + prefix_boost * (1 - jaro)
+    return score if score >= threshold else 0.0
+
+
+def levenshtein_bounded(a, b, max_distance):
+    """Distance de Levenshtein limitée à une bande de largeur `max_distance`
+
+    Returns:
+        int: Distance d'édition, ou max_distance + 1 si elle dépasse max_distance
+    """
+    if a == b:
+        return 0
+    # Préfixe et suffixe communs ne coûtent rien
+    prefix = _common_prefix(a, b, min(len(a), len(b)))
+    a, b = a[prefix:], b[prefix:]
+    while a and b and a[-1] == b[-1]:
+        a, b = a[:-1], b[:-1]
+    if len(a) > len(b):
+        a, b = b, a
+    length_a, length_b = len(a), len(b)
+    beyond = max_distance + 1
+    if length_b - length_a > max_distance:
+        return beyond
+    if not length_a:
+        return length_b
+
+    previous = [j if j <= max_distance else beyond for j in range(length_b + 1)]
+    for i in range(1, length_a + 1):
+        char = a[i - 1]
+        start = max(1, i - max_distance)
+        end = min(length_b, i + max_distance)
+        current = [beyond] * (length_b + 1)
+        current[0] = i if i <= max_distance else beyond
+        row_min = current[0]
+        for j in range(start, end + 1):
+            cost = previous[j - 1] + (char != b[j - 1])
+            insertion = current[j - 1] + 1
+            deletion = previous[j] + 1
+            value = min(cost, insertion, deletion, beyond)
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        # Arrêt anticipé: toute la bande dépasse déjà la distance maximale
+        if row_min > max_distance:
+            return beyond
+        previous = current
+    return min(previous[length_b], beyond)
+
+
+def levenshtein_similarity(a, b, threshold=0.0):
+    """Similarité 1 - distance / longueur de la plus longue chaîne
+
+    Args:
+        threshold (float): Score minimal recherché; il fixe la largeur de bande de la distance
+
+    Returns:
+        float: Similarité entre 0 et 1 (0 si elle est inférieure au seuil)
+    """
+    longest = max(len(a), len(b))
+    if not longest:
+        return 1.0
+    max_distance = int((1 - threshold) * longest + 1e-9)
+    distance = levenshtein_bounded(a, b, max_distance)
+    if distance > max_distance:
+        return 0.0
+    score = 1 - distance / longest
+    return score if score >= threshold else 0.0
+
+
+SCORERS = {
+    'jaro_winkler': jaro_winkler,
+    'levenshtein': levenshtein_similarity,
+}
+
+
+def score_candidates(query, candidates, scorer=jaro_winkler, threshold=0.0):
+    """Similarité de `query` avec chaque candidat (0 pour ceux sous le seuil)
+
+    Args:
+        query (str): Chaîne normalisée recherchée
+        candidates (list): Chaînes normalisées candidates
+        scorer (callable|str): Fonction de similarité ou nom dans SCORERS
+        threshold (float): Score minimal
+
+    Returns:
+        list: Similarités, dans l'ordre des candidats
+    """
+    scorer = SCORERS.get(scorer, scorer) if isinstance(scorer, str) else scorer
+    return [scorer(query, candidate, threshold) for candidate in candidates]
+
+
+def best_candidate(query, candidates, scorer=jaro_winkler, threshold=0.0):
+    """Meilleur candidat pour `query` (le premier en cas d'égalité)
+
+    Le meilleur score courant sert de seuil aux candidats suivants: leur
+    calcul s'arrête dès qu'ils ne peuvent plus le dépasser.
+
+    Returns:
+        tuple: (indice du candidat, similarité), ou (None, 0.0) si aucun n'atteint le seuil
+    """
+    scorer = SCORERS.get(scorer, scorer) if isinstance(scorer, str) else scorer
+    best_index, best_score = None, 0.0
+    for index, candidate in enumerate(candidates):
+        score = scorer(query, candidate, max(threshold, best_score))
+        if score > best_score or (best_index is None and score > 0 and score >= threshold):
+            best_index, best_score = index, score
+            if best_score == 1.0:
+                break
+    return best_index, best_score
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script de test de la lecture des fichiers de facturation (invoice_parser).
+
+Un petit classeur de plusieurs feuilles UH est généré avec des factures déjà
+codées, des numéros de facture dans une plage fusionnée, des dates et des
+montants écrits de plusieurs façons, et une feuille dont des blocs sont hors
+des colonnes du modèle. La lecture directe (ENGINE_XML) et la lecture avec
+openpyxl (ENGINE_OPENPYXL) doivent rendre exactement les factures écrites.
+
+Utilisation :
+    python test_invoice_parser.py
+"""
+
+import logging
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+from openpyxl import Workbook
+
+from invoice_parser import ENGINE_OPENPYXL, ENGINE_XML, logger, parse_invoice_workbook
+
+SHEET_NAMES = ["UH001", "UH002", "UH003", "UH004"]
+
+# Feuille dont une partie des blocs est en colonne Q (hors des colonnes A et I du modèle)
+EXTRA_COLUMN_SHEET = "UH003"
+
+
+def write_workbook(path):
+    """Classeur de facturation généré
+
+    Bloc n de chaque feuille: codé si n % 5 == 3, numéro dans une plage fusionnée
+    si n % 3 == 1, date en texte, en date Excel ou absente selon n % 3.
+
+    Returns:
+        tuple: (factures attendues (numéro, nom, adresse, cellule, date, montant), nombre de factures codées)
+    """
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    expected = []
+    coded_count = 0
+    number = 100
+    for sheet_name in SHEET_NAMES:
+        sheet = workbook.create_sheet(sheet_name)
+        blocks = [(1 + (block // 2) * 11, 1 if block % 2 == 0 else 9) for block in range(6)]
+        if sheet_name == EXTRA_COLUMN_SHEET:
+            blocks += [(12, 17), (23, 17)]
+        for block, (row, col) in enumerate(blocks):
+            number += 1
+            name = f"Clinique {sheet_name} n°{block}"
+            address = f"{number} rue de la Paix 75000"
+            sheet.cell(row, col, "Intitulé")
+            sheet.cell(row, col + 1, name)
+            if block % 3 == 1:
+                # Numéro écrit dans le coin de la plage G:H, lu en H
+                sheet.merge_cells(start_row=row, start_column=col + 1, end_row=row, end_column=col + 5)
+                sheet.cell(row, col + 6, f"Facture N° {number}")
+                sheet.merge_cells(start_row=row, start_column=col + 6, end_row=row, end_column=col + 7)
+            else:
+                sheet.merge_cells(start_row=row, start_column=col + 1, end_row=row, end_column=col + 6)
+                sheet.cell(row, col + 7, f"Facture N° {number}")
+            sheet.cell(row + 1, col, "Code chorus")
+            day = f"2025-03-{block + 1:02d}"
+            if block % 3 == 0:
+                sheet.cell(row + 1, col + 6, "Date")
+                sheet.cell(row + 1, col + 7, f"{block + 1:02d}/03/2025")
+            elif block % 3 == 1:
+                sheet.cell(row + 1, col + 6, "Date")
+                sheet.cell(row + 1, col + 7, datetime(2025, 3, block + 1))
+            else:
+                day = ""
+            sheet.cell(row + 2, col, "Code client")
+            sheet.cell(row + 2, col + 4, "Adresse")
+            sheet.cell(row + 2, col + 5, address)
+            sheet.merge_cells(start_row=row + 2, start_column=col + 5, end_row=row + 2, end_column=col + 7)
+            amount = 10.0 * (block + 1) + 0.5
+            sheet.cell(row + 4, col + 4, "Analyse")
+            sheet.cell(row + 4, col + 7, amount)
+            sheet.cell(row + 9, col + 6, "Total")
+            sheet.cell(row + 9, col + 7, amount if block % 2 else f"{amount:.2f}".replace(".", ",") + " €")
+            if block % 5 == 3:
+                sheet.cell(row + 2, col + 1, "C12345")
+                coded_count += 1
+            else:
+                expected.append((f"Facture N° {number}", name, address, (sheet_name, row, col + 7), day, amount))
+    workbook.save(path)
+    # Ordre de lecture: feuille, puis ligne, puis colonne de l'ancre
+    order = {sheet_name: index for index, sheet_name in enumerate(SHEET_NAMES)}
+    expected.sort(key=lambda invoice: (order[invoice[3][0]], invoice[3][1], invoice[3][2]))
+    return expected, coded_count
+
+
+def read(path, engine):
+    """Factures lues avec un moteur, nombre de factures ignorées, messages de journal"""
+    messages = []
+    handler = logging.Handler(logging.DEBUG)
+    handler.emit = lambda record: messages.append(record.getMessage())
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    try:
+        invoices, ignored, interrupted = parse_invoice_workbook(path, workers=1, engine=engine)
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+    assert not interrupted
+    records = [
+        (invoice['numero'], invoice['client'], invoice['adresse'], invoice['cellule'], invoice['date'], invoice['montant'])
+        for invoice in invoices
+    ]
+    return records, ignored, messages
+
+
+def test_engines_read_written_invoices():
+    """Lecture directe et openpyxl: factures écrites, dans l'ordre du classeur, mêmes champs"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        expected, coded_count = write_workbook(path)
+        for engine in (ENGINE_XML, ENGINE_OPENPYXL):
+            invoices, ignored, _ = read(path, engine)
+            assert invoices == expected, (engine, [i for i, e in zip(invoices, expected) if i != e][:3])
+            assert ignored == coded_count, engine
+
+
+def test_coded_invoices_skipped():
+    """Factures déjà codées: ignorées et comptées par les deux moteurs"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        expected, coded_count = write_workbook(path)
+        assert coded_count == len(SHEET_NAMES)
+        for engine in (ENGINE_XML, ENGINE_OPENPYXL):
+            invoices, ignored, _ = read(path, engine)
+            assert ignored == coded_count
+            assert all(not name.endswith("n°3") for _, name, *_ in invoices)
+        assert len(expected) + coded_count == 6 * len(SHEET_NAMES) + 2
+
+
+def test_merged_invoice_number():
+    """Numéro de facture vide dans une plage fusionnée: valeur du coin de la plage"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        expected, _ = write_workbook(path)
+        merged = [invoice for invoice in expected if invoice[1].endswith(("n°1", "n°4", "n°7"))]
+        assert merged
+        for engine in (ENGINE_XML, ENGINE_OPENPYXL):
+            invoices, _, _ = read(path, engine)
+            assert [invoice for invoice in invoices if invoice in merged] == merged, engine
+
+
+def test_full_scan_fallback():
+    """Blocs hors des colonnes du modèle: la lecture directe examine toute la feuille, elle seule"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        expected, _ = write_workbook(path)
+        invoices, _, messages = read(path, ENGINE_XML)
+        fallbacks = [message for message in messages if "examinée entièrement" in message]
+        assert len(fallbacks) == 1 and EXTRA_COLUMN_SHEET in fallbacks[0], fallbacks
+        outside = [invoice for invoice in invoices if invoice[3][2] == 17 + 7]
+        assert len(outside) == 2 and all(invoice[3][0] == EXTRA_COLUMN_SHEET for invoice in outside)
+        assert invoices == expected == read(path, ENGINE_OPENPYXL)[0]
+
+
+def main():
+    """Exécute tous les tests du module"""
+    tests = [(name, function) for name, function in globals().items() if name.startswith('test_') and callable(function)]
+    failures = 0
+    for name, function in tests:
+        try:
+            function()
+            print(f"OK     {name}")
+        except Exception as e:
+            failures += 1
+            print(f"ÉCHEC  {name}: {type(e).__name__}: {e}")
+    print(f"{len(tests) - failures}/{len(tests)} tests réussis")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script de test de la synthèse des montants des factures (invoice_totals).
+
+Les totaux par UH et par client d'InvoiceTotals sont comparés à un calcul
+direct en Python : factures sans date (NaT), UH dont aucune facture n'est
+datée (première et dernière dates vides), ordre des clients par montant
+décroissant puis par nom, ajouts feuille par feuille après une agrégation.
+
+Utilisation :
+    python test_invoice_totals.py
+"""
+
+import math
+import random
+import sys
+
+from invoice_parser import new_invoice
+from invoice_totals import InvoiceTotals
+
+
+def reference_totals(invoices):
+    """Totaux par UH et par client, calculés facture par facture"""
+    by_uh, by_client = {}, {}
+    for invoice in invoices:
+        uh = by_uh.setdefault(invoice['uh'], {'count': 0, 'amount': 0.0, 'dates': []})
+        uh['count'] += 1
+        uh['amount'] += invoice['montant']
+        if invoice['date']:
+            uh['dates'].append(invoice['date'])
+        client = str(invoice['client'] or "").strip()
+        count, amount = by_client.get(client, (0, 0.0))
+        by_client[client] = (count + 1, amount + invoice['montant'])
+    uhs = [
+        (name, uh['count'], uh['amount'], min(uh['dates'], default=""), max(uh['dates'], default=""))
+        for name, uh in sorted(by_uh.items())
+    ]
+    clients = [(client, count, amount) for client, (count, amount) in by_client.items()]
+    clients.sort(key=lambda item: (-round(item[2], 2), item[0]))
+    return uhs, clients
+
+
+def assert_same(result, expected):
+    """Mêmes lignes; montants égaux au centime près"""
+    assert len(result) == len(expected), (result, expected)
+    for row, reference in zip(result, expected):
+        assert math.isclose(row[2], reference[2], abs_tol=0.005), (row, reference)
+        assert row[:2] + row[3:] == reference[:2] + reference[3:], (row, reference)
+
+
+def generated_invoices(count=600, seed=3):
+    """Factures aléatoires: environ une sur cinq sans date, quelques avoirs, noms à espaces"""
+    rng = random.Random(seed)
+    clients = ["Clinique du Parc", " Clinique du Parc ", "Pharmacie Dupont", "CHU Nord", None, "", "Labo Sud"]
+    invoices = []
+    for number in range(count):
+        date = "" if rng.random() < 0.2 else f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        amount = round(rng.uniform(-50, 500), 2)
+        invoices.append(new_invoice(f"UH{rng.randint(1, 12):03d}", str(number), rng.choice(clients), "",
+                                    date_facture=date, montant=amount))
+    return invoices
+
+
+def totals_of(invoices, sheet_size=37):
+    """InvoiceTotals rempli feuille par feuille, comme pendant l'importation"""
+    totals = InvoiceTotals()
+    for index in range(0, len(invoices), sheet_size):
+        totals.extend(invoices[index:index + sheet_size])
+    return totals
+
+
+def test_matches_reference():
+    """Totaux par UH et par client identiques au calcul direct"""
+    invoices = generated_invoices()
+    totals = totals_of(invoices)
+    uhs, clients = reference_totals(invoices)
+    assert len(totals) == len(invoices)
+    assert math.isclose(totals.total, sum(invoice['montant'] for invoice in invoices), abs_tol=0.005)
+    assert_same(totals.by_uh(), uhs)
+    assert_same(totals.by_client(), clients)
+
+
+def test_undated_invoices():
+    """Factures sans date: comptées et sommées, exclues des première et dernière dates"""
+    invoices = [
+        new_invoice("UH001", "1", "A", "", date_facture="", montant=10.0),
+        new_invoice("UH001", "2", "A", "", date_facture="2025-03-10", montant=20.0),
+        new_invoice("UH001", "3", "B", "", date_facture="", montant=5.0),
+        new_invoice("UH001", "4", "B", "", date_facture="2025-01-31", montant=1.5),
+    ]
+    result = totals_of(invoices, sheet_size=1).by_uh()
+    assert result == [("UH001", 4, 36.5, "2025-01-31", "2025-03-10")]
+    assert_same(result, reference_totals(invoices)[0])
+
+
+def test_uh_without_dated_invoice():
+    """UH dont aucune facture n'est datée: première et dernière dates vides, autres UH inchangées"""
+    invoices = [
+        new_invoice("UH002", "1", "A", "", date_facture="2025-02-05", montant=1.0),
+        new_invoice("UH001", "2", "A", "", date_facture="", montant=2.0),
+        new_invoice("UH001", "3", "B", "", date_facture="", montant=3.0),
+    ]
+    result = totals_of(invoices).by_uh()
+    assert result == [("UH001", 2, 5.0, "", ""), ("UH002", 1, 1.0, "2025-02-05", "2025-02-05")]
+    assert_same(result, reference_totals(invoices)[0])
+    # Aucune facture datée du tout
+    undated = [new_invoice("UH003", "4", "C", "", montant=7.0)]
+    assert totals_of(undated).by_uh() == [("UH003", 1, 7.0, "", "")]
+
+
+def test_by_client_ordering():
+    """Clients par montant décroissant, égalités par nom; noms regroupés après suppression des espaces"""
+    invoices = [
+        new_invoice("UH001", "1", "Zèbre", "", montant=50.0),
+        new_invoice("UH001", "2", "Alpha", "", montant=50.0),
+        new_invoice("UH001", "3", " Beta ", "", montant=30.0),
+        new_invoice("UH002", "4", "Beta", "", montant=40.0),
+        new_invoice("UH002", "5", "Avoir", "", montant=-20.0),
+        new_invoice("UH002", "6", None, "", montant=0.0),
+    ]
+    result = totals_of(invoices).by_client()
+    assert [row[0] for row in result] == ["Beta", "Alpha", "Zèbre", "", "Avoir"]
+    assert result[0] == ("Beta", 2, 70.0)
+    assert_same(result, reference_totals(invoices)[1])
+
+
+def test_extend_after_aggregation():
+    """Feuille ajoutée après un premier affichage: les totaux sont recalculés"""
+    invoices = generated_invoices(200)
+    totals = totals_of(invoices[:120])
+    assert_same(totals.by_uh(), reference_totals(invoices[:120])[0])
+    totals.extend(invoices[120:])
+    uhs, clients = reference_totals(invoices)
+    assert_same(totals.by_uh(), uhs)
+    assert_same(totals.by_client(), clients)
+    totals.clear()
+    assert len(totals) == 0 and totals.total == 0.0 and totals.by_uh() == [] and totals.by_client() == []
+
+
+def main():
+    """Exécute tous les tests du module"""
+    tests = [(name, function) for name, function in globals().items() if name.startswith('test_') and callable(function)]
+    failures = 0
+    for name, function in tests:
+        try:
+            function()
+            print(f"OK     {name}")
+        except Exception as e:
+            failures += 1
+            print(f"ÉCHEC  {name}: {type(e).__name__}: {e}")
+    print(f"{len(tests) - failures}/{len(tests)} tests réussis")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
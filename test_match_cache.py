@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script de test du cache persistant des concordances (match_cache).
+
+Une concordance "Parfaite" ne dépend que de l'entrée retenue : elle survit aux
+modifications des autres entrées, pas à celles de sa propre entrée. Une
+concordance partielle ou absente est recalculée dès que le référentiel change.
+Un changement de réglages ou de version de l'algorithme vide le cache.
+
+Utilisation :
+    python test_match_cache.py
+"""
+
+import os
+import sys
+import tempfile
+
+import match_cache
+from match_cache import MatchCache, matching_fingerprint, referential_fingerprint
+from matching_engine import STATUS_PARFAITE, STATUS_PARTIELLE
+
+DATA = {
+    'clinique des lilas': {'address': "41 avenue du Maréchal Juin 93260 Les Lilas"},
+    'pharmacie dupont': {'address': "3 rue de la Paix 75002 Paris"},
+    'hopital nord': {'address': "Chemin des Bourrely 13015 Marseille"},
+}
+
+
+def positions_of(data):
+    return {key: position for position, key in enumerate(data)}
+
+
+def result(data, key, status):
+    """Résultat au format de matching_engine.match_batch"""
+    return {
+        'position': positions_of(data)[key], 'key': key, 'entry': data[key],
+        'score': 100 if status == STATUS_PARFAITE else 70, 'exact': status == STATUS_PARFAITE, 'status': status,
+    }
+
+
+def filled_cache(path, data):
+    """Cache lié à `data`: une concordance parfaite, une partielle, une absence de concordance, enregistré"""
+    cache = MatchCache(path)
+    cache.bind(matching_fingerprint(), referential_fingerprint(data))
+    cache.store("Clinique des Lilas", "", result(data, 'clinique des lilas', STATUS_PARFAITE))
+    cache.store("Pharmacie Dupond", "", result(data, 'pharmacie dupont', STATUS_PARTIELLE))
+    cache.store("Inconnu", "", None)
+    cache.save()
+    return cache
+
+
+def reopen(path, data, settings=""):
+    """Cache relu depuis le disque et lié à l'état `data` du référentiel"""
+    cache = MatchCache(path)
+    cache.load()
+    cache.bind(matching_fingerprint(settings), referential_fingerprint(data))
+    return cache
+
+
+def test_unchanged_referential():
+    """Référentiel inchangé: les trois concordances sont reprises"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'match_cache.json')
+        filled_cache(path, DATA)
+        cache = reopen(path, DATA)
+        positions = positions_of(DATA)
+        found, resultat = cache.lookup("CLINIQUE DES LILAS", "", DATA, positions)
+        assert found and resultat['key'] == 'clinique des lilas' and resultat['status'] == STATUS_PARFAITE
+        found, resultat = cache.lookup("pharmacie dupond", "", DATA, positions)
+        assert found and resultat['key'] == 'pharmacie dupont' and resultat['status'] == STATUS_PARTIELLE
+        assert cache.lookup("Inconnu", "", DATA, positions) == (True, None)
+        assert cache.hits == 3 and cache.misses == 0
+
+
+def test_perfect_match_survives_unrelated_edit():
+    """Autre entrée modifiée et entrée ajoutée: la concordance parfaite reste, les autres sont recalculées"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'match_cache.json')
+        filled_cache(path, DATA)
+        edited = dict(DATA)
+        edited['hopital nord'] = {'address': "1 rue Neuve 13015 Marseille"}
+        edited['pharmacie dupond'] = {'address': "5 rue de la Paix 75002 Paris"}
+        cache = reopen(path, edited)
+        positions = positions_of(edited)
+        found, resultat = cache.lookup("Clinique des Lilas", "", edited, positions)
+        assert found and resultat['key'] == 'clinique des lilas'
+        assert cache.lookup("Pharmacie Dupond", "", edited, positions) == (False, None)
+        assert cache.lookup("Inconnu", "", edited, positions) == (False, None)
+        # Concordances périmées retirées du cache
+        assert len(cache.entries) == 1
+
+
+def test_perfect_match_dropped_when_own_entry_changes():
+    """Entrée retenue renommée ou d'adresse modifiée: la concordance parfaite est recalculée"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'match_cache.json')
+        filled_cache(path, DATA)
+
+        moved = dict(DATA)
+        moved['clinique des lilas'] = {'address': "2 rue de Paris 93260 Les Lilas"}
+        cache = reopen(path, moved)
+        assert cache.lookup("Clinique des Lilas", "", moved, positions_of(moved)) == (False, None)
+
+        renamed = {('clinique les lilas' if key == 'clinique des lilas' else key): entry for key, entry in DATA.items()}
+        cache = reopen(path, renamed)
+        assert cache.lookup("Clinique des Lilas", "", renamed, positions_of(renamed)) == (False, None)
+
+
+def test_settings_change_empties_cache():
+    """Réglages de la concordance modifiés (abréviations): toutes les concordances sont abandonnées"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'match_cache.json')
+        filled_cache(path, DATA)
+        cache = reopen(path, DATA, settings="abréviations modifiées")
+        positions = positions_of(DATA)
+        assert cache.entries == {}
+        assert cache.lookup("Pharmacie Dupond", "", DATA, positions) == (False, None)
+        assert cache.lookup("Clinique des Lilas", "", DATA, positions) == (False, None)
+
+
+def test_matching_version_discards_file():
+    """Version de l'algorithme incrémentée: le fichier enregistré n'est pas réutilisé"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'match_cache.json')
+        filled_cache(path, DATA)
+        version = match_cache.MATCHING_VERSION
+        match_cache.MATCHING_VERSION = version + 1
+        try:
+            cache = reopen(path, DATA)
+            assert cache.entries == {}
+            cache.save()
+            cache = MatchCache(path)
+            cache.load()
+            assert cache.entries == {} and cache.matching == matching_fingerprint()
+        finally:
+            match_cache.MATCHING_VERSION = version
+
+
+def main():
+    """Exécute tous les tests du module"""
+    tests = [(name, function) for name, function in globals().items() if name.startswith('test_') and callable(function)]
+    failures = 0
+    for name, function in tests:
+        try:
+            function()
+            print(f"OK     {name}")
+        except Exception as e:
+            failures += 1
+            print(f"ÉCHEC  {name}: {type(e).__name__}: {e}")
+    print(f"{len(tests) - failures}/{len(tests)} tests réussis")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
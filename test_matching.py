@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script de test de la recherche de concordances (tfidf_index, matching_engine,
+invoice_matching, parallel_matching).
+
+Vérifie l'index TF-IDF (ajouts, suppressions, copie figée, meilleurs candidats
+contre un calcul direct des cosinus), les seuils des statuts Parfaite /
+Partielle / Aucune, la résolution exacte par forme canonique, les candidats du
+code postal, l'ordre de consultation de run_matching (alias, cache, recherche)
+et l'égalité des résultats avec et sans pool de processus.
+
+Utilisation :
+    python test_matching.py
+"""
+
+import math
+import os
+import sys
+import tempfile
+from collections import Counter
+
+import matching_engine
+import parallel_matching
+from address_normalization import AddressIndex
+from alias_table import AliasTable
+from canonical_names import CanonicalIndex
+from invoice_matching import SOURCE_ALIAS, SOURCE_CACHE, SOURCE_RECHERCHE, invoice_record, run_matching
+from match_cache import MatchCache, matching_fingerprint, referential_fingerprint
+from matching_engine import (
+    DUPLICATE_KEY_SUFFIX, SIMILARITE_PARFAITE, SIMILARITE_PARTIELLE,
+    STATUS_AUCUNE, STATUS_PARFAITE, STATUS_PARTIELLE, match_batch,
+)
+from tfidf_index import TfidfIndex, char_ngrams, clean_text
+
+# Petit référentiel: clé -> entrée, dans l'ordre des lignes BDD
+DATA = {
+    'clinique des lilas': {'name': "Clinique des Lilas", 'address': "41 avenue du Maréchal Juin 93260 Les Lilas", 'client_code': "C001", 'chorus_code': ""},
+    'centre hospitalier de troyes': {'name': "Centre Hospitalier de Troyes", 'address': "101 avenue Anatole France 10000 Troyes", 'client_code': "C002", 'chorus_code': "H002"},
+    'pharmacie dupont': {'name': "Pharmacie Dupont", 'address': "3 rue de la Paix 75002 Paris", 'client_code': "C003", 'chorus_code': ""},
+    'laboratoire biolab': {'name': "Laboratoire Biolab", 'address': "12 boulevard de l'Hôpital 75013 Paris", 'client_code': "C004", 'chorus_code': ""},
+    'laboratoire biolab_1': {'name': "Laboratoire Biolab", 'address': "8 rue Nationale 69003 Lyon", 'client_code': "C005", 'chorus_code': ""},
+    'ehpad les tilleuls': {'name': "EHPAD Les Tilleuls", 'address': "5 chemin des Vignes 33000 Bordeaux", 'client_code': "C006", 'chorus_code': ""},
+    'clinique saint jean': {'name': "Clinique Saint Jean", 'address': "20 rue Saint-Jean 34000 Montpellier", 'client_code': "C007", 'chorus_code': ""},
+    'hopital nord': {'name': "Hôpital Nord", 'address': "Chemin des Bourrely 13015 Marseille", 'client_code': "C008", 'chorus_code': "H008"},
+}
+
+
+def base_name(key):
+    return DUPLICATE_KEY_SUFFIX.sub('', str(key))
+
+
+def build_index(data):
+    index = TfidfIndex()
+    for key in data:
+        index.add(key, base_name(key))
+    return index
+
+
+def build_snapshot(data):
+    """Instantané du référentiel au format de Database.matching_snapshot"""
+    return (
+        build_index(data).frozen(), dict(data), {key: position for position, key in enumerate(data)},
+        AddressIndex.from_data(data), matching_engine.canonical_index(data), None,
+        matching_engine.phonetic_index(data),
+    )
+
+
+def brute_force_similarities(texts, query):
+    """Cosinus TF-IDF calculé directement (clé -> similarité), sans listes inverses"""
+    distinct = {clean_text(text) for text in texts.values()}
+    document_frequency = Counter()
+    for text in distinct:
+        document_frequency.update(char_ngrams(text).keys())
+
+    def vector(text):
+        weights = {}
+        for gram, count in char_ngrams(text).items():
+            frequency = document_frequency.get(gram, 0)
+            weights[gram] = (1 + math.log(count)) * (math.log((1 + len(distinct)) / (1 + frequency)) + 1)
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        return {gram: weight / norm for gram, weight in weights.items()} if norm else {}
+
+    query_vector = vector(query)
+    return {
+        key: sum(weight * vector(text).get(gram, 0.0) for gram, weight in query_vector.items())
+        for key, text in texts.items()
+    }
+
+
+def check_search(index, texts, query, top_k):
+    """Meilleurs candidats de l'index identiques au calcul direct des cosinus"""
+    reference = brute_force_similarities(texts, query)
+    found = index.search(query, top_k)
+    assert found, f"aucun candidat pour {query!r}"
+    for key, similarity in found:
+        assert abs(similarity - reference[key]) < 1e-9, f"{key}: {similarity} != {reference[key]}"
+    assert [similarity for _, similarity in found] == sorted((similarity for _, similarity in found), reverse=True)
+    # Aucune clé écartée ne fait mieux que la dernière retenue
+    kept = {key for key, _ in found}
+    worst = min(similarity for _, similarity in found)
+    assert all(similarity <= worst + 1e-9 for key, similarity in reference.items() if key not in kept)
+
+
+def test_tfidf_top_k_brute_force():
+    """Meilleurs candidats et similarités de search identiques au calcul direct"""
+    texts = {key: base_name(key) for key in DATA}
+    index = build_index(DATA)
+    for query in ["Clinique des Lila", "laboratoire bio lab", "pharmacie dupond", "CH Troyes", "clinique"]:
+        for top_k in (1, 3):
+            check_search(index, texts, query, top_k)
+    # Clés de même texte (doublons de la base): retournées ensemble
+    assert {key for key, _ in index.search("laboratoire biolab", 1)} == {'laboratoire biolab', 'laboratoire biolab_1'}
+
+
+def test_tfidf_add_remove():
+    """Index modifié entrée par entrée identique à un index reconstruit"""
+    index = build_index(DATA)
+    index.search("clinique", 3)
+    index.remove('pharmacie dupont')
+    index.remove('laboratoire biolab_1')
+    index.add('clinique du parc', "clinique du parc")
+    index.add('hopital nord', "hopital nord marseille")
+    texts = {key: base_name(key) for key in DATA if key not in ('pharmacie dupont', 'laboratoire biolab_1')}
+    texts['clinique du parc'] = "clinique du parc"
+    texts['hopital nord'] = "hopital nord marseille"
+    assert len(index) == len(texts) and 'pharmacie dupont' not in index
+    rebuilt = TfidfIndex()
+    for key, text in texts.items():
+        rebuilt.add(key, text)
+    for query in ["clinique parc", "pharmacie dupont", "hopital nord", "laboratoire biolab"]:
+        check_search(index, texts, query, 3)
+        assert [key for key, _ in index.search(query, 3)] == [key for key, _ in rebuilt.search(query, 3)]
+    assert all(key != 'pharmacie dupont' for key, _ in index.search("pharmacie dupont", 5))
+
+
+def test_tfidf_frozen():
+    """Copie figée inchangée par les modifications suivantes de l'index"""
+    index = build_index(DATA)
+    frozen = index.frozen()
+    before = frozen.search("clinique des lilas", 3)
+    index.remove('clinique des lilas')
+    index.add('clinique des lilas bis', "clinique des lilas bis")
+    assert frozen.search("clinique des lilas", 3) == before
+    assert frozen.text('clinique des lilas') == "clinique des lilas"
+    assert 'clinique des lilas' not in index and index.search("clinique des lilas", 1)[0][0] == 'clinique des lilas bis'
+
+
+def test_status_thresholds():
+    """Statut selon la similarité cosinus + adresse de l'entrée retenue (sans forme canonique)"""
+    index = build_index(DATA)
+    no_canonical = CanonicalIndex()
+
+    def match(name, address=""):
+        return match_batch(index, DATA, [(name, address)], canonical=no_canonical)[0]
+
+    # Nom identique: Parfaite
+    result = match("CLINIQUE DES LILAS")
+    assert result['key'] == 'clinique des lilas' and result['status'] == STATUS_PARFAITE and result['exact']
+    assert result['score'] == 100
+
+    # Faute de frappe: similarité entre les deux seuils, Partielle
+    similarity = dict(index.similarities("clinique des lilsa", ['clinique des lilas']))['clinique des lilas']
+    assert SIMILARITE_PARTIELLE <= similarity < SIMILARITE_PARFAITE
+    result = match("clinique des lilsa")
+    assert result['key'] == 'clinique des lilas' and result['status'] == STATUS_PARTIELLE and not result['exact']
+
+    # Nom à peine ressemblant: entrée retenue, mais Aucune
+    similarity = dict(index.similarities("lilas", ['clinique des lilas']))['clinique des lilas']
+    assert similarity < SIMILARITE_PARTIELLE
+    result = match("lilas")
+    assert result['key'] == 'clinique des lilas' and result['status'] == STATUS_AUCUNE
+
+    # Aucun n-gramme commun: pas de résultat
+    assert match("xyzw qvk") is None
+
+
+def test_canonical_exact_match():
+    """Même forme canonique: Parfaite sans recherche approximative, nom identique puis adresse préférés"""
+    index = build_index(DATA)
+    results = match_batch(index, DATA, [
+        ("CH de Troyes", ""),
+        ("Laboratoire BIOLAB", "8 rue Nationale 69003 Lyon"),
+        ("Laboratoire Biolab", ""),
+    ])
+    assert results[0]['key'] == 'centre hospitalier de troyes'
+    assert results[0]['status'] == STATUS_PARFAITE and results[0].get('canonical')
+    # Doublons de même nom: l'adresse départage, puis l'ordre de la base
+    assert results[1]['key'] == 'laboratoire biolab_1' and results[1].get('canonical')
+    assert results[2]['key'] == 'laboratoire biolab'
+
+
+def test_postal_code_block():
+    """Entrées du même code postal ajoutées aux candidats, sauf code postal trop courant"""
+    index = build_index(DATA)
+    # Aucun candidat TF-IDF (top_k=0): seules les entrées du code postal de la facture sont examinées
+    result = match_batch(index, DATA, [("Clinique Lilas Centre", "41 av du Marechal Juin 93260 LES LILAS")], top_k=0)[0]
+    assert result is not None and result['key'] == 'clinique des lilas'
+    assert match_batch(index, DATA, [("Clinique Lilas Centre", "")], top_k=0)[0] is None
+    assert match_batch(index, DATA, [("Clinique Lilas Centre", "1 rue X 59000 Lille")], top_k=0)[0] is None
+
+    # Code postal partagé par plus de POSTAL_BLOCK_MAX entrées: ignoré
+    crowded = dict(DATA)
+    for number in range(matching_engine.POSTAL_BLOCK_MAX):
+        crowded[f'cabinet {number}'] = {'name': f"Cabinet {number}", 'address': f"{number} rue Haute 93260 Les Lilas"}
+    result = match_batch(build_index(crowded), crowded, [("Clinique Lilas Centre", "41 av du Marechal Juin 93260 LES LILAS")], top_k=0)[0]
+    assert result is None
+
+
+def test_phonetic_block():
+    """Entrées de même clé phonétique ajoutées aux candidats"""
+    index = build_index(DATA)
+    result = match_batch(index, DATA, [("Farmacie Dupond", "")], top_k=0)[0]
+    assert result is not None and result['key'] == 'pharmacie dupont'
+
+
+def test_run_matching_precedence():
+    """Alias appris, puis cache des concordances, puis recherche"""
+    snapshot = build_snapshot(DATA)
+    aliases = AliasTable({})
+    aliases.record("Clinique Lilas", "", 'hopital nord')
+    with tempfile.TemporaryDirectory() as directory:
+        cache = MatchCache(os.path.join(directory, 'match_cache.json'))
+        cache.bind(matching_fingerprint(), referential_fingerprint(DATA))
+        positions = snapshot[2]
+        # En cache: une concordance "Parfaite" vers une autre entrée que celle de la recherche
+        for nom in ("Clinique Lilas", "Pharmacie Dupond"):
+            cache.store(nom, "", {
+                'position': positions['ehpad les tilleuls'], 'key': 'ehpad les tilleuls',
+                'entry': DATA['ehpad les tilleuls'], 'score': 100, 'exact': True, 'status': STATUS_PARFAITE,
+            })
+        records = [
+            invoice_record(0, "UH1", "Clinique Lilas"),
+            invoice_record(1, "UH1", "Pharmacie Dupond"),
+            invoice_record(2, "UH2", "Clinique Saint-Jean"),
+        ]
+        results, stats = run_matching(snapshot, records, aliases, cache, workers=1)
+
+    by_row = {result['row']: result for result in results}
+    assert by_row[0]['key'] == 'hopital nord' and by_row[0]['source'] == SOURCE_ALIAS
+    assert by_row[0]['client_code'] == "C008" and by_row[0]['chorus_code'] == "H008"
+    assert by_row[1]['key'] == 'ehpad les tilleuls' and by_row[1]['source'] == SOURCE_CACHE
+    assert by_row[2]['key'] == 'clinique saint jean' and by_row[2]['source'] == SOURCE_RECHERCHE
+    assert stats['alias'] == 1 and stats['cache_hits'] == 1 and stats['cache_misses'] == 1
+
+
+def test_process_pool_same_results():
+    """Recherche dans un pool de processus identique à la recherche dans le processus courant"""
+    snapshot = build_snapshot(DATA)
+    names = [
+        ("Clinique des Lilas", ""), ("CH Troyes", ""), ("farmacie dupont", "3 r de la Paix 75002 PARIS"),
+        ("Laboratoire Biolab", "8 rue Nationale 69003 Lyon"), ("ehpad tilleul", ""), ("inconnu", ""),
+    ]
+    records = [invoice_record(row, f"UH{row % 3}", *names[row % len(names)]) for row in range(30)]
+    in_process, _ = run_matching(snapshot, records, workers=1)
+    minimum = parallel_matching.PARALLEL_MIN_INVOICES
+    parallel_matching.PARALLEL_MIN_INVOICES = 0
+    try:
+        pooled, _ = run_matching(snapshot, records, workers=2)
+    finally:
+        parallel_matching.PARALLEL_MIN_INVOICES = minimum
+    ordered = lambda results: sorted(results, key=lambda result: result['row'])
+    assert ordered(pooled) == ordered(in_process)
+    assert len(in_process) == len(records)
+
+
+def main():
+    """Exécute tous les tests du module"""
+    tests = [(name, function) for name, function in globals().items() if name.startswith('test_') and callable(function)]
+    failures = 0
+    for name, function in tests:
+        try:
+            function()
+            print(f"OK     {name}")
+        except Exception as e:
+            failures += 1
+            print(f"ÉCHEC  {name}: {type(e).__name__}: {e}")
+    print(f"{len(tests) - failures}/{len(tests)} tests réussis")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
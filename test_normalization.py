@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script de test de la normalisation des noms et des adresses (vocabulary,
+canonical_names, address_normalization, french_phonetic, key_sets).
+
+Vérifie le vocabulaire commun (mots de liaison, abréviations et fichier
+abbreviations.json appliqués aux noms comme aux adresses), les formes
+canoniques, le découpage des adresses, les clés phonétiques et les copies
+figées des index (KeySets).
+
+Utilisation :
+    python test_normalization.py
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import address_normalization
+import canonical_names
+import french_phonetic
+from address_normalization import AddressIndex, address_similarity, parse_address
+from canonical_names import CanonicalIndex, Canonicalizer, canonical_name
+from french_phonetic import PhoneticIndex, phonetic_key
+from key_sets import KeySets
+from vocabulary import ABBREVIATIONS_FILE, STOP_WORDS, Vocabulary, load_vocabulary, words
+
+
+def test_shared_vocabulary():
+    """Un seul jeu de mots de liaison et de découpage pour les trois modules"""
+    assert canonical_names.STOP_WORDS is STOP_WORDS
+    assert address_normalization.STOP_WORDS is STOP_WORDS
+    assert french_phonetic.STOP_WORDS is STOP_WORDS
+    assert words("  C.H.U. de l'Hôpital-Nord ") == ['c', 'h', 'u', 'de', 'l', 'hopital', 'nord']
+
+
+def test_canonical_name():
+    """Abréviations développées, sigles à points, mots de liaison retirés"""
+    assert canonical_name("CH de Troyes") == canonical_name("Centre Hospitalier de TROYES") == "centre hospitalier troyes"
+    assert canonical_name("C.H.U. Saint-Étienne") == canonical_name("chu st etienne")
+    assert canonical_name("AP-HP") == canonical_name("aphp") == "assistance publique hopitaux paris"
+    assert canonical_name("Clinique sous les Bois") == "clinique bois"
+    assert canonical_name("") == ""
+
+
+def test_parse_address():
+    """Numéro, voie, code postal et ville; mentions CEDEX retirées"""
+    parsed = parse_address("12 bis, Bd de l'Hôpital 75013 PARIS CEDEX 13")
+    assert parsed['street_number'] == "12 bis"
+    assert parsed['street'] == "boulevard de l hopital"
+    assert parsed['postal_code'] == "75013"
+    assert parsed['city'] == "paris"
+    assert address_similarity(parsed, parse_address("12 bis boulevard de l'hopital 75013 Paris")) == 1.0
+    assert address_similarity(parsed, parse_address("12 bis bd de l'hopital 69003 Lyon")) == 0.0
+    assert parse_address("")['text'] == ""
+
+
+def test_phonetic_key():
+    """Graphies de même prononciation, abréviations d'un mot développées"""
+    assert phonetic_key("St Jean") == phonetic_key("Saint-Jean")
+    assert phonetic_key("Pharmacie Dupont") == phonetic_key("farmacie dupond")
+    assert phonetic_key("CH de Troyes") == phonetic_key("centre hospitalier troyes")
+    assert phonetic_key("Clinique Saint Jean") != phonetic_key("Clinique Saint Paul")
+    # Nom composé uniquement de mots vides: encodé tel quel
+    assert phonetic_key("de la") != ""
+    assert phonetic_key("") == ""
+
+
+def test_abbreviations_file():
+    """Fichier abbreviations.json lu une fois, appliqué aux noms, aux adresses et aux clés phonétiques"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, ABBREVIATIONS_FILE)
+        assert load_vocabulary(path).fingerprint == Vocabulary().fingerprint
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"CHG": "Centre Hospitalier Général", "bd": "", "st": ""}, f)
+        vocabulary = load_vocabulary(path)
+    assert vocabulary.names['chg'] == vocabulary.addresses['chg'] == "centre hospitalier general"
+    assert 'st' not in vocabulary.names and 'st' not in vocabulary.addresses
+    assert vocabulary.fingerprint != Vocabulary().fingerprint
+
+    canonicalizer = Canonicalizer(vocabulary.names)
+    assert canonicalizer("CHG Troyes") == "centre hospitalier general troyes"
+    assert canonicalizer("st malo") == "st malo"
+    assert parse_address("1 bd Voltaire", vocabulary.addresses)['street'] == "bd voltaire"
+    assert AddressIndex(vocabulary.addresses).parse("1 bd Voltaire")['street'] == "bd voltaire"
+    assert phonetic_key("CHG Troyes", vocabulary.names) == phonetic_key("centre hospitalier general troyes")
+
+
+def test_unreadable_abbreviations_file():
+    """Fichier illisible: vocabulaire par défaut"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, ABBREVIATIONS_FILE)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("{pas du json")
+        assert load_vocabulary(path).fingerprint == Vocabulary().fingerprint
+
+
+def test_key_sets_frozen():
+    """Copie figée inchangée par les modifications suivantes de l'index"""
+    sets = KeySets()
+    sets.add('75013', 'a')
+    sets.add('75013', 'b')
+    sets.add('69003', 'c')
+    frozen = sets.frozen()
+    sets.add('75013', 'd')
+    sets.discard('69003', 'c')
+    sets.add('33000', 'e')
+    assert frozen.get('75013') == {'a', 'b'} and frozen.get('69003') == {'c'} and '33000' not in frozen
+    assert sets.get('75013') == {'a', 'b', 'd'} and '69003' not in sets and sets.get('33000') == {'e'}
+    # Ensemble déjà recopié: modifié sur place jusqu'à la copie figée suivante
+    sets.add('75013', 'f')
+    assert frozen.get('75013') == {'a', 'b'}
+    # Copie renvoyée par get: sans effet sur l'index
+    sets.get('75013').add('z')
+    assert 'z' not in sets.get('75013')
+
+
+def test_indexes_frozen():
+    """Index des adresses et des formes canoniques: copies figées isolées des modifications"""
+    addresses = AddressIndex.from_data({
+        'a': {'address': "1 rue de la Paix 75002 Paris"},
+        'b': {'address': "3 rue de la Paix 75002 Paris"},
+    })
+    frozen_addresses = addresses.frozen()
+    addresses.remove('a')
+    addresses.add('c', "5 rue de la Paix 75002 Paris")
+    assert frozen_addresses.by_postal_code('75002') == {'a', 'b'}
+    assert frozen_addresses.parsed('c') is None
+    assert addresses.by_postal_code('75002') == {'b', 'c'}
+
+    canonical = CanonicalIndex.from_names([('x', "CH de Troyes"), ('y', "Clinique du Parc")])
+    frozen_canonical = canonical.frozen()
+    canonical.add('z', "Centre Hospitalier Troyes")
+    canonical.remove('y')
+    assert frozen_canonical.lookup("centre hospitalier de troyes") == {'x'}
+    assert frozen_canonical.lookup("clinique parc") == {'y'}
+    assert canonical.lookup("ch troyes") == {'x', 'z'}
+    assert canonical.lookup("clinique parc") == set()
+
+
+def test_phonetic_index():
+    """Entrées retrouvées par clé phonétique; copie figée isolée des modifications"""
+    phonetic = PhoneticIndex.from_names([('a', "Pharmacie Dupont"), ('b', "CH Saint-Jean"), ('c', "Clinique du Parc")])
+    assert phonetic.lookup("farmacie dupond") == {'a'}
+    assert phonetic.lookup("Centre Hospitalier St Jean") == {'b'}
+    assert phonetic.lookup("Clinique des Lilas") == set()
+    frozen = phonetic.frozen()
+    phonetic.add('d', "Pharmacie Dupond")
+    phonetic.remove('c')
+    assert phonetic.lookup("pharmacie dupont") == {'a', 'd'}
+    assert frozen.lookup("pharmacie dupont") == {'a'} and frozen.lookup("clinique parc") == {'c'}
+
+
+def main():
+    """Exécute tous les tests du module"""
+    tests = [(name, function) for name, function in globals().items() if name.startswith('test_') and callable(function)]
+    failures = 0
+    for name, function in tests:
+        try:
+            function()
+            print(f"OK     {name}")
+        except Exception as e:
+            failures += 1
+            print(f"ÉCHEC  {name}: {type(e).__name__}: {e}")
+    print(f"{len(tests) - failures}/{len(tests)} tests réussis")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script de test du cache des fichiers de facturation lus (parse_cache).
+
+Chaque test lit un petit classeur de plusieurs feuilles UH avec un cache
+relu depuis le disque, comme au démarrage de l'application, et compte les
+feuilles réellement relues (invoice_parser.parse_by_sheet) : aucune pour un
+fichier inchangé, la seule feuille modifiée sinon, les seules feuilles non
+lues après une lecture interrompue.
+
+Utilisation :
+    python test_parse_cache.py
+"""
+
+import os
+import sys
+import tempfile
+import zipfile
+
+from openpyxl import Workbook
+
+import invoice_parser
+import parse_cache
+from parse_cache import ParseCache
+
+SHEET_NAMES = ["UH001", "UH002", "UH003", "UH004"]
+
+
+def write_workbook(path, blocks_per_sheet=4):
+    """Classeur de facturation: une feuille par UH, blocs facture en A et I (chaînes en ligne d'openpyxl)"""
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    number = 100
+    for sheet_name in SHEET_NAMES:
+        sheet = workbook.create_sheet(sheet_name)
+        for block in range(blocks_per_sheet):
+            number += 1
+            row, col = 1 + (block // 2) * 11, 1 if block % 2 == 0 else 9
+            sheet.cell(row, col, "Intitulé")
+            sheet.cell(row, col + 1, f"Clinique {sheet_name} {block}")
+            sheet.merge_cells(start_row=row, start_column=col + 1, end_row=row, end_column=col + 6)
+            sheet.cell(row, col + 7, f"Facture N° {number}")
+            sheet.cell(row + 1, col, "Code chorus")
+            sheet.cell(row + 1, col + 6, "Date")
+            sheet.cell(row + 1, col + 7, "05/02/2025")
+            sheet.cell(row + 2, col, "Code client")
+            sheet.cell(row + 2, col + 4, "Adresse")
+            sheet.cell(row + 2, col + 5, f"{number} rue de la Paix 75000")
+            sheet.merge_cells(start_row=row + 2, start_column=col + 5, end_row=row + 2, end_column=col + 7)
+            sheet.cell(row + 4, col + 4, "Analyse")
+            sheet.cell(row + 4, col + 7, 12.5)
+            sheet.cell(row + 9, col + 6, "Total")
+            sheet.cell(row + 9, col + 7, 12.5)
+    workbook.save(path)
+
+
+def replace_in_sheet(path, sheet_index, old, new):
+    """Remplace un texte dans le XML d'une seule feuille (les autres feuilles restent identiques)"""
+    part = f'xl/worksheets/sheet{sheet_index}.xml'
+    with zipfile.ZipFile(path) as source:
+        parts = {name: source.read(name) for name in source.namelist()}
+    assert old.encode('utf-8') in parts[part]
+    parts[part] = parts[part].replace(old.encode('utf-8'), new.encode('utf-8'))
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as target:
+        for name, content in parts.items():
+            target.writestr(name, content)
+
+
+def invoice_tuples(invoices):
+    return [
+        (invoice['numero'], invoice['client'], invoice['adresse'], invoice['cellule'], invoice['date'], invoice['montant'])
+        for invoice in invoices
+    ]
+
+
+def parse(path, cache_file, **kwargs):
+    """Lecture avec un cache relu depuis le disque
+
+    Returns:
+        tuple: (factures, ignorées, interrompue, feuilles relues)
+    """
+    cache = ParseCache(cache_file)
+    cache.load()
+    reparsed = []
+    parse_by_sheet = invoice_parser.parse_by_sheet
+
+    def counting_parse_by_sheet(file_path, sheet_names, *args):
+        reparsed.extend(sheet_names)
+        return parse_by_sheet(file_path, sheet_names, *args)
+
+    invoice_parser.parse_by_sheet = counting_parse_by_sheet
+    try:
+        invoices, ignored, interrupted = invoice_parser.parse_invoice_workbook(path, workers=1, cache=cache, **kwargs)
+    finally:
+        invoice_parser.parse_by_sheet = parse_by_sheet
+    return invoices, ignored, interrupted, reparsed
+
+
+def stop_after(sheet_count):
+    """should_stop qui interrompt la lecture après `sheet_count` feuilles"""
+    calls = []
+
+    def should_stop():
+        calls.append(None)
+        return len(calls) >= sheet_count
+    return should_stop
+
+
+def test_unchanged_workbook():
+    """Fichier inchangé: aucune feuille relue, mêmes factures"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        cache_file = os.path.join(directory, 'parse_cache.json')
+        write_workbook(path)
+        first = parse(path, cache_file)
+        assert first[3] == SHEET_NAMES
+        reopened = parse(path, cache_file)
+        assert reopened[3] == []
+        assert invoice_tuples(reopened[0]) == invoice_tuples(first[0]) and len(first[0]) == 16
+        assert reopened[1] == first[1]
+
+
+def test_changed_sheet():
+    """Une feuille modifiée: seule cette feuille est relue, factures identiques à une lecture sans cache"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        cache_file = os.path.join(directory, 'parse_cache.json')
+        write_workbook(path)
+        parse(path, cache_file)
+        replace_in_sheet(path, 3, "Clinique UH003 1", "Clinique modifiée")
+        changed = parse(path, cache_file)
+        assert changed[3] == ["UH003"]
+        fresh = invoice_parser.parse_invoice_workbook(path, workers=1)
+        assert invoice_tuples(changed[0]) == invoice_tuples(fresh[0])
+        assert "Clinique modifiée" in [invoice['client'] for invoice in changed[0]]
+
+
+def test_interrupted_load_reused():
+    """Lecture interrompue: les feuilles déjà lues sont reprises par la lecture suivante"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        cache_file = os.path.join(directory, 'parse_cache.json')
+        write_workbook(path)
+        interrupted = parse(path, cache_file, should_stop=stop_after(2))
+        assert interrupted[2] and interrupted[3] == SHEET_NAMES
+        assert len(interrupted[0]) == 8
+        resumed = parse(path, cache_file)
+        assert not resumed[2] and resumed[3] == ["UH003", "UH004"]
+        fresh = invoice_parser.parse_invoice_workbook(path, workers=1)
+        assert invoice_tuples(resumed[0]) == invoice_tuples(fresh[0])
+        # Fichier désormais mémorisé entièrement
+        assert parse(path, cache_file)[3] == []
+
+
+def test_loose_sheets_bound():
+    """Feuilles hors des fichiers mémorisés: seules les MAX_LOOSE_SHEETS dernières lues sont gardées"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        cache_file = os.path.join(directory, 'parse_cache.json')
+        write_workbook(path)
+        bound = parse_cache.MAX_LOOSE_SHEETS
+        parse_cache.MAX_LOOSE_SHEETS = 1
+        try:
+            parse(path, cache_file, should_stop=stop_after(3))
+            cache = ParseCache(cache_file)
+            cache.load()
+            assert len(cache.sheets) == 1 and cache.workbooks == {}
+            assert parse(path, cache_file)[3] == ["UH001", "UH002", "UH004"]
+        finally:
+            parse_cache.MAX_LOOSE_SHEETS = bound
+
+
+def main():
+    """Exécute tous les tests du module"""
+    tests = [(name, function) for name, function in globals().items() if name.startswith('test_') and callable(function)]
+    failures = 0
+    for name, function in tests:
+        try:
+            function()
+            print(f"OK     {name}")
+        except Exception as e:
+            failures += 1
+            print(f"ÉCHEC  {name}: {type(e).__name__}: {e}")
+    print(f"{len(tests) - failures}/{len(tests)} tests réussis")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
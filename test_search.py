@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script de test de la recherche classée de la base (Database.search_ranked).
+
+Les pages renvoyées par SearchCursor.fetch_more sont comparées à un tri
+complet de tous les résultats, calculé directement en Python : rang
+(exacte, préfixe, début de mot, sous-chaîne), priorité du champ, puis ordre
+de la base, y compris après modification ou renommage d'une entrée.
+
+Utilisation :
+    python test_search.py
+"""
+
+import os
+import random
+import sys
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from main import Database
+from text_normalization import normalize_text
+
+WORDS = ["clinique", "parc", "saint", "jean", "pharmacie", "centre", "paris", "lyon", "nord", "par"]
+
+
+def generated_data(count=400, seed=7):
+    """Référentiel aléatoire à vocabulaire réduit (beaucoup d'égalités de rang)"""
+    rng = random.Random(seed)
+    data = {}
+    while len(data) < count:
+        key = " ".join(rng.sample(WORDS, rng.randint(1, 3)))
+        if key in data:
+            key = f"{key} {len(data)}"
+        data[key] = {
+            'client_code': rng.choice(["", f"PAR{rng.randint(1, 50)}", f"C{rng.randint(1, 500)}"]),
+            'chorus_code': rng.choice(["", f"{rng.randint(10000, 99999)}"]),
+            'address': f"{rng.randint(1, 99)} rue {rng.choice(WORDS)} {rng.choice(['75002 Paris', '69003 Lyon'])}",
+        }
+    return data
+
+
+def reference_rank(query, value):
+    """Rang de `query` dans `value` par énumération de toutes les occurrences"""
+    occurrences = [i for i in range(len(value)) if value.startswith(query, i)]
+    if not occurrences:
+        return None
+    if value == query:
+        return Database.RANK_EXACT
+    if occurrences[0] == 0:
+        return Database.RANK_PREFIX
+    if any(not value[i - 1].isalnum() for i in occurrences):
+        return Database.RANK_TOKEN
+    return Database.RANK_SUBSTRING
+
+
+def reference_search(data, query, category=None):
+    """Tri complet de tous les résultats (rang, champ, position dans la base)"""
+    query = normalize_text(query)
+    fields = [category] if category else list(Database.RANKED_SEARCH_FIELDS)
+    scored = []
+    for position, (key, entry) in enumerate(data.items()):
+        candidates = []
+        for field in fields:
+            value = normalize_text(key if field == 'name' else entry.get(field))
+            rank = reference_rank(query, value)
+            if rank is not None:
+                candidates.append((rank, Database.RANKED_SEARCH_FIELDS.index(field)))
+        if candidates:
+            scored.append(min(candidates) + (position, key))
+    return [key for *_, key in sorted(scored)]
+
+
+def paged(cursor, page_size):
+    """Toutes les clés du curseur, page par page"""
+    keys = []
+    while cursor.has_more:
+        page = cursor.fetch_more(page_size)
+        assert page and len(page) <= page_size
+        keys.extend(page)
+    assert cursor.fetch_more(page_size) == [] and cursor.returned == cursor.total == len(keys)
+    return keys
+
+
+def database_with(data):
+    database = Database()
+    database.data = data
+    return database
+
+
+def test_pages_match_full_sort():
+    """Pages successives identiques au tri complet, quelle que soit la taille de page"""
+    data = generated_data()
+    database = database_with(data)
+    for query in ["par", "Clinique", "saint jean", "75002", "C1", "rue", "zzz"]:
+        expected = reference_search(data, query)
+        for page_size in (1, 7, 200, 10000):
+            assert paged(database.search_ranked(query), page_size) == expected, (query, page_size)
+
+
+def test_category_search():
+    """Recherche limitée à un champ: même ordre que le tri complet sur ce seul champ"""
+    data = generated_data()
+    database = database_with(data)
+    for category in Database.RANKED_SEARCH_FIELDS:
+        for query in ["par", "1", "lyon"]:
+            assert paged(database.search_ranked(query, category), 50) == reference_search(data, query, category)
+
+
+def test_empty_query():
+    """Requête vide ou blanche: aucun résultat"""
+    cursor = database_with(generated_data(20)).search_ranked("   ")
+    assert cursor.total == 0 and not cursor.has_more and cursor.fetch_more(10) == []
+
+
+def test_ties_follow_database_order_after_edits():
+    """Entrée modifiée ou renommée: les égalités restent départagées par la position dans la base"""
+    data = {
+        'clinique a': {'client_code': "X1", 'chorus_code': "", 'address': ""},
+        'clinique b': {'client_code': "X2", 'chorus_code': "", 'address': ""},
+        'clinique c': {'client_code': "X3", 'chorus_code': "", 'address': ""},
+    }
+    database = database_with(dict(data))
+    database.update_entry('clinique a', 'client_code', "X9")
+    database.set_entry('clinique b', dict(data['clinique b'], address="1 rue Neuve"))
+    assert paged(database.search_ranked("clinique"), 1) == ['clinique a', 'clinique b', 'clinique c']
+    database.rename_entry('clinique a', 'clinique d')
+    assert paged(database.search_ranked("clinique"), 2) == ['clinique d', 'clinique b', 'clinique c']
+    assert paged(database.search_ranked("clinique"), 2) == reference_search(database.data, "clinique")
+
+
+def main():
+    """Exécute tous les tests du module"""
+    tests = [(name, function) for name, function in globals().items() if name.startswith('test_') and callable(function)]
+    failures = 0
+    for name, function in tests:
+        try:
+            function()
+            print(f"OK     {name}")
+        except Exception as e:
+            failures += 1
+            print(f"ÉCHEC  {name}: {type(e).__name__}: {e}")
+    print(f"{len(tests) - failures}/{len(tests)} tests réussis")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
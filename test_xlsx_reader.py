@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script de test de la lecture directe des fichiers de facturation (xlsx_reader, invoice_parser).
+
+Les fichiers xlsx ne sont pas tous écrits comme par Excel : ordre des attributs
+des cellules, chaînes en ligne au lieu de la table partagée, textes échappés
+(&amp;, &#233;), cellules et lignes sans référence r="...". Chaque test réécrit
+le XML d'un petit classeur de facturation et vérifie que la lecture directe
+(ENGINE_XML) donne les mêmes factures qu'openpyxl (ENGINE_OPENPYXL).
+
+Utilisation :
+    python test_xlsx_reader.py
+"""
+
+import os
+import re
+import sys
+import tempfile
+import zipfile
+
+from openpyxl import Workbook, load_workbook
+
+import invoice_parser
+from invoice_parser import ENGINE_OPENPYXL, ENGINE_XML, parse_invoice_workbook
+from xlsx_reader import SheetCells, XlsxReader, merged_ranges_from_xml
+
+# Noms des factures, avec des caractères échappés dans le XML
+NAMES = ["Dupont & Fils <Labo>", "Clinique \"Les Tilleuls\"", "Pharmacie de l'Église", "Centre R&D > Nord"]
+
+SHEET_PART = 'xl/worksheets/sheet1.xml'
+
+
+def write_billing_workbook(path, extra_column=False):
+    """Petit fichier de facturation au format du modèle: blocs facture en A et I (et Q si `extra_column`)
+
+    Returns:
+        list: (numéro, nom, adresse) des factures sans code client, dans l'ordre de la feuille
+    """
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "UH001"
+    expected = []
+    number = 100
+
+    def write_block(row, col, name, coded=False):
+        nonlocal number
+        number += 1
+        address = f"{number} rue de la Paix 75000"
+        sheet.cell(row, col, "Intitulé")
+        sheet.cell(row, col + 1, name)
+        sheet.merge_cells(start_row=row, start_column=col + 1, end_row=row, end_column=col + 6)
+        sheet.cell(row, col + 7, f"Facture N° {number}")
+        sheet.cell(row + 1, col, "Code chorus")
+        sheet.cell(row + 1, col + 6, "Date")
+        sheet.cell(row + 1, col + 7, "05/02/2025")
+        sheet.cell(row + 2, col, "Code client")
+        if coded:
+            sheet.cell(row + 2, col + 1, "123456")
+        else:
+            expected.append((f"Facture N° {number}", name, address))
+        sheet.cell(row + 2, col + 4, "Adresse")
+        sheet.cell(row + 2, col + 5, address)
+        sheet.merge_cells(start_row=row + 2, start_column=col + 5, end_row=row + 2, end_column=col + 7)
+        sheet.cell(row + 4, col + 4, "Analyse")
+        sheet.cell(row + 4, col + 7, 12.5)
+        sheet.cell(row + 9, col + 6, "Total")
+        sheet.cell(row + 9, col + 7, 12.5)
+
+    for block, name in enumerate(NAMES):
+        row = 1 + (block // 2) * 11
+        write_block(row, 1 if block % 2 == 0 else 9, name, coded=block == 3)
+        if extra_column and block % 2 and row > 1:
+            write_block(row, 17, "Bloc hors modèle")
+    workbook.save(path)
+    return expected
+
+
+def rewrite_parts(path, transform):
+    """Réécrit les parties XML du fichier: transform(nom de la partie, texte) -> texte"""
+    with zipfile.ZipFile(path) as source:
+        parts = {name: source.read(name) for name in source.namelist()}
+    for name, content in parts.items():
+        if name.endswith('.xml') or name.endswith('.rels'):
+            parts[name] = transform(name, content.decode('utf-8')).encode('utf-8')
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as target:
+        for name, content in parts.items():
+            target.writestr(name, content)
+
+
+def share_strings(path, cell_tag):
+    """Chaînes en ligne d'openpyxl passées dans une table partagée, balises des cellules écrites par `cell_tag`
+
+    Args:
+        cell_tag (callable): (référence, attribut de style, indice de la chaîne) -> cellule XML
+    """
+    inline = re.compile(r'<c r="([A-Z]+[0-9]+)"((?: s="[0-9]+")?) t="inlineStr"><is><t>([^<]*)</t></is></c>')
+    strings = {}
+
+    def shared(match):
+        index = strings.setdefault(match.group(3), len(strings))
+        return cell_tag(match.group(1), match.group(2), index)
+
+    def transform(name, text):
+        if name == SHEET_PART:
+            return inline.sub(shared, text)
+        if name == '[Content_Types].xml':
+            return text.replace(
+                '</Types>',
+                '<Override PartName="/xl/sharedStrings.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>',
+            )
+        if name == 'xl/_rels/workbook.xml.rels':
+            return text.replace(
+                '</Relationships>',
+                '<Relationship Id="rIdShared" Target="sharedStrings.xml" '
+                'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings"/>'
+                '</Relationships>',
+            )
+        return text
+
+    rewrite_parts(path, transform)
+    with zipfile.ZipFile(path, 'a') as archive:
+        archive.writestr('xl/sharedStrings.xml', (
+            '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            f'count="{len(strings)}" uniqueCount="{len(strings)}">'
+            + ''.join(f'<si><t>{text}</t></si>' for text in strings)
+            + '</sst>'
+        ).encode('utf-8'))
+
+
+def read_invoices(path, engine):
+    """Factures (numéro, nom, adresse) lues avec un moteur, et nombre de factures ignorées"""
+    invoices, ignored, _ = parse_invoice_workbook(path, workers=1, engine=engine)
+    return [(invoice['numero'], invoice['client'], invoice['adresse']) for invoice in invoices], ignored
+
+
+def check_same_invoices(path, expected):
+    """Lecture directe identique à openpyxl, et aux factures écrites"""
+    direct = read_invoices(path, ENGINE_XML)
+    reference = read_invoices(path, ENGINE_OPENPYXL)
+    assert direct == reference, f"lecture directe {direct} != openpyxl {reference}"
+    assert direct[0] == expected, f"factures lues {direct[0]} != écrites {expected}"
+
+
+def sheet_xml(path):
+    with zipfile.ZipFile(path) as archive:
+        return archive.read(SHEET_PART)
+
+
+def test_inline_strings_with_entities():
+    """Chaînes en ligne (écrites par openpyxl), &amp; &lt; &gt; &quot; dans les noms"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        expected = write_billing_workbook(path)
+        content = sheet_xml(path)
+        assert b't="inlineStr"' in content and b'&amp;' in content and b'&lt;' in content
+        check_same_invoices(path, expected)
+        # Lecture d'une cellule isolée: texte déséchappé
+        cells = SheetCells(content)
+        with XlsxReader(path) as reader:
+            assert reader.value(cells.cell(1, 2)) == NAMES[0]
+
+
+def test_escaped_anchor_text():
+    """Ancre "Intitulé" écrite avec une référence de caractère (Intitul&#233;)"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        expected = write_billing_workbook(path)
+        rewrite_parts(path, lambda name, text: text.replace('>Intitulé<', '>Intitul&#233;<') if name == SHEET_PART else text)
+        assert b'Intitul&#233;' in sheet_xml(path)
+        check_same_invoices(path, expected)
+
+
+def test_shared_strings_attribute_order():
+    """Chaînes partagées, type avant la référence et attributs supplémentaires dans les balises des cellules"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        expected = write_billing_workbook(path)
+        share_strings(path, lambda reference, style, index: f'<c t="s"{style} cm="1" r="{reference}"><v>{index}</v></c>')
+        content = sheet_xml(path)
+        assert b'<c t="s" cm="1" r="A1">' in content
+        check_same_invoices(path, expected)
+
+        # Toutes les ancres sont comptées, quel que soit l'ordre des attributs
+        source = invoice_parser._XmlSource(path)
+        try:
+            anchors = SheetCells(content).find(source.anchor_pattern, source.is_anchor)
+            assert len(anchors) == len(NAMES)
+            assert source.anchor_count(content) == len(anchors)
+        finally:
+            source.close()
+
+
+def test_anchor_outside_layout_columns():
+    """Ancres hors des colonnes du modèle (Q) et attributs dans le désordre: feuille examinée entièrement"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        expected = write_billing_workbook(path, extra_column=True)
+
+        def cell_tag(reference, style, index):
+            # Une seule ancre du modèle écrite type en premier: compter les seules cellules
+            # écrites comme par Excel donnerait autant d'ancres que les colonnes A et I
+            if reference == "A12":
+                return f'<c t="s" r="{reference}"{style}><v>{index}</v></c>'
+            return f'<c r="{reference}"{style} t="s"><v>{index}</v></c>'
+
+        share_strings(path, cell_tag)
+        content = sheet_xml(path)
+        source = invoice_parser._XmlSource(path)
+        try:
+            cells = SheetCells(content)
+            anchors, _ = source.find_anchors("UH001", cells, content)
+            assert anchors == cells.find(source.anchor_pattern, source.is_anchor)
+            assert (12, 17) in anchors
+        finally:
+            source.close()
+        check_same_invoices(path, sorted(expected, key=lambda invoice: invoice[0]))
+
+
+def test_merged_ranges():
+    """Plages fusionnées lues depuis la balise ouvrante <mergeCells>, avec ou sans préfixe"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        write_billing_workbook(path)
+        ranges = merged_ranges_from_xml(sheet_xml(path))
+        assert len(ranges) == 2 * len(NAMES) and (2, 1, 7, 1) in ranges
+    assert merged_ranges_from_xml(b'<x:mergeCells count="1"><x:mergeCell ref="B1:G1"/></x:mergeCells>') == [(2, 1, 7, 1)]
+    assert merged_ranges_from_xml(b'<sheetData/><mergeCells count="0"/>') == []
+    assert merged_ranges_from_xml(b'<sheetData/>') == []
+
+
+def test_missing_references():
+    """Lignes et cellules sans r="...": repli sur la lecture complète de la feuille"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'facturation.xlsx')
+        write_billing_workbook(path)
+        workbook = load_workbook(path)
+        rows = [[cell.value for cell in row] for row in workbook.active.iter_rows()]
+        workbook.close()
+
+        # Sans références, une cellule n'est placée que par celles qui la précèdent:
+        # cellules vides écrites explicitement ("" -> <c t="inlineStr"/>), puis r= retirés
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.title = "UH001"
+        for values in rows:
+            sheet.append(["" if value is None else value for value in values])
+        workbook.save(path)
+        rewrite_parts(path, lambda name, text: re.sub(r'<(row|c) r="[A-Z]*[0-9]+"', r'<\1', text) if name == SHEET_PART else text)
+        content = sheet_xml(path)
+        assert b' r="' not in content.split(b'<sheetData>')[1]
+        try:
+            SheetCells(content)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("SheetCells accepte une feuille sans références")
+        direct = read_invoices(path, ENGINE_XML)
+        reference = read_invoices(path, ENGINE_OPENPYXL)
+        assert direct == reference, f"lecture directe {direct} != openpyxl {reference}"
+        assert [name for _, name, _ in direct[0]] == [NAMES[0], NAMES[1], NAMES[2]]
+
+
+def main():
+    """Exécute tous les tests du module"""
+    tests = [(name, function) for name, function in globals().items() if name.startswith('test_') and callable(function)]
+    failures = 0
+    for name, function in tests:
+        try:
+            function()
+            print(f"OK     {name}")
+        except Exception as e:
+            failures += 1
+            print(f"ÉCHEC  {name}: {type(e).__name__}: {e}")
+    print(f"{len(tests) - failures}/{len(tests)} tests réussis")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
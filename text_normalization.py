@@ -0,0 +1,68 @@
+"""
+Normalisation rapide des textes (noms, adresses, codes) pour la recherche.
+
+normalize_text produit exactement le même résultat que
+unidecode(str(text).lower().strip()), mais la translittération des caractères
+latins (accents, ligatures, espaces et ponctuation typographiques) passe par
+une table str.translate précalculée. unidecode n'est appelé que pour les
+caractères absents de la table.
+"""
+
+from unidecode import unidecode
+
+# Plages translittérées à l'avance : Latin-1, Latin étendu A/B,
+# ponctuation générale (espaces fines, tirets, guillemets...) et symboles monétaires
+_TABLE_RANGES = [
+    (0x0080, 0x0250),
+    (0x2000, 0x2070),
+    (0x20A0, 0x20D0),
+]
+
+
+def _build_translation_table():
+    """Construit la table caractère -> translittération à partir d'unidecode"""
+    table = {}
+    for start, end in _TABLE_RANGES:
+        for code_point in range(start, end):
+            table[code_point] = unidecode(chr(code_point))
+    return table
+
+
+_TRANSLATION_TABLE = _build_translation_table()
+
+
+def normalize_text(text):
+    """Normalise le texte pour la recherche"""
+    if text is None:
+        return ""
+    # Convertir en chaîne, mettre en minuscules et supprimer les espaces superflus
+    text = str(text).lower().strip()
+    if text.isascii():
+        return text
+    # Supprimer les accents via la table, unidecode seulement pour les caractères restants
+    text = text.translate(_TRANSLATION_TABLE)
+    if text.isascii():
+        return text
+    return unidecode(text)
+
+
+def normalize_many(values):
+    """Normalise une séquence de textes (liste, tuple, Series pandas, tableau numpy...)
+
+    Les valeurs répétées ne sont normalisées qu'une fois. Hors chaînes, le
+    cache distingue les types: 1, True et 1.0 sont égaux mais ne s'écrivent
+    pas pareil.
+
+    Returns:
+        list: Textes normalisés, dans le même ordre
+    """
+    keys = [value if type(value) is str else (type(value), value) for value in values]
+    try:
+        cache = {
+            key: normalize_text(key if type(key) is str else key[1])
+            for key in set(keys)
+        }
+    except TypeError:
+        # Valeurs non hachables: normalisation une par une
+        return [normalize_text(key if type(key) is str else key[1]) for key in keys]
+    return [cache[key] for key in keys]
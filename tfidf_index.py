@@ -0,0 +1,335 @@
+"""
+Index TF-IDF de n-grammes de caractères pour la recherche approximative de noms.
+
+Chaque nom est découpé en n-grammes de caractères (avec une espace en début et
+en fin de mot), pondérés par TF-IDF puis normalisés : la similarité de deux
+noms est le cosinus de leurs vecteurs. Les fautes de frappe, mots ajoutés ou
+inversés ne font perdre que quelques n-grammes.
+
+Le référentiel est stocké sous forme de listes inverses (n-gramme -> lignes)
+compilées en tableaux NumPy (format CSR : lignes et poids de tous les
+n-grammes à la suite). Les clés de même texte (doublons de la base) partagent
+une seule ligne. Une requête ne lit que les listes de ses propres n-grammes :
+les produits sont accumulés par ligne touchée, sans matrice de scores dense ;
+la mémoire d'une requête est proportionnelle au nombre de lignes touchées.
+
+Les ajouts et suppressions ne retokenisent que l'entrée concernée. Les poids
+IDF et donc les normes dépendent de tout le référentiel : la compilation
+suivante les recalcule en entier, par quelques opérations NumPy sur les
+n-grammes déjà tokenisés (pas de boucle Python par n-gramme).
+
+Une requête travaille sur l'état compilé au moment où elle commence. Un
+thread de travail reçoit une copie figée (frozen) compilée par le thread qui
+modifie l'index : ses requêtes ne lisent aucune structure modifiée ensuite.
+"""
+
+import math
+import re
+from collections import Counter
+from itertools import chain
+
+import numpy as np
+
+from text_normalization import normalize_text
+
+# Taille des n-grammes de caractères
+NGRAM_SIZE = 3
+
+# Au-delà d'une ligne touchée sur DENSE_RATIO, les scores d'une requête sont accumulés dans un tableau dense
+DENSE_RATIO = 8
+
+# Poids TF (1 + log du nombre d'occurrences) des petits nombres d'occurrences, les plus courants
+_TF_WEIGHTS = [0.0] + [1 + math.log(count) for count in range(1, 16)]
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def clean_text(text):
+    """Texte normalisé réduit aux lettres et chiffres séparés par des espaces"""
+    return _NON_ALNUM.sub(' ', normalize_text(text)).strip()
+
+
+def char_ngrams(text):
+    """Compte les n-grammes de caractères d'un texte normalisé
+
+    Returns:
+        Counter: n-gramme -> nombre d'occurrences
+    """
+    text = clean_text(text)
+    if not text:
+        return Counter()
+    padded = f" {text} "
+    if len(padded) <= NGRAM_SIZE:
+        return Counter([padded])
+    return Counter(padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1))
+
+
+class TfidfIndex:
+    """Index TF-IDF incrémental (clé -> texte)"""
+
+    def __init__(self):
+        self._slot_by_key = {}
+        self._slot_by_text = {}
+        self._texts = []
+        self._keys = []
+        # Par ligne: identifiants des n-grammes et poids TF (1 + log du nombre d'occurrences)
+        self._grams = []
+        self._tf = []
+        self._free_slots = []
+        # Identifiant de chaque n-gramme rencontré, et nombre de lignes qui le contiennent
+        self._gram_ids = {}
+        self._document_frequency = []
+        self._compiled = None
+
+    def __len__(self):
+        return len(self._slot_by_key)
+
+    def __contains__(self, key):
+        return key in self._slot_by_key
+
+    def text(self, key):
+        """Texte indexé (normalisé) d'une clé, vide si la clé n'est pas indexée"""
+        slot = self._slot_by_key.get(key)
+        return (self._texts[slot] or "") if slot is not None else ""
+
+    def clear(self):
+        """Vide l'index"""
+        self.__init__()
+
+    def _gram_id(self, gram):
+        gram_id = self._gram_ids.get(gram)
+        if gram_id is None:
+            gram_id = self._gram_ids[gram] = len(self._gram_ids)
+            self._document_frequency.append(0)
+        return gram_id
+
+    def add(self, key, text):
+        """Ajoute (ou remplace) le texte associé à une clé"""
+        if key in self._slot_by_key:
+            self.remove(key)
+        text = clean_text(text)
+        slot = self._slot_by_text.get(text)
+        if slot is not None:
+            # Texte déjà indexé: la clé rejoint sa ligne, les poids sont inchangés
+            self._keys[slot].append(key)
+            self._slot_by_key[key] = slot
+            self._compiled = None
+            return
+        counts = char_ngrams(text)
+        known = self._gram_ids.get
+        grams = [known(gram) for gram in counts]
+        if None in grams:
+            grams = [self._gram_id(gram) for gram in counts]
+        tf = [_TF_WEIGHTS[count] if count < len(_TF_WEIGHTS) else 1 + math.log(count) for count in counts.values()]
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._texts[slot] = text
+            self._keys[slot] = [key]
+            self._grams[slot] = grams
+            self._tf[slot] = tf
+        else:
+            slot = len(self._keys)
+            self._texts.append(text)
+            self._keys.append([key])
+            self._grams.append(grams)
+            self._tf.append(tf)
+        self._slot_by_key[key] = slot
+        self._slot_by_text[text] = slot
+        document_frequency = self._document_frequency
+        for gram_id in grams:
+            document_frequency[gram_id] += 1
+        self._compiled = None
+
+    def remove(self, key):
+        """Retire une clé de l'index (sans effet si elle est absente)"""
+        slot = self._slot_by_key.pop(key, None)
+        if slot is None:
+            return
+        self._keys[slot].remove(key)
+        self._compiled = None
+        if self._keys[slot]:
+            return
+        del self._slot_by_text[self._texts[slot]]
+        document_frequency = self._document_frequency
+        for gram_id in self._grams[slot]:
+            document_frequency[gram_id] -= 1
+        self._texts[slot] = None
+        self._keys[slot] = None
+        self._grams[slot] = None
+        self._tf[slot] = None
+        self._free_slots.append(slot)
+
+    def _compile(self):
+        """Construit les listes inverses pondérées et normalisées (tableaux NumPy, format CSR)"""
+        document_count = len(self._slot_by_text)
+        gram_count = len(self._gram_ids)
+        # Poids IDF lissé (un n-gramme absent du référentiel a le poids maximal)
+        idf = np.log((1 + document_count) / (1 + np.array(self._document_frequency, dtype=np.float64))) + 1
+        slot_count = len(self._keys)
+
+        live = [slot for slot, grams in enumerate(self._grams) if grams]
+        total = sum(len(self._grams[slot]) for slot in live)
+        grams = np.fromiter(chain.from_iterable(self._grams[slot] for slot in live), dtype=np.int64, count=total)
+        slots = np.repeat(np.array(live, dtype=np.int64), [len(self._grams[slot]) for slot in live])
+        weights = np.fromiter(chain.from_iterable(self._tf[slot] for slot in live), dtype=np.float64, count=total)
+        weights *= idf[grams]
+        norms = np.sqrt(np.bincount(slots, weights=weights * weights, minlength=slot_count))
+        norms[norms == 0] = 1
+        weights = weights / norms[slots]
+
+        # Listes inverses: n-gramme par n-gramme, lignes croissantes
+        order = np.argsort(grams, kind='stable')
+        indptr = np.zeros(gram_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(grams, minlength=gram_count), out=indptr[1:])
+        postings = (slots[order].astype(np.int32), weights[order])
+        # N-gramme -> (IDF, début et fin de sa liste inverse), lu sans passer par NumPy à chaque requête
+        vocabulary = dict(zip(self._gram_ids, zip(idf.tolist(), indptr[:-1].tolist(), indptr[1:].tolist())))
+        slot_keys = [tuple(keys) if keys else () for keys in self._keys]
+        # Un seul objet, remplacé d'un bloc et jamais modifié: une requête en cours garde un état cohérent
+        compiled = (postings, vocabulary, document_count, slot_keys)
+        self._compiled = compiled
+        return compiled
+
+    def compile(self):
+        """Compile l'index s'il a été modifié depuis la dernière requête
+
+        Utile avant de copier l'index vers d'autres processus, pour qu'ils
+        n'aient pas chacun à le compiler, ou de l'interroger depuis un thread.
+
+        Returns:
+            tuple: État compilé (listes inverses, n-gramme -> (IDF, début, fin),
+            nombre de textes, clés par ligne)
+        """
+        compiled = self._compiled
+        if compiled is None:
+            compiled = self._compile()
+        return compiled
+
+    def frozen(self):
+        """Copie en lecture seule de l'index compilé, à interroger depuis un autre thread
+
+        L'index d'origine peut ensuite être modifié sans effet sur la copie. La
+        copie ne doit pas être modifiée (add, remove).
+        """
+        frozen = TfidfIndex()
+        frozen._compiled = self.compile()
+        frozen._slot_by_key = dict(self._slot_by_key)
+        frozen._texts = list(self._texts)
+        return frozen
+
+    @staticmethod
+    def _query_vector(text, compiled):
+        """Vecteur normalisé d'une requête ((début, fin) de la liste inverse du n-gramme -> poids)"""
+        _, vocabulary, document_count, _ = compiled
+        weights = {}
+        unknown_idf = math.log(1 + document_count) + 1
+        norm = 0.0
+        for gram, count in char_ngrams(text).items():
+            known = vocabulary.get(gram)
+            weight = (1 + math.log(count)) * (known[0] if known else unknown_idf)
+            norm += weight * weight
+            # Les n-grammes absents du référentiel comptent dans la norme mais pas dans le produit
+            if known and known[2] > known[1]:
+                weights[known[1:]] = weight
+        norm = math.sqrt(norm)
+        if not norm:
+            return {}
+        return {bounds: weight / norm for bounds, weight in weights.items()}
+
+    @staticmethod
+    def _scores(vector, postings, slot_count):
+        """Lignes touchées par une requête (croissantes) et leur similarité cosinus
+
+        Les produits sont accumulés sur les seules lignes des listes inverses lues;
+        un tableau de la taille du référentiel n'est utilisé que si la requête en
+        touche déjà une bonne part.
+        """
+        posting_slots, posting_weights = postings
+        if not vector:
+            return np.zeros(0, dtype=np.int32), np.zeros(0)
+        slots = np.concatenate([posting_slots[start:end] for start, end in vector])
+        values = np.concatenate([posting_weights[start:end] * weight for (start, end), weight in vector.items()])
+        if len(slots) * DENSE_RATIO >= slot_count:
+            scores = np.bincount(slots, weights=values, minlength=slot_count)
+            touched = np.flatnonzero(scores)
+            return touched, scores[touched]
+        touched, inverse = np.unique(slots, return_inverse=True)
+        return touched, np.bincount(inverse, weights=values, minlength=len(touched))
+
+    def search_batch(self, texts, top_k=5, include=None):
+        """Meilleures clés par similarité cosinus pour un lot de textes
+
+        Args:
+            texts (list): Textes recherchés
+            top_k (int): Nombre de candidats retournés par texte
+            include (list): Pour chaque texte, clés à retourner en plus des `top_k`
+                meilleures, avec leur similarité (même nulle)
+
+        Returns:
+            list: Pour chaque texte, liste de (clé, similarité) par similarité décroissante;
+            toutes les clés des `top_k` textes les plus proches sont retournées
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        compiled = self.compile()
+        postings, _, document_count, slot_keys = compiled
+        if not document_count:
+            return [[] for _ in texts]
+
+        # Emplacements de l'état compilé (l'index peut avoir changé depuis la compilation)
+        slot_by_key = {key: slot for slot, keys in enumerate(slot_keys) for key in keys} if include else {}
+
+        results = []
+        for row, text in enumerate(texts):
+            touched, scores = self._scores(self._query_vector(text, compiled), postings, len(slot_keys))
+            best = np.arange(len(touched))
+            if len(touched) > top_k > 0:
+                # Seuil du k-ième score, puis tous les ex aequo: ordre indépendant de la partition
+                threshold = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+                best = np.flatnonzero(scores >= threshold)
+            # Similarité décroissante, puis ordre d'insertion
+            best = best[np.lexsort((touched[best], -scores[best]))][:max(top_k, 0)]
+            found = [
+                (key, float(scores[i]))
+                for i in best if scores[i] > 0
+                for key in slot_keys[touched[i]]
+            ]
+            extra_keys = include[row] if include else ()
+            if extra_keys:
+                found_keys = {key for key, _ in found}
+                extra = []
+                for key in extra_keys:
+                    if key in found_keys or key not in slot_by_key:
+                        continue
+                    i = np.searchsorted(touched, slot_by_key[key])
+                    hit = i < len(touched) and touched[i] == slot_by_key[key]
+                    extra.append((key, float(scores[i]) if hit else 0.0))
+                found = sorted(found + extra, key=lambda candidate: -candidate[1])
+            results.append(found)
+        return results
+
+    def similarities(self, text, keys):
+        """Similarité cosinus d'un texte avec des clés précises, sans parcourir le référentiel
+
+        Returns:
+            list: (clé, similarité) pour chaque clé indexée, dans l'ordre de `keys`
+        """
+        compiled = self.compile()
+        query = self._query_vector(text, compiled)
+        vectors = {}
+        results = []
+        for key in keys:
+            if key not in self._slot_by_key:
+                continue
+            key_text = self.text(key)
+            if key_text not in vectors:
+                # Tous les n-grammes d'un texte indexé sont connus: son vecteur est celui de l'index
+                vectors[key_text] = self._query_vector(key_text, compiled)
+            vector = vectors[key_text]
+            results.append((key, sum(weight * vector.get(gram, 0.0) for gram, weight in query.items())))
+        return results
+
+    def search(self, text, top_k=5):
+        """Meilleures clés pour un seul texte (voir search_batch)"""
+        return self.search_batch([text], top_k)[0]
@@ -0,0 +1,141 @@
+"""
+Vocabulaire commun de la normalisation des noms et des adresses.
+
+canonical_names, address_normalization et french_phonetic découpent les textes
+de la même façon (words) et partagent les mots de liaison (STOP_WORDS) et les
+abréviations (NAME_ABBREVIATIONS pour les noms d'établissements,
+ADDRESS_ABBREVIATIONS pour les adresses).
+
+Les abréviations peuvent être complétées ou modifiées par un fichier
+abbreviations.json placé à côté de database.json :
+    {"abréviation": "forme développée", ...}
+Une forme développée vide retire l'abréviation. Le fichier est lu une fois
+(load_vocabulary) et s'applique aux noms comme aux adresses.
+"""
+
+import hashlib
+import json
+import logging
+import re
+
+from text_normalization import normalize_text
+
+logger = logging.getLogger('FacturesManager')
+
+# Fichier de configuration des abréviations, à côté de database.json
+ABBREVIATIONS_FILE = 'abbreviations.json'
+
+# Mots de liaison ignorés ("centre hospitalier de troyes" = "ch troyes")
+STOP_WORDS = frozenset({
+    'a', 'au', 'aux', 'd', 'de', 'des', 'du', 'en', 'et', 'l', 'la', 'le', 'les', 'sous', 'sur',
+})
+
+# Abréviations communes aux noms et aux adresses
+COMMON_ABBREVIATIONS = {
+    'st': 'saint',
+    'ste': 'sainte',
+    'sts': 'saints',
+    'stes': 'saintes',
+}
+
+# Abréviations courantes du référentiel (forme normalisée -> forme développée)
+NAME_ABBREVIATIONS = dict(COMMON_ABBREVIATIONS, **{
+    'ap hm': 'assistance publique hopitaux marseille',
+    'ap hp': 'assistance publique hopitaux paris',
+    'aphm': 'assistance publique hopitaux marseille',
+    'aphp': 'assistance publique hopitaux paris',
+    'ch': 'centre hospitalier',
+    'chi': 'centre hospitalier intercommunal',
+    'chr': 'centre hospitalier regional',
+    'chru': 'centre hospitalier regional universitaire',
+    'chs': 'centre hospitalier specialise',
+    'chu': 'centre hospitalier universitaire',
+    'clin': 'clinique',
+    'ctre': 'centre',
+    'dept': 'departement',
+    'dr': 'docteur',
+    'ehpad': 'etablissement hebergement personnes agees dependantes',
+    'gh': 'groupe hospitalier',
+    'ght': 'groupement hospitalier territoire',
+    'ghu': 'groupe hospitalier universitaire',
+    'hcl': 'hospices civils lyon',
+    'hia': 'hopital instruction armees',
+    'hop': 'hopital',
+    'labm': 'laboratoire biologie medicale',
+    'lbm': 'laboratoire biologie medicale',
+})
+
+# Abréviations courantes des types de voie et des mots d'adresse
+ADDRESS_ABBREVIATIONS = dict(COMMON_ABBREVIATIONS, **{
+    'all': 'allee',
+    'av': 'avenue',
+    'ave': 'avenue',
+    'bd': 'boulevard',
+    'bld': 'boulevard',
+    'blvd': 'boulevard',
+    'bvd': 'boulevard',
+    'che': 'chemin',
+    'chem': 'chemin',
+    'crs': 'cours',
+    'fbg': 'faubourg',
+    'fg': 'faubourg',
+    'gde': 'grande',
+    'imp': 'impasse',
+    'lot': 'lotissement',
+    'mte': 'montee',
+    'pl': 'place',
+    'pte': 'porte',
+    'qu': 'quai',
+    'qua': 'quartier',
+    'res': 'residence',
+    'rte': 'route',
+    'sq': 'square',
+    'zac': 'zone',
+    'za': 'zone',
+    'zi': 'zone',
+})
+
+NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def words(text):
+    """Mots d'un texte normalisé (minuscules sans accents), ponctuation retirée"""
+    return NON_ALNUM.sub(' ', normalize_text(text)).split()
+
+
+class Vocabulary:
+    """Tables d'abréviations des noms et des adresses, complétées par un dictionnaire
+
+    Args:
+        overrides (dict): Abréviation -> forme développée (vide: abréviation retirée)
+    """
+
+    def __init__(self, overrides=None):
+        self.names = dict(NAME_ABBREVIATIONS)
+        self.addresses = dict(ADDRESS_ABBREVIATIONS)
+        for abbreviation, expansion in (overrides or {}).items():
+            abbreviation = ' '.join(words(abbreviation))
+            if not abbreviation:
+                continue
+            for table in (self.names, self.addresses):
+                if expansion:
+                    table[abbreviation] = normalize_text(expansion)
+                else:
+                    table.pop(abbreviation, None)
+        self.fingerprint = hashlib.sha1(json.dumps(
+            [sorted(self.names.items()), sorted(self.addresses.items())], ensure_ascii=False
+        ).encode('utf-8')).hexdigest()
+
+
+def load_vocabulary(path):
+    """Vocabulaire par défaut complété par le fichier des abréviations `path` s'il existe"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+    except FileNotFoundError:
+        return Vocabulary()
+    except Exception as e:
+        logger.warning(f"Fichier des abréviations illisible ({path}), valeurs par défaut utilisées: {str(e)}")
+        return Vocabulary()
+    logger.info(f"{len(overrides)} abréviation(s) lue(s) depuis {path}")
+    return Vocabulary(overrides)
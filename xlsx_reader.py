@@ -0,0 +1,376 @@
+"""
+Lecture directe des fichiers xlsx/xlsm, sans modèle objet des cellules.
+
+Un fichier xlsx est une archive zip de parties XML : la table des chaînes
+partagées (xl/sharedStrings.xml), les styles (xl/styles.xml, qui disent
+quelles cellules numériques sont des dates) et une partie par feuille
+(xl/worksheets/sheetN.xml). XlsxReader ouvre l'archive, lit une fois la
+table des chaînes et les styles, puis parcourt chaque feuille avec un
+analyseur XML incrémental : les lignes sont rendues avec leurs cellules
+brutes (type, texte, style), et seules les cellules réellement utilisées
+sont converties en valeurs (value), comme openpyxl le ferait en mode
+data_only.
+
+Quand seules quelques cellules d'une feuille sont utiles, SheetCells les lit
+directement dans le XML brut : un index des lignes (numéro -> position)
+suffit pour retrouver une cellule par sa référence, sans analyser les autres.
+"""
+
+import html
+import io
+import posixpath
+import re
+import zipfile
+from xml.etree import ElementTree
+
+from openpyxl.cell.text import Text
+from openpyxl.styles.stylesheet import Stylesheet
+from openpyxl.utils.cell import get_column_letter, range_boundaries
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, WINDOWS_EPOCH, from_excel, from_ISO8601
+
+NAMESPACES = {
+    'main': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+    'rel': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+    'pkg': 'http://schemas.openxmlformats.org/package/2006/relationships',
+}
+
+_MAIN = '{%s}' % NAMESPACES['main']
+_ROW = _MAIN + 'row'
+_CELL = _MAIN + 'c'
+_VALUE = _MAIN + 'v'
+_INLINE_STRING = _MAIN + 'is'
+_TEXT = _MAIN + 't'
+_SHARED_STRINGS_TYPE = '/sharedStrings'
+_STYLES_TYPE = '/styles'
+_STRING_ITEM = _MAIN + 'si'
+_MERGE_CELL = re.compile(rb'<(?:\w+:)?mergeCell\s+ref="([A-Z]+[0-9]+:[A-Z]+[0-9]+)"')
+
+# Motifs du XML brut d'une feuille (voir SheetCells)
+_ROW_TAG = re.compile(rb'<(?:\w+:)?row[\s>/]')
+_NUMBERED_ROW = re.compile(rb'<(?:\w+:)?row\s[^>]*?\br="([0-9]+)"')
+_CELL_TAG = re.compile(rb'<((?:\w+:)?)c\s([^>]*?)(/?)>')
+_UNREFERENCED_CELL = re.compile(rb'<(?:\w+:)?c(?:>|/>|\s(?![^>]*\br=")[^>]*>)')
+_REFERENCE = re.compile(rb'\br="([A-Z]+)([0-9]+)"')
+_KIND = re.compile(rb'\bt="(\w+)"')
+_STYLE = re.compile(rb'\bs="([0-9]+)"')
+_CELL_VALUE = re.compile(rb'<(?:\w+:)?v>([^<]*)</')
+_PHONETIC = re.compile(rb'<(?:\w+:)?rPh\b.*?</(?:\w+:)?rPh>', re.S)
+_INLINE_TEXT = re.compile(rb'<(?:\w+:)?t(?:\s[^>]*)?>([^<]*)</(?:\w+:)?t>')
+
+
+def _relationship_targets(archive):
+    """Cibles des relations du classeur (identifiant -> (type, chemin dans l'archive))"""
+    rels = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    targets = {}
+    for rel in rels.findall('pkg:Relationship', NAMESPACES):
+        target = rel.get('Target') or ""
+        # Cible relative à xl/, ou absolue depuis la racine de l'archive
+        path = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+        targets[rel.get('Id')] = (rel.get('Type') or "", path)
+    return targets
+
+
+def sheet_parts(archive):
+    """Chemin de la partie XML de chaque feuille d'un fichier xlsx/xlsm ouvert (nom -> chemin, ordre du classeur)"""
+    targets = _relationship_targets(archive)
+    workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    parts = {}
+    for sheet in workbook.iterfind('main:sheets/main:sheet', NAMESPACES):
+        target = targets.get(sheet.get(f"{{{NAMESPACES['rel']}}}id"))
+        if target:
+            parts[sheet.get('name')] = target[1]
+    return parts
+
+
+def merged_ranges_from_xml(content):
+    """Plages fusionnées (min_col, min_row, max_col, max_row) de la section <mergeCells> d'une feuille"""
+    # La section <mergeCells> suit les données de la feuille; la dernière occurrence
+    # est la balise fermante </mergeCells>, la précédente la balise ouvrante
+    start = content.rfind(b'mergeCells')
+    if start == -1:
+        return []
+    opening = content.rfind(b'mergeCells', 0, start)
+    if opening != -1:
+        start = opening
+    return [range_boundaries(ref.decode('ascii')) for ref in _MERGE_CELL.findall(content, content.rfind(b'<', 0, start))]
+
+
+def merged_ranges(archive, part):
+    """Plages fusionnées d'une feuille (voir merged_ranges_from_xml), liste vide si la partie est absente"""
+    try:
+        return merged_ranges_from_xml(archive.read(part))
+    except KeyError:
+        return []
+
+
+def read_shared_strings(content):
+    """Table des chaînes partagées (xl/sharedStrings.xml), lue comme openpyxl la lit"""
+    strings = []
+    for item in ElementTree.fromstring(content).iter(_STRING_ITEM):
+        # Cas courant: un seul texte simple; texte enrichi (plusieurs <r>) lu par openpyxl
+        if len(item) == 1 and item[0].tag == _TEXT:
+            text = item[0].text or ""
+        else:
+            text = Text.from_tree(item).content
+        strings.append(text.replace('x005F_', ''))
+    return strings
+
+
+def column_index(reference):
+    """Numéro de colonne (1 pour A) d'une référence de cellule ("AB12" -> 28)"""
+    column = 0
+    for char in reference:
+        if char.isdigit():
+            break
+        column = column * 26 + ord(char) - 64
+    return column
+
+
+def _inline_text(cell):
+    """Texte d'une chaîne en ligne (<is>), comme openpyxl le lit"""
+    inline = cell.find(_INLINE_STRING)
+    if inline is None:
+        return None
+    # Cas courant: un seul texte simple; texte enrichi (plusieurs <r>) lu par openpyxl
+    if len(inline) == 1 and inline[0].tag == _TEXT:
+        return inline[0].text or ""
+    return Text.from_tree(inline).content
+
+
+class XlsxReader:
+    """Fichier xlsx/xlsm ouvert en lecture directe
+
+    Args:
+        file_path (str): Chemin du fichier
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.archive = zipfile.ZipFile(file_path)
+        try:
+            self.parts = sheet_parts(self.archive)
+            targets = _relationship_targets(self.archive).values()
+            self.shared_strings = []
+            for kind, path in targets:
+                if kind.endswith(_SHARED_STRINGS_TYPE):
+                    self.shared_strings = read_shared_strings(self.archive.read(path))
+            self.date_styles, self.timedelta_styles = set(), set()
+            for kind, path in targets:
+                if kind.endswith(_STYLES_TYPE):
+                    stylesheet = Stylesheet.from_tree(ElementTree.fromstring(self.archive.read(path)))
+                    self.date_styles, self.timedelta_styles = stylesheet.date_formats, stylesheet.timedelta_formats
+            properties = ElementTree.fromstring(self.archive.read('xl/workbook.xml')).find('main:workbookPr', NAMESPACES)
+            date1904 = properties is not None and properties.get('date1904') in ('1', 'true')
+            self.epoch = CALENDAR_MAC_1904 if date1904 else WINDOWS_EPOCH
+        except Exception:
+            self.archive.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.archive.close()
+
+    @property
+    def sheetnames(self):
+        return list(self.parts)
+
+    def sheet_xml(self, sheet_name):
+        """Contenu XML (octets) d'une feuille"""
+        return self.archive.read(self.parts[sheet_name])
+
+    def string_indexes(self, text):
+        """Indices des chaînes partagées qui contiennent `text`"""
+        return {index for index, value in enumerate(self.shared_strings) if text in value}
+
+    def rows(self, content):
+        """Lignes d'une feuille, lues au fil de l'analyse XML
+
+        Args:
+            content (bytes): Contenu XML de la feuille (voir sheet_xml)
+
+        Yields:
+            tuple: (numéro de ligne, {colonne: cellule brute}), cellule brute = (type, texte, style),
+            lignes vides omises
+        """
+        row_counter = 0
+        for _, element in ElementTree.iterparse(io.BytesIO(content)):
+            if element.tag != _ROW:
+                continue
+            number = element.get('r')
+            row_counter = int(number) if number else row_counter + 1
+            cells = {}
+            column = 0
+            for cell in element.iter(_CELL):
+                reference = cell.get('r')
+                column = column_index(reference) if reference else column + 1
+                kind = cell.get('t', 'n')
+                text = _inline_text(cell) if kind == 'inlineStr' else cell.findtext(_VALUE)
+                if text is not None:
+                    cells[column] = (kind, text, cell.get('s'))
+            element.clear()
+            if cells:
+                yield row_counter, cells
+
+    def value(self, raw):
+        """Valeur d'une cellule brute, convertie comme openpyxl en mode data_only"""
+        if raw is None:
+            return None
+        kind, text, style = raw
+        if kind == 'inlineStr':
+            return text
+        if not text:
+            return None
+        if kind == 'n':
+            number = float(text) if ('.' in text or 'E' in text or 'e' in text) else int(text)
+            style = int(style) if style else 0
+            if style in self.date_styles:
+                try:
+                    return from_excel(number, self.epoch, timedelta=style in self.timedelta_styles)
+                except (OverflowError, ValueError):
+                    return "#VALUE!"
+            return number
+        if kind == 's':
+            return self.shared_strings[int(text)]
+        if kind == 'b':
+            return bool(int(text))
+        if kind == 'd':
+            return from_ISO8601(text)
+        # 'str' (résultat de formule) et 'e' (erreur): texte tel quel
+        return text
+
+
+def _unescape(text):
+    return html.unescape(text.decode('utf-8')) if b'&' in text else text.decode('utf-8')
+
+
+class SheetCells:
+    """Accès direct aux cellules d'une feuille, dans son XML brut
+
+    Les lignes sont repérées une fois (numéro -> position); une cellule est
+    ensuite cherchée par sa référence ("H12") dans sa seule ligne.
+
+    Args:
+        content (bytes): Contenu XML de la feuille (voir XlsxReader.sheet_xml)
+
+    Raises:
+        ValueError: Lignes ou cellules sans référence (lire la feuille avec XlsxReader.rows)
+    """
+
+    def __init__(self, content):
+        self.content = content
+        starts = [(int(match.group(1)), match.start()) for match in _NUMBERED_ROW.finditer(content)]
+        if len(starts) != len(_ROW_TAG.findall(content)):
+            raise ValueError("lignes sans numéro")
+        if _UNREFERENCED_CELL.search(content):
+            raise ValueError("cellules sans référence")
+        ends = [start for _, start in starts[1:]] + [len(content)]
+        self._rows = {number: (start, end) for (number, start), end in zip(starts, ends)}
+
+    def _cell_at(self, start):
+        """(ligne, colonne, cellule brute) de la cellule dont la balise commence à `start`"""
+        match = _CELL_TAG.match(self.content, start)
+        attributes = match.group(2)
+        reference = _REFERENCE.search(attributes)
+        row, column = int(reference.group(2)), column_index(reference.group(1).decode('ascii'))
+        if match.group(3):
+            return row, column, None
+        end = self.content.find(b'</' + match.group(1) + b'c>', match.end())
+        inner = self.content[match.end():end]
+        kind = _KIND.search(attributes)
+        kind = kind.group(1).decode('ascii') if kind else 'n'
+        if kind == 'inlineStr':
+            texts = _INLINE_TEXT.findall(_PHONETIC.sub(b'', inner))
+            if not texts and b'<' not in inner:
+                return row, column, None
+            text = ''.join(_unescape(text) for text in texts)
+        else:
+            value = _CELL_VALUE.search(inner)
+            if value is None:
+                return row, column, None
+            text = _unescape(value.group(1))
+        style = _STYLE.search(attributes)
+        return row, column, (kind, text, style.group(1).decode('ascii') if style else None)
+
+    def cell(self, row, column):
+        """Cellule brute (type, texte, style) en (ligne, colonne), None si elle est vide ou absente"""
+        span = self._rows.get(row)
+        if span is None:
+            return None
+        reference = f'r="{get_column_letter(column)}{row}"'.encode('ascii')
+        position = self.content.find(reference, *span)
+        if position == -1:
+            return None
+        return self._cell_at(self.content.rfind(b'<', span[0], position))[2]
+
+    def _enclosing_cell(self, position):
+        """Début de la balise de la cellule qui contient `position`, -1 hors cellule"""
+        start = position
+        while True:
+            start = self.content.rfind(b'<', 0, start)
+            if start == -1 or _CELL_TAG.match(self.content, start):
+                return start
+            if _ROW_TAG.match(self.content, start):
+                return -1
+
+    def find(self, pattern, accept, row=None):
+        """Cellules dont le XML contient `pattern`, acceptées par `accept`
+
+        Args:
+            pattern (re.Pattern): Motif cherché dans le XML brut
+            accept (callable): Reçoit la cellule brute, renvoie True pour la retenir
+            row (int): Ligne où chercher (toute la feuille si absent)
+
+        Returns:
+            list: (ligne, colonne) des cellules retenues, dans l'ordre de la feuille
+        """
+        span = (0, len(self.content)) if row is None else self._rows.get(row, (0, 0))
+        found = set()
+        for match in pattern.finditer(self.content, *span):
+            start = self._enclosing_cell(match.start())
+            if start == -1:
+                continue
+            row, column, cell = self._cell_at(start)
+            if cell is not None and accept(cell):
+                found.add((row, column))
+        return sorted(found)
+
+    def first_row(self, pattern):
+        """Numéro de la première ligne dont le XML contient `pattern`, None s'il n'y en a pas"""
+        match = pattern.search(self.content)
+        if match is None:
+            return None
+        for row, (start, end) in self._rows.items():
+            if start <= match.start() < end:
+                return row
+        return None
+
+    def probe(self, columns, pattern, accept):
+        """Cellules des seules colonnes `columns` dont le XML contient `pattern`, acceptées par `accept`
+
+        Chaque ligne n'est examinée qu'aux références de ces colonnes: les autres
+        cellules ne sont ni cherchées ni lues.
+
+        Returns:
+            list: (ligne, colonne) des cellules retenues, dans l'ordre de la feuille
+        """
+        content = self.content
+        letters = [(column, get_column_letter(column).encode('ascii')) for column in sorted(columns)]
+        found = []
+        for row, (start, end) in self._rows.items():
+            for column, letter in letters:
+                position = content.find(b'r="%s%d"' % (letter, row), start, end)
+                if position == -1:
+                    continue
+                # Motif cherché jusqu'à la fin de la cellule avant de la lire
+                stop = content.find(b'</', position, end)
+                if stop == -1 or not pattern.search(content, position, content.find(b'>', stop) + 1):
+                    continue
+                cell = self._cell_at(content.rfind(b'<', start, position))[2]
+                if cell is not None and accept(cell):
+                    found.append((row, column))
+        return found